@@ -0,0 +1,96 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+
+"""
+Microbenchmark of the choice of the journeys kept by the culling
+
+    cd source/jormungandr && python benchmarks/culling_journeys_benchmark.py
+
+times the branch and bound (new_default._get_best_combination) on random candidates of NB_SECTIONS sections
+with NB_MUST_KEEP must-keep journeys, for up to 40 candidates, and compares it to the enumeration of all the
+combinations it replaced when there are few enough combinations to enumerate them
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+import math
+import random
+import time
+import numpy as np
+from jormungandr.scenarios import new_default
+from jormungandr.scenarios.tests.new_default_tests import _get_best_combination_by_enumeration
+
+NB_SECTIONS = 12
+NB_MUST_KEEP = 2
+NB_CASES = 5
+# (number of candidates, number of journeys to keep)
+SIZES = [(10, 5), (20, 5), (20, 8), (30, 5), (30, 8), (40, 5), (40, 8), (40, 10)]
+# above, enumerating the combinations takes too long
+MAX_ENUMERATED_COMBINATIONS = 200000
+
+
+def nb_combinations(n, t):
+    return math.factorial(n) // (math.factorial(t) * math.factorial(n - t))
+
+
+def make_case(rand, nb_journeys):
+    sections_masks = [sum(1 << i for i in rand.sample(range(NB_SECTIONS), rand.randint(1, 4)))
+                      for _ in range(nb_journeys)]
+    durations = [rand.randint(0, 3600) for _ in range(nb_journeys)]
+    must_keep = sorted(rand.sample(range(nb_journeys), NB_MUST_KEEP))
+    return sections_masks, durations, must_keep
+
+
+def timed(f, *args):
+    start = time.time()
+    res = f(*args)
+    return res, time.time() - start
+
+
+def main():
+    rand = random.Random(42)
+    for nb_journeys, nb_journeys_to_find in SIZES:
+        enumerated = nb_combinations(nb_journeys, nb_journeys_to_find) <= MAX_ENUMERATED_COMBINATIONS
+        worst_bnb, worst_enum = 0, 0
+        for _ in range(NB_CASES):
+            sections_masks, durations, must_keep = make_case(rand, nb_journeys)
+            best, duration = timed(new_default._get_best_combination, sections_masks, durations,
+                                   nb_journeys_to_find, must_keep)
+            worst_bnb = max(worst_bnb, duration)
+            if enumerated:
+                matrix = np.array([[mask >> i & 1 for i in range(NB_SECTIONS)] for mask in sections_masks])
+                expected, duration = timed(_get_best_combination_by_enumeration, matrix, durations,
+                                           nb_journeys_to_find, must_keep)
+                assert best == expected
+                worst_enum = max(worst_enum, duration)
+
+        print('n={}, t={}: branch and bound {:.1f} ms, enumeration {}'.format(
+            nb_journeys, nb_journeys_to_find, worst_bnb * 1e3,
+            '{:.1f} ms'.format(worst_enum * 1e3) if enumerated else '-'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+"""
+Microbenchmark of the lookup of the instances containing a coordinate
+
+    cd source/jormungandr && python benchmarks/geometries_index_benchmark.py
+
+compares the test of the shapes of all the instances (as done before the GeometriesIndex) with the
+lookup of the candidates in the index followed by the test of their prepared shapes, on synthetic
+instances (random polygons of 200 vertices spread over Europe)
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+from collections import namedtuple
+import math
+import random
+import timeit
+from shapely import geometry
+from shapely.prepared import prep
+from jormungandr.instance_manager import GeometriesIndex
+
+NB_INSTANCES = 300
+NB_VERTICES = 200
+NB_POINTS = 2000
+
+FakeInstance = namedtuple('FakeInstance', ['name', 'geom', 'prepared_geom'])
+
+
+def make_instance(rand, idx):
+    lon, lat = rand.uniform(-10, 30), rand.uniform(36, 60)
+    radius = rand.uniform(0.1, 1.5)
+    coords = []
+    for v in range(NB_VERTICES):
+        angle = 2 * math.pi * v / NB_VERTICES
+        r = radius * rand.uniform(0.8, 1)
+        coords.append((lon + r * math.cos(angle), lat + r * math.sin(angle)))
+    geom = geometry.Polygon(coords)
+    return FakeInstance('instance_{}'.format(idx), geom, prep(geom))
+
+
+def main():
+    rand = random.Random(42)
+    instances = [make_instance(rand, i) for i in range(NB_INSTANCES)]
+    points = [geometry.Point(rand.uniform(-10, 30), rand.uniform(36, 60)) for _ in range(NB_POINTS)]
+    index = GeometriesIndex(instances)
+
+    def full_scan():
+        return [[i.name for i in instances if i.geom.contains(p)] for p in points]
+
+    def indexed():
+        return [[i.name for i in index.candidates(p) if i.prepared_geom.contains(p)] for p in points]
+
+    assert full_scan() == indexed()
+    for name, f in (('full scan', full_scan), ('index', indexed)):
+        duration = min(timeit.repeat(f, number=1, repeat=3))
+        print('{}: {:.1f} us per lookup'.format(name, duration / NB_POINTS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+
+"""
+Microbenchmark of the calls to a realtime service
+
+    cd source/jormungandr && python benchmarks/http_session_benchmark.py
+
+compares a new connection by call (requests.get, as the proxies did before) with the pooled keep-alive
+session shared by the proxies (realtime_schedule.http_session), on NB_CALLS calls to a local stub of a
+service over plain http, so without the cost of the tls handshake saved on a remote https service
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+import time
+import requests
+from jormungandr.realtime_schedule.http_session import PooledSession
+from jormungandr.realtime_schedule.tests.utils import http_stub
+
+NB_CALLS = 500
+RESPONSE = {'passages': [{'stop': 'stop_{}'.format(i), 'time': '12:{:02d}'.format(i)} for i in range(50)]}
+
+
+def main():
+    with http_stub({'/passages': RESPONSE}) as server:
+        url = 'http://127.0.0.1:{}/passages'.format(server.server_port)
+        session = PooledSession()
+        for name, get in (('requests.get', requests.get), ('pooled session', session.get)):
+            assert get(url, timeout=1).json() == RESPONSE
+            start = time.time()
+            for _ in range(NB_CALLS):
+                get(url, timeout=1)
+            print('{}: {:.2f} ms per call'.format(name, (time.time() - start) / NB_CALLS * 1e3))
+        print('pooled session: {}'.format(session.host_stats(url)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+"""
+Microbenchmark of the reading of the parameters of an instance by a request
+
+    cd source/jormungandr && python benchmarks/instance_params_benchmark.py
+
+compares updated_request_with_default reading the parameters from the InstanceParams snapshot with
+the former way: each parameter read on the database row (stored in flask.g for the request) with
+get_value_or_default
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+import logging
+import timeit
+import flask
+import zmq
+from navitiacommon import models
+from navitiacommon.default_values import get_value_or_default
+from jormungandr import app
+from jormungandr.instance import Instance
+from jormungandr.scenarios.utils import updated_request_with_default
+
+NB_REQUESTS = 2000
+
+
+class RowInstance(object):
+    """
+    the instance reading its parameters on its database row, as before the snapshot
+    """
+    def __init__(self, instance_db):
+        self.name = 'bench'
+        self.instance_db = instance_db
+
+    def get_models(self):
+        if self.name not in flask.g.instances_model:
+            flask.g.instances_model[self.name] = self.instance_db
+        return flask.g.instances_model[self.name]
+
+    def __getattr__(self, param):
+        return get_value_or_default(param, self.get_models(), self.name)
+
+
+def make_request():
+    return {k: None for k in ('max_walking_duration_to_pt', 'max_bike_duration_to_pt', 'max_bss_duration_to_pt',
+                              'max_car_duration_to_pt', 'max_transfers', 'walking_speed', 'bike_speed',
+                              'bss_speed', 'car_speed', '_min_car', '_min_bike')}
+
+
+def main():
+    # the default values are logged when they are used, not what we want to measure
+    logging.getLogger('navitiacommon.default_values').setLevel(logging.ERROR)
+    instance_db = models.Instance('bench')
+    instance_db.walking_speed = 1.2
+    instance_db.max_nb_transfers = 5
+
+    snapshot_instance = Instance(zmq.Context(), 'bench', 'ipc:///tmp/bench')
+    snapshot_instance._get_models = lambda: instance_db
+    row_instance = RowInstance(instance_db)
+
+    with app.test_request_context('/'):
+        flask.g.instances_model = {}
+        for name, instance in (('database row', row_instance), ('snapshot', snapshot_instance)):
+            def run():
+                for _ in range(NB_REQUESTS):
+                    updated_request_with_default(make_request(), instance)
+            duration = min(timeit.repeat(run, number=1, repeat=3))
+            print('{}: {:.1f} us per request'.format(name, duration / NB_REQUESTS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+
+"""
+Microbenchmark of the marshalling of a journeys response
+
+    cd source/jormungandr && python benchmarks/journeys_marshal_benchmark.py
+
+compares the marshalling with the journeys schema and with its compiled version (fields.compile_fields)
+on the response of the golden tests of the fields, duplicated to get NB_JOURNEYS journeys
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+import json
+import timeit
+import flask
+import pytz
+from flask.ext.restful import marshal
+from jormungandr import app
+from jormungandr.interfaces.v1.Journeys import journeys, compiled_journeys
+from jormungandr.interfaces.v1.test.fields_tests import build_journeys_response
+
+NB_JOURNEYS = 20
+NB_RESPONSES = 20
+
+
+def main():
+    response = build_journeys_response()
+    model = list(response.journeys)
+    while len(response.journeys) < NB_JOURNEYS:
+        response.journeys.add().CopyFrom(model[len(response.journeys) % len(model)])
+
+    with app.test_request_context('/'):
+        flask.g.timezone = pytz.timezone('Europe/Paris')
+        output = json.dumps(marshal(response, journeys))
+        assert json.dumps(marshal(response, compiled_journeys)) == output
+        print('{} journeys, {} bytes'.format(len(response.journeys), len(output)))
+        for name, schema in (('schema', journeys), ('compiled schema', compiled_journeys)):
+            duration = min(timeit.repeat(lambda: marshal(response, schema), number=NB_RESPONSES, repeat=5))
+            print('{}: {:.1f} ms per response'.format(name, duration / NB_RESPONSES * 1e3))
+
+
+if __name__ == '__main__':
+    main()
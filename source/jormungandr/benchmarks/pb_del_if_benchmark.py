@@ -0,0 +1,86 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+
+"""
+Microbenchmark of the deletion of elements of a protobuf list
+
+    cd source/jormungandr && python benchmarks/pb_del_if_benchmark.py
+
+compares the deletion one element at a time (utils.pb_del_if) with the rebuild of the list
+(utils.pb_del_if(bulk=True)) on lists of journeys of several sizes, deleting more or less of them,
+not counting the construction of the lists
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+import time
+from navitiacommon import response_pb2
+from jormungandr.utils import pb_del_if
+
+SIZES = [10, 100, 1000]
+# deleted elements: name, predicate on the index of the element
+DELETIONS = [('1 in 2', lambda i: i % 2 == 0),
+             ('9 in 10', lambda i: i % 10 != 0),
+             ('1 in 10', lambda i: i % 10 == 0)]
+NB_RUNS = 20
+
+
+def make_response(size):
+    response = response_pb2.Response()
+    for i in range(size):
+        journey = response.journeys.add()
+        journey.duration = i
+        journey.tags.append('journey_{}'.format(i))
+    return response
+
+
+def best_duration(size, to_delete, bulk):
+    """
+    best time of pb_del_if over NB_RUNS lists, not counting their construction
+    """
+    durations = []
+    for _ in range(NB_RUNS):
+        response = make_response(size)
+        start = time.time()
+        pb_del_if(response.journeys, lambda j: to_delete(j.duration), bulk=bulk)
+        durations.append(time.time() - start)
+    return min(durations)
+
+
+def main():
+    for name, to_delete in DELETIONS:
+        for size in SIZES:
+            one_by_one, bulk = make_response(size), make_response(size)
+            nb_deleted = pb_del_if(one_by_one.journeys, lambda j: to_delete(j.duration))
+            assert pb_del_if(bulk.journeys, lambda j: to_delete(j.duration), bulk=True) == nb_deleted
+            assert [j.duration for j in one_by_one.journeys] == [j.duration for j in bulk.journeys]
+
+            print('{} deleted, {} elements: one by one {:.0f} us, bulk {:.0f} us'.format(
+                name, size, best_duration(size, to_delete, False) * 1e6, best_duration(size, to_delete, True) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+
+"""
+Microbenchmark of the filtering of the similar journeys
+
+    cd source/jormungandr && python benchmarks/similar_journeys_benchmark.py
+
+compares the grouping of the journeys by signature (journey_filter._filter_similar_journeys) with the
+comparison of all the pairs of journeys it replaced, on NB_JOURNEYS synthetic journeys of 1 to 3 public
+transport sections, their vehicle journeys drawn among few to many distinct ones
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+import random
+import time
+from navitiacommon import response_pb2
+from jormungandr.scenarios import journey_filter
+from jormungandr.scenarios.tests.journey_compare_tests import _filter_similar_vj_journeys_by_pairs
+
+NB_JOURNEYS = 200
+NB_VJS = [5, 50, 1000]
+NB_RUNS = 5
+
+
+def make_response(rand, nb_vjs):
+    response = response_pb2.Response()
+    for i in range(NB_JOURNEYS):
+        journey = response.journeys.add()
+        journey.internal_id = 'j{}'.format(i)
+        journey.departure_date_time = rand.randint(0, 3600)
+        journey.duration = rand.randint(600, 3600)
+        journey.arrival_date_time = journey.departure_date_time + journey.duration
+        for _ in range(rand.randint(1, 3)):
+            section = journey.sections.add()
+            section.type = response_pb2.PUBLIC_TRANSPORT
+            section.pt_display_informations.uris.vehicle_journey = 'vj{}'.format(rand.randint(0, nb_vjs - 1))
+    return response
+
+
+def best_duration(response, filter_journeys, request):
+    """
+    best time of the filter over NB_RUNS copies of the response, not counting the copies
+    """
+    durations = []
+    for _ in range(NB_RUNS):
+        copy = response_pb2.Response()
+        copy.CopyFrom(response)
+        start = time.time()
+        filter_journeys(list(copy.journeys), request)
+        durations.append(time.time() - start)
+    return min(durations)
+
+
+def main():
+    rand = random.Random(42)
+    request = {'clockwise': True}
+    for nb_vjs in NB_VJS:
+        response = make_response(rand, nb_vjs)
+
+        by_signature = response_pb2.Response()
+        by_signature.CopyFrom(response)
+        journey_filter._filter_similar_vj_journeys(list(by_signature.journeys), request)
+        by_pairs = response_pb2.Response()
+        by_pairs.CopyFrom(response)
+        _filter_similar_vj_journeys_by_pairs(list(by_pairs.journeys), request)
+        assert [list(j.tags) for j in by_signature.journeys] == [list(j.tags) for j in by_pairs.journeys]
+        nb_deleted = sum(1 for j in by_signature.journeys if 'to_delete' in j.tags)
+
+        print('{} journeys, {} distinct vjs, {} similar journeys deleted'.format(NB_JOURNEYS, nb_vjs, nb_deleted))
+        for name, f in (('pairs', _filter_similar_vj_journeys_by_pairs),
+                        ('signature', journey_filter._filter_similar_vj_journeys)):
+            print('  {}: {:.1f} ms'.format(name, best_duration(response, f, request) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
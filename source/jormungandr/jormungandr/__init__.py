@@ -35,11 +35,11 @@ import logging.config
 import os
 from flask import Flask, got_request_exception
 from flask_restful import Api
-from flask.ext.cache import Cache
 from flask.ext.cors import CORS
 import sys
 from jormungandr.exceptions import log_exception
 from jormungandr.helper import ReverseProxied, NavitiaRequest
+from jormungandr.two_tier_cache import TwoTierCache
 from jormungandr import compat, utils
 
 app = Flask(__name__)
@@ -69,7 +69,7 @@ rest_api = Api(app, catch_all_404s=True, serve_challenge_on_401=True)
 
 from navitiacommon.models import db
 db.init_app(app)
-cache = Cache(app, config=app.config['CACHE_CONFIGURATION'])
+cache = TwoTierCache(app, config=app.config['CACHE_CONFIGURATION'])
 
 if app.config['AUTOCOMPLETE'] is not None:
     global_autocomplete = utils.create_object(app.config['AUTOCOMPLETE']['class_path'],
@@ -90,7 +90,20 @@ stat_manager = StatManager()
 from jormungandr.parking_space_availability.bss.bss_provider_manager import BssProviderManager
 bss_provider_manager = BssProviderManager()
 
+from jormungandr.warm_up_manager import WarmUpManager
+warm_up_manager = WarmUpManager(i_manager)
+
 from jormungandr import api
 
+# the warm up replays requests, the api must be loaded
+# its thread and sockets must be created in the worker processes, not in the uwsgi master before the fork
+try:
+    from uwsgidecorators import postfork
+    postfork(warm_up_manager.start)
+except ImportError:
+    # not run by uwsgi
+    pass
+app.before_request(warm_up_manager.start)
+
 def setup_package():
     i_manager.stop()
@@ -34,7 +34,7 @@ from __future__ import absolute_import, print_function, unicode_literals, divisi
 import importlib
 from flask_restful.representations import json
 from flask import request, make_response
-from jormungandr import rest_api, app
+from jormungandr import rest_api, app, deadline
 from jormungandr.index import index
 from jormungandr.modules_loader import ModulesLoader
 import ujson
@@ -59,6 +59,11 @@ def output_json(data, code, headers=None):
     return resp
 
 
+@app.before_request
+def set_request_deadline():
+    deadline.init_request_deadline(request)
+
+
 @app.after_request
 def access_log(response, *args, **kwargs):
     logger = logging.getLogger('jormungandr.access')
@@ -121,6 +121,10 @@ def has_access(region, api, abort, user):
         #no user --> no need to continue, we can abort, a user is mandatory even for free region
         abort_request(user=user)
 
+    # the authorized regions are checked without any query
+    if api in cache_get_authorizations(user).get(region, ()):
+        return True
+
     model_instance = Instance.get_by_name(region)
 
     if not model_instance:
@@ -128,7 +132,7 @@ def has_access(region, api, abort, user):
             raise RegionNotFound(region)
         return False
 
-    if (model_instance.is_free and user.have_access_to_free_instances) or user.has_access(model_instance.id, api):
+    if (model_instance.is_free and user.have_access_to_free_instances) or user.is_super_user:
         return True
     else:
         if abort:
@@ -146,6 +150,17 @@ def cache_get_user(token):
     return User.get_from_token(token, datetime.datetime.now())
 
 
+@cache.memoize(current_app.config['CACHE_CONFIGURATION'].get('TIMEOUT_AUTHENTICATION', 300))
+def cache_get_authorizations(user):
+    """
+    all the authorizations of the user, indexed by instance name, loaded in one query
+    so the checks of all the regions of a request are only lookups in a set.
+
+    As for the user, the changes made in tyr are seen once the cache has expired.
+    """
+    return user.authorized_apis()
+
+
 @cache.memoize(current_app.config['CACHE_CONFIGURATION'].get('TIMEOUT_AUTHENTICATION', 300))
 def cache_get_key(token):
     return Key.get_by_token(token)
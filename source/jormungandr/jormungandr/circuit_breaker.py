@@ -0,0 +1,98 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from datetime import datetime, timedelta
+import pybreaker
+
+
+class CircuitBreaker(pybreaker.CircuitBreaker):
+    """
+    pybreaker holds its lock during the whole guarded call, so the concurrent calls to a service
+    (the parallel kraken calls of a request, the realtime proxies calls) would be made one after the other
+
+    here the lock is held to decide if the call can be made and to update the counter and the state after
+    it, but not during the call. In the half-open state only one trial call is let through, the other
+    calls fail as if the breaker was still open until the trial call is done.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CircuitBreaker, self).__init__(*args, **kwargs)
+        self._trial_call_running = False
+
+    def _before_call(self):
+        """
+        raise CircuitBreakerError if the call cannot be made
+        return True if the call is the trial call of the half-open state
+        """
+        with self._lock:
+            if self.current_state == 'open':
+                if datetime.now() < self._state.opened_at + timedelta(seconds=self.reset_timeout):
+                    raise pybreaker.CircuitBreakerError('Timeout not elapsed yet, circuit breaker still open')
+                self.half_open()
+            if self.current_state == 'half-open':
+                if self._trial_call_running:
+                    raise pybreaker.CircuitBreakerError('Trial call running, circuit breaker still half-open')
+                self._trial_call_running = True
+                return True
+            return False
+
+    def _after_call(self, trial_call, exc=None):
+        with self._lock:
+            if trial_call:
+                self._trial_call_running = False
+            if exc is not None and self.is_system_error(exc):
+                self._inc_counter()
+                for listener in self.listeners:
+                    listener.failure(self, exc)
+                if trial_call:
+                    self.open()
+                    raise pybreaker.CircuitBreakerError('Trial call failed, circuit breaker opened')
+                if self.current_state == 'closed' and self.fail_counter >= self.fail_max:
+                    self.open()
+                    raise pybreaker.CircuitBreakerError('Failures threshold reached, circuit breaker opened')
+            else:
+                self._fail_counter = 0
+                for listener in self.listeners:
+                    listener.success(self)
+                if trial_call:
+                    self.close()
+
+    def call(self, func, *args, **kwargs):
+        trial_call = self._before_call()
+        try:
+            for listener in self.listeners:
+                listener.before_call(self, func, *args, **kwargs)
+            ret = func(*args, **kwargs)
+        except BaseException as e:
+            self._after_call(trial_call, e)
+            raise
+        self._after_call(trial_call)
+        return ret
@@ -0,0 +1,148 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from contextlib import contextmanager
+import logging
+import time
+import flask
+from jormungandr import app
+
+# Time budget of a request
+#
+# The deadline is set at the beginning of the request from REQUEST_TIMEOUT and from the REQUEST_TIMEOUT_HEADER
+# header, it is stored in flask.g (and copied in the threads of the request). Each kraken call only waits for the
+# remaining budget and the scenarios stop looking for more journeys once it is exhausted.
+
+
+class Deadline(object):
+    """
+    >>> deadline = Deadline(timeout=5000)
+    >>> deadline.is_expired()
+    False
+    >>> deadline.cap(10000) <= 5000
+    True
+    >>> Deadline(timeout=0).is_expired()
+    True
+    """
+    def __init__(self, timeout):
+        """
+        timeout in ms
+        """
+        self.timeout = timeout
+        self.end = time.time() + timeout / 1000
+
+    def remaining(self):
+        """
+        remaining time in ms
+        """
+        return max(int((self.end - time.time()) * 1000), 0)
+
+    def is_expired(self):
+        return self.remaining() <= 0
+
+    def cap(self, timeout):
+        """
+        return the timeout (in ms) reduced to the remaining time
+        """
+        return min(timeout, self.remaining())
+
+
+def _get_header_timeout(request):
+    header = app.config.get('REQUEST_TIMEOUT_HEADER')
+    value = request.headers.get(header) if header else None
+    if value is None:
+        return None
+    try:
+        timeout = int(value)
+    except ValueError:
+        logging.getLogger(__name__).info('invalid {} header: {}'.format(header, value))
+        return None
+    return timeout if timeout > 0 else None
+
+
+def init_request_deadline(request):
+    """
+    set the deadline of the request, the header can only reduce the configured timeout
+    """
+    timeouts = [t for t in (app.config.get('REQUEST_TIMEOUT'), _get_header_timeout(request)) if t is not None]
+    flask.g.deadline = Deadline(min(timeouts)) if timeouts else None
+
+
+def get_request_deadline():
+    """
+    return the deadline of the current request, None if there is none
+    """
+    if not flask.has_request_context():
+        return None
+    return getattr(flask.g, 'deadline', None)
+
+
+def cap_timeout(timeout):
+    """
+    return the timeout (in ms) reduced to the remaining time of the current request
+    """
+    deadline = get_request_deadline()
+    return deadline.cap(timeout) if deadline is not None else timeout
+
+
+@contextmanager
+def capped_request_deadline(other_deadline):
+    """
+    within the block, the deadline of the current request is the earliest of its deadline and of other_deadline
+    """
+    if not flask.has_request_context():
+        yield
+        return
+    had_deadline = hasattr(flask.g, 'deadline')
+    request_deadline = getattr(flask.g, 'deadline', None)
+    if request_deadline is None or other_deadline.end < request_deadline.end:
+        flask.g.deadline = other_deadline
+    try:
+        yield
+    finally:
+        if had_deadline:
+            flask.g.deadline = request_deadline
+        else:
+            del flask.g.deadline
+
+
+def is_exhausted():
+    deadline = get_request_deadline()
+    return deadline is not None and deadline.is_expired()
+
+
+def flag_partial_response():
+    """
+    the response is incomplete because the deadline has been reached
+    """
+    if flask.has_request_context():
+        flask.g.partial_response = True
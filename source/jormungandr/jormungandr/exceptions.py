@@ -34,7 +34,7 @@ import logging
 
 
 __all__ = ["RegionNotFound", "DeadSocketException", "ApiNotFound",
-           "InvalidArguments"]
+           "InvalidArguments", "DeadlineExceeded"]
 
 
 def format_error(code, message):
@@ -90,6 +90,15 @@ class DeadSocketException(HTTPException):
         self.code = 503
 
 
+class DeadlineExceeded(HTTPException):
+
+    def __init__(self, region):
+        super(DeadlineExceeded, self).__init__()
+        error = 'The request on {} has not been answered before its deadline'.format(region)
+        self.data = format_error("deadline_exceeded", error)
+        self.code = 504
+
+
 class ApiNotFound(HTTPException):
 
     def __init__(self, api):
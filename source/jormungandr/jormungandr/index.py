@@ -29,12 +29,14 @@
 
 from __future__ import absolute_import, print_function, unicode_literals, division
 from flask.ext.restful import Resource
+from jormungandr import warm_up_manager
 from jormungandr.modules_loader import ModulesLoader
 from jormungandr.interfaces.v1.make_links import create_external_link
 
 
 def index(api):
     api.add_resource(Index, '/')
+    api.add_resource(Readiness, '/readiness')
 
 
 class Index(Resource):
@@ -56,3 +58,12 @@ class Index(Resource):
         return resp
 
 
+
+
+class Readiness(Resource):
+    """
+    the process can receive requests once it has been warmed up
+    """
+    def get(self):
+        status = warm_up_manager.status()
+        return status, 200 if status['ready'] else 503
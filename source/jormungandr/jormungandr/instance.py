@@ -32,23 +32,26 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 from contextlib import contextmanager
 import queue
+import time
 from threading import Lock
 from flask.ext.restful import abort
 import zmq
 from navitiacommon import response_pb2, request_pb2, type_pb2
 from navitiacommon.default_values import get_value_or_default
 import logging
-from .exceptions import DeadSocketException
+from .exceptions import DeadSocketException, DeadlineExceeded
 from navitiacommon import models
 from importlib import import_module
-from jormungandr import cache, app
+from jormungandr import app
 from shapely import wkt
 from shapely.geos import ReadingError
 from shapely import geometry
+from shapely.prepared import prep
 from flask import g
 import flask
 import pybreaker
-from jormungandr import georef, planner, schedule, realtime_schedule
+from jormungandr.circuit_breaker import CircuitBreaker
+from jormungandr import georef, planner, schedule, realtime_schedule, uri_index, deadline, parallel
 
 type_to_pttype = {
       "stop_area": request_pb2.PlaceCodeRequest.StopArea,
@@ -61,19 +64,47 @@ type_to_pttype = {
       "calendar": request_pb2.PlaceCodeRequest.Calendar
 }
 
-@app.before_request
-def _init_g():
-    g.instances_model = {}
+class InstanceParams(object):
+    """
+    Immutable snapshot of the parameters of an instance, built from its row in the database
+    (or the default values if the instance is not in the database)
+
+    The parameters are read for each request, this way we don't have to access the database model each time
+    """
+    PARAMS = ('journey_order', 'max_walking_duration_to_pt', 'max_bss_duration_to_pt', 'max_bike_duration_to_pt',
+              'max_car_duration_to_pt', 'walking_speed', 'bss_speed', 'bike_speed', 'car_speed',
+              'max_nb_transfers', 'min_tc_with_car', 'min_tc_with_bike', 'min_tc_with_bss', 'min_bike', 'min_bss',
+              'min_car', 'factor_too_long_journey', 'min_duration_too_long_journey', 'max_duration_criteria',
+              'max_duration_fallback_mode', 'priority', 'bss_provider', 'max_duration',
+              'walking_transfer_penalty', 'night_bus_filter_max_factor', 'night_bus_filter_base_factor')
+
+    __slots__ = PARAMS + ('is_free', 'scenario', 'creation_time')
+
+    def __init__(self, instance_db, instance_name):
+        for param in self.PARAMS:
+            object.__setattr__(self, param, get_value_or_default(param, instance_db, instance_name))
+        object.__setattr__(self, 'is_free', instance_db.is_free if instance_db else False)
+        object.__setattr__(self, 'scenario', instance_db.scenario if instance_db else 'default')
+        object.__setattr__(self, 'creation_time', time.time())
+
+    def __setattr__(self, key, value):
+        raise AttributeError('the parameters of an instance cannot be modified')
 
 
 class Instance(object):
 
     def __init__(self, context, name, zmq_socket, realtime_proxies_configuration=[]):
         self.geom = None
+        self.geom_wkt = None
+        # prepared version of the geom, for fast containment tests
+        self.prepared_geom = None
+        # called when a new geom has been loaded
+        self.on_geom_update = None
         self._sockets = queue.Queue()
         self.socket_path = zmq_socket
         self._scenario = None
         self._scenario_name = None
+        self._params = None
         self.nb_created_socket = 0
         self.lock = Lock()
         self.context = context
@@ -81,8 +112,14 @@ class Instance(object):
         self.timezone = None  # timezone will be fetched from the kraken
         self.publication_date = -1
         self.is_up = True
-        self.breaker = pybreaker.CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_INSTANCE_FAIL'],
-                                                reset_timeout=app.config['CIRCUIT_BREAKER_INSTANCE_TIMEOUT_S'])
+        self.uri_index = None
+        # publication date of the data whose uri index is being built in background
+        self.uri_index_building = None
+        self.uri_index_lock = Lock()
+        # a request running out of time does not mean that kraken is dead
+        self.breaker = CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_INSTANCE_FAIL'],
+                                      reset_timeout=app.config['CIRCUIT_BREAKER_INSTANCE_TIMEOUT_S'],
+                                      exclude=[DeadlineExceeded])
         self.georef = georef.Kraken(self)
         self.planner = planner.Kraken(self)
 
@@ -91,12 +128,26 @@ class Instance(object):
         from jormungandr.autocomplete.kraken import Kraken
         self.autocomplete = Kraken()
 
-    def get_models(self):
-        if self.name not in g.instances_model:
-            g.instances_model[self.name] = self._get_models()
-        return g.instances_model[self.name]
+    @property
+    def params(self):
+        """
+        the parameters of the instance, they are refreshed every TIMEOUT_PARAMS or after an invalidation
+
+        the snapshot is the only cache of the database row, so a change is seen after TIMEOUT_PARAMS at most
+        """
+        params = self._params
+        timeout = app.config['CACHE_CONFIGURATION'].get('TIMEOUT_PARAMS', 300)
+        if params is None or time.time() - params.creation_time > timeout:
+            params = InstanceParams(self._get_models(), self.name)
+            self._params = params
+        return params
+
+    def invalidate_params(self):
+        """
+        the parameters will be read again from the database by the next request
+        """
+        self._params = None
 
-    @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_PARAMS', 300))
     def _get_models(self):
         if app.config['DISABLE_DATABASE']:
             return None
@@ -121,156 +172,145 @@ class Instance(object):
             g.scenario = scenario
             return scenario
 
-        instance_db = self.get_models()
-        scenario_name = instance_db.scenario if instance_db else 'default'
+        #we save the used scenario for future use
+        g.scenario = self.load_scenario()
+        return g.scenario
+
+    def load_scenario(self):
+        """
+        return the configured scenario of the instance, its module is imported the first time
+        """
+        scenario_name = self.params.scenario
         if not self._scenario or scenario_name != self._scenario_name:
             logger = logging.getLogger(__name__)
             logger.info('loading of scenario %s for instance %s', scenario_name, self.name)
             self._scenario_name = scenario_name
             module = import_module('jormungandr.scenarios.{}'.format(scenario_name))
             self._scenario = module.Scenario()
-
-        #we save the used scenario for future use
-        g.scenario = self._scenario
         return self._scenario
 
     @property
     def journey_order(self):
-        instance_db = self.get_models()
-        return get_value_or_default('journey_order', instance_db, self.name)
+        return self.params.journey_order
 
     @property
     def max_walking_duration_to_pt(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_walking_duration_to_pt', instance_db, self.name)
+        return self.params.max_walking_duration_to_pt
 
     @property
     def max_bss_duration_to_pt(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_bss_duration_to_pt', instance_db, self.name)
+        return self.params.max_bss_duration_to_pt
 
     @property
     def max_bike_duration_to_pt(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_bike_duration_to_pt', instance_db, self.name)
+        return self.params.max_bike_duration_to_pt
 
     @property
     def max_car_duration_to_pt(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_car_duration_to_pt', instance_db, self.name)
+        return self.params.max_car_duration_to_pt
 
     @property
     def walking_speed(self):
-        instance_db = self.get_models()
-        return get_value_or_default('walking_speed', instance_db, self.name)
+        return self.params.walking_speed
 
     @property
     def bss_speed(self):
-        instance_db = self.get_models()
-        return get_value_or_default('bss_speed', instance_db, self.name)
+        return self.params.bss_speed
 
     @property
     def bike_speed(self):
-        instance_db = self.get_models()
-        return get_value_or_default('bike_speed', instance_db, self.name)
+        return self.params.bike_speed
 
     @property
     def car_speed(self):
-        instance_db = self.get_models()
-        return get_value_or_default('car_speed', instance_db, self.name)
+        return self.params.car_speed
 
     @property
     def max_nb_transfers(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_nb_transfers', instance_db, self.name)
+        return self.params.max_nb_transfers
 
     @property
     def min_tc_with_car(self):
-        instance_db = self.get_models()
-        return get_value_or_default('min_tc_with_car', instance_db, self.name)
+        return self.params.min_tc_with_car
 
     @property
     def min_tc_with_bike(self):
-        instance_db = self.get_models()
-        return get_value_or_default('min_tc_with_bike', instance_db, self.name)
+        return self.params.min_tc_with_bike
 
     @property
     def min_tc_with_bss(self):
-        instance_db = self.get_models()
-        return get_value_or_default('min_tc_with_bss', instance_db, self.name)
+        return self.params.min_tc_with_bss
 
     @property
     def min_bike(self):
-        instance_db = self.get_models()
-        return get_value_or_default('min_bike', instance_db, self.name)
+        return self.params.min_bike
 
     @property
     def min_bss(self):
-        instance_db = self.get_models()
-        return get_value_or_default('min_bss', instance_db, self.name)
+        return self.params.min_bss
 
     @property
     def min_car(self):
-        instance_db = self.get_models()
-        return get_value_or_default('min_car', instance_db, self.name)
+        return self.params.min_car
 
     @property
     def factor_too_long_journey(self):
-        instance_db = self.get_models()
-        return get_value_or_default('factor_too_long_journey', instance_db, self.name)
+        return self.params.factor_too_long_journey
 
     @property
     def min_duration_too_long_journey(self):
-        instance_db = self.get_models()
-        return get_value_or_default('min_duration_too_long_journey', instance_db, self.name)
+        return self.params.min_duration_too_long_journey
 
     @property
     def max_duration_criteria(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_duration_criteria', instance_db, self.name)
+        return self.params.max_duration_criteria
 
     @property
     def max_duration_fallback_mode(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_duration_fallback_mode', instance_db, self.name)
+        return self.params.max_duration_fallback_mode
 
     @property
     def priority(self):
-        instance_db = self.get_models()
-        return get_value_or_default('priority', instance_db, self.name)
+        return self.params.priority
 
     @property
     def bss_provider(self):
-        instance_db = self.get_models()
-        return get_value_or_default('bss_provider', instance_db, self.name)
-    
+        return self.params.bss_provider
+
     @property
     def is_free(self):
-        instance_db = self.get_models()
-        if not instance_db:
-            return False
-        else:
-            return instance_db.is_free
+        return self.params.is_free
 
     @property
     def max_duration(self):
-        instance_db = self.get_models()
-        return get_value_or_default('max_duration', instance_db, self.name)
+        return self.params.max_duration
 
     @property
     def walking_transfer_penalty(self):
-        instance_db = self.get_models()
-        return get_value_or_default('walking_transfer_penalty', instance_db, self.name)
+        return self.params.walking_transfer_penalty
 
     @property
     def night_bus_filter_max_factor(self):
-        instance_db = self.get_models()
-        return get_value_or_default('night_bus_filter_max_factor', instance_db, self.name)
+        return self.params.night_bus_filter_max_factor
 
     @property
     def night_bus_filter_base_factor(self):
-        instance_db = self.get_models()
-        return get_value_or_default('night_bus_filter_base_factor', instance_db, self.name)
+        return self.params.night_bus_filter_base_factor
+
+    def _create_socket(self, context):
+        socket = context.socket(zmq.REQ)
+        socket.connect(self.socket_path)
+        self.lock.acquire()
+        self.nb_created_socket += 1
+        self.lock.release()
+        return socket
+
+    def open_sockets(self, nb_sockets):
+        """
+        fill the pool with nb_sockets sockets, the first requests won't have to create them
+        """
+        while self._sockets.qsize() < nb_sockets:
+            self._sockets.put(self._create_socket(self.context))
 
     @contextmanager
     def socket(self, context):
@@ -278,11 +318,7 @@ class Instance(object):
         try:
             socket = self._sockets.get(block=False)
         except queue.Empty:
-            socket = context.socket(zmq.REQ)
-            socket.connect(self.socket_path)
-            self.lock.acquire()
-            self.nb_created_socket += 1
-            self.lock.release()
+            socket = self._create_socket(context)
         try:
             yield socket
         finally:
@@ -303,6 +339,14 @@ class Instance(object):
                          request,
                          timeout=app.config.get('INSTANCE_TIMEOUT', 10000),
                          quiet=False):
+        request_deadline = deadline.get_request_deadline()
+        if request_deadline is not None:
+            if request_deadline.is_expired():
+                raise DeadlineExceeded(self.name)
+            timeout = request_deadline.cap(timeout)
+        if parallel.is_cancelled():
+            # the result of the call is not needed by the request anymore, we stop as if its time had run out
+            raise DeadlineExceeded(self.name)
         with self.socket(self.context) as socket:
             try:
                 request.request_id = flask.request.id
@@ -319,6 +363,8 @@ class Instance(object):
             else:
                 socket.setsockopt(zmq.LINGER, 0)
                 socket.close()
+                if request_deadline is not None and request_deadline.is_expired():
+                    raise DeadlineExceeded(self.name)
                 if not quiet:
                     logger = logging.getLogger(__name__)
                     logger.error('request on %s failed: %s', self.socket_path, unicode(request))
@@ -342,12 +388,60 @@ class Instance(object):
         except DeadSocketException:
             return False
 
+    def may_have_id(self, id_):
+        """
+        Answer locally if this instance may have this id
+
+        False means that the instance surely doesn't have it, if True kraken has to be asked (with has_id)
+        """
+        if not self.is_up:
+            return False
+        index = self.uri_index
+        if index is None or index.publication_date != self.publication_date:
+            # no index or an index of old data, we can't tell
+            return True
+        return index.may_contain(id_)
+
+    def update_uri_index(self):
+        """
+        build the index of the uris of the instance if the data have changed since the last one
+
+        the index is built in background (it pages through all the objects of the instance) and
+        replaces the old one once ready, the old one is ignored in the meantime
+
+        return the future of the build, None if there is nothing to build
+        """
+        types = app.config.get('URI_INDEX_TYPES')
+        if not types or not self.is_up:
+            return
+        publication_date = self.publication_date
+        with self.uri_index_lock:
+            if self.uri_index is not None and self.uri_index.publication_date == publication_date:
+                return
+            if self.uri_index_building == publication_date:
+                return
+            self.uri_index_building = publication_date
+        return parallel.spawn(self._build_uri_index, types, publication_date)
+
+    def _build_uri_index(self, types, publication_date):
+        index = None
+        try:
+            index = uri_index.build_uri_index(self, types, publication_date)
+        except DeadSocketException:
+            logging.getLogger(__name__).warn('impossible to build the uri index of {}'.format(self.name))
+        except Exception:
+            logging.getLogger(__name__).exception('error while building the uri index of {}'.format(self.name))
+        finally:
+            with self.uri_index_lock:
+                self.uri_index = index
+                self.uri_index_building = None
+
     def has_coord(self, lon, lat):
         return self.has_point(geometry.Point(lon, lat))
 
     def has_point(self, p):
         try:
-            return self.is_up and self.geom and self.geom.contains(p)
+            return self.is_up and self.prepared_geom is not None and self.prepared_geom.contains(p)
         except DeadSocketException:
             return False
 
@@ -384,16 +478,31 @@ class Instance(object):
         """
         if response.HasField(b"metadatas") and response.publication_date != self.publication_date:
             with self.lock as lock:
-                if response.metadatas.shape and response.metadatas.shape != "":
-                    try:
-                        self.geom = wkt.loads(response.metadatas.shape)
-                    except ReadingError:
-                        self.geom = None
+                shape = response.metadatas.shape
+                if shape and shape != "":
+                    # the shape is sent with each metadata, we only load it again if it has changed
+                    if shape != self.geom_wkt:
+                        try:
+                            self.set_geom(wkt.loads(shape), shape)
+                        except ReadingError:
+                            self.set_geom(None, shape)
                     self.is_up = True
                 else:
-                    self.geom = None
+                    self.set_geom(None)
                 self.timezone = response.metadatas.timezone
 
+    def set_geom(self, geom, geom_wkt=None):
+        """
+        geom_wkt is the wkt the geom has been loaded from
+        """
+        self.geom_wkt = geom_wkt
+        if geom is None and self.geom is None:
+            return
+        self.geom = geom
+        self.prepared_geom = prep(geom) if geom is not None else None
+        if self.on_geom_update:
+            self.on_geom_update()
+
     def init(self):
         """
         Get and store variables of the instance.
@@ -405,12 +514,16 @@ class Instance(object):
             resp = self.send_and_receive(req, timeout=1000, quiet=True)
             self.update_property(resp)
             #the instance is automatically updated on a call
+            purge_cache_needed = False
             if resp.HasField(b'publication_date') and self.publication_date != resp.publication_date:
                 self.publication_date = resp.publication_date
-                return True
+                purge_cache_needed = True
+            # the publication date can also have been updated by a request, so we always check the index
+            self.update_uri_index()
+            return purge_cache_needed
         except DeadSocketException:
             #but if there is a error, we reset the geom manually
-            self.geom = None
+            self.set_geom(None)
             self.is_up = False
             if self.publication_date != -1:
                 self.publication_date = -1
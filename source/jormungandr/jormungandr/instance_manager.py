@@ -32,18 +32,23 @@ from __future__ import absolute_import, print_function, unicode_literals, divisi
 from flask import json
 
 from shapely import geometry
+from collections import defaultdict
 import configparser
+import math
 import zmq
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 from navitiacommon import type_pb2, request_pb2, models
 import glob
 import logging
 from jormungandr.protobuf_to_dict import protobuf_to_dict
 from jormungandr.exceptions import ApiNotFound, RegionNotFound,\
     DeadSocketException, InvalidArguments
-from jormungandr import authentication, cache, app
+from jormungandr import authentication, cache, app, parallel, deadline
 from jormungandr.instance import Instance
 
+# time (in s) given to the krakens over their timeout to tell if they have an object
+HAS_ID_MARGIN = 0.5
+
 
 def instances_comparator(instance1, instance2):
     """
@@ -85,6 +90,54 @@ def choose_best_instance(instances):
             best = i
     return best
 
+class GeometriesIndex(object):
+    """
+    spatial index of the bounding boxes of the instances' shapes
+
+    the boxes are registered in the cells of a regular grid (in degrees) they overlap, the boxes
+    overlapping too many cells (a whole country, the world) are kept apart and always checked.
+    It only gives the candidates instances for a point, the exact test must be done on the shape
+
+    >>> from shapely.geometry import Point
+    >>> from collections import namedtuple
+    >>> I = namedtuple('I', ['name', 'geom'])
+    >>> paris, world = I('paris', Point(2.35, 48.85).buffer(0.2)), I('world', Point(0, 0).buffer(180))
+    >>> index = GeometriesIndex([world, paris])
+    >>> print(', '.join(i.name for i in index.candidates(Point(2.3, 48.9))))
+    world, paris
+    >>> print(', '.join(i.name for i in index.candidates(Point(-73.9, 40.7))))
+    world
+    """
+    def __init__(self, instances, cell_size=1.0, max_cells=400):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.large_boxes = []
+        for position, instance in enumerate(instances):
+            if instance.geom is None:
+                continue
+            min_x, min_y, max_x, max_y = bounds = instance.geom.bounds
+            box = (position, instance, bounds)
+            x_cells = range(self._cell(min_x), self._cell(max_x) + 1)
+            y_cells = range(self._cell(min_y), self._cell(max_y) + 1)
+            if len(x_cells) * len(y_cells) > max_cells:
+                self.large_boxes.append(box)
+                continue
+            for x in x_cells:
+                for y in y_cells:
+                    self.cells[(x, y)].append(box)
+
+    def _cell(self, coord):
+        return int(math.floor(coord / self.cell_size))
+
+    def candidates(self, p):
+        """
+        return the instances whose bounding box contains the point, in the order of the instances
+        """
+        boxes = self.cells.get((self._cell(p.x), self._cell(p.y)), []) + self.large_boxes
+        return [i for _, i, (min_x, min_y, max_x, max_y) in sorted(boxes, key=lambda b: b[0])
+                if min_x <= p.x <= max_x and min_y <= p.y <= max_y]
+
+
 class InstanceManager(object):
 
     """
@@ -113,6 +166,8 @@ class InstanceManager(object):
         self.instances = {}
         self.context = zmq.Context()
         self.default_socket = None
+        self.geometries_index = None
+        self.geometries_index_lock = Lock()
 
         for file_name in self.configuration_files:
             logging.getLogger(__name__).info("Initialisation, reading file : " + file_name)
@@ -133,6 +188,7 @@ class InstanceManager(object):
                                                  'file {}'.format(file_name))
                 continue
 
+            instance.on_geom_update = self._reset_geometries_index
             self.instances[instance.name] = instance
 
         #we fetch the krakens metadata first
@@ -148,6 +204,8 @@ class InstanceManager(object):
 
     def _clear_cache(self):
         logging.getLogger(__name__).info('clear cache')
+        for instance in self.instances.values():
+            instance.invalidate_params()
         try:
             cache.delete_memoized(self._all_keys_of_id)
         except RuntimeError:
@@ -218,14 +276,47 @@ class InstanceManager(object):
             except:
                 raise InvalidArguments(object_id)
             return self._all_keys_of_coord(flon, flat)
-        instances = [i.name for i in self.instances.values() if i.has_id(object_id)]
+        # we only ask the krakens that might have the object, all at once
+        candidates = [i for i in self.instances.values() if i.may_have_id(object_id)]
+        if len(candidates) > 1:
+            futures = [(i, parallel.spawn(i.has_id, object_id)) for i in candidates]
+            # the calls fail on their own after the kraken timeout, we don't wait much longer for a hung one
+            timeout = deadline.cap_timeout(app.config.get('INSTANCE_TIMEOUT', 10000))
+            parallel.wait_all([f for _, f in futures], timeout=timeout / 1000 + HAS_ID_MARGIN)
+            instances = []
+            for i, f in futures:
+                if not f.done():
+                    logging.getLogger(__name__).error('%s has not answered in time if it has %s, it is ignored',
+                                                      i.name, object_id)
+                    f.cancel()
+                elif f.result():
+                    instances.append(i.name)
+        else:
+            instances = [i.name for i in candidates if i.has_id(object_id)]
         if not instances:
             raise RegionNotFound(object_id=object_id)
         return instances
 
+    def _reset_geometries_index(self):
+        with self.geometries_index_lock:
+            self.geometries_index = None
+
+    def _get_geometries_index(self):
+        """
+        the index is built lazily after a change of the shape of an instance
+        """
+        index = self.geometries_index
+        if index is None:
+            with self.geometries_index_lock:
+                if self.geometries_index is None:
+                    self.geometries_index = GeometriesIndex(self.instances.values())
+                index = self.geometries_index
+        return index
+
     def _all_keys_of_coord(self, lon, lat):
         p = geometry.Point(lon, lat)
-        instances = [i.name for i in self.instances.values() if i.has_point(p)]
+        candidates = self._get_geometries_index().candidates(p)
+        instances = [i.name for i in candidates if i.has_point(p)]
         logging.getLogger(__name__).debug("all_keys_of_coord(self, {}, {}) returns {}".format(lon, lat, instances))
         if not instances:
             raise RegionNotFound(lon=lon, lat=lat)
@@ -34,16 +34,16 @@ import logging
 from flask import request, g
 from flask.ext.restful import fields, reqparse, marshal_with, abort
 from flask.ext.restful.inputs import boolean
-from jormungandr import i_manager
+from jormungandr import i_manager, app, parallel, new_relic
 from jormungandr.exceptions import RegionNotFound
 from jormungandr.instance_manager import instances_comparator
 from jormungandr.interfaces.v1.fields import disruption_marshaller, Links
 from jormungandr.interfaces.v1.fields import display_informations_vj, error, place,\
     PbField, stop_date_time, enum_type, NonNullList, NonNullNested,\
-    SectionGeoJson, Co2Emission, PbEnum, feed_publisher
+    SectionGeoJson, Co2Emission, PbEnum, feed_publisher, compile_fields
 
 from jormungandr.interfaces.parsers import option_value, date_time_format, default_count_arg_type, date_time_format
-from jormungandr.interfaces.v1.ResourceUri import ResourceUri, complete_links
+from jormungandr.interfaces.v1.ResourceUri import ResourceUri, CompleteNotes, CompleteExceptions
 from functools import wraps
 from jormungandr.interfaces.v1.fields import DateTime
 from jormungandr.timezone import set_request_timezone
@@ -147,8 +147,7 @@ class section_type(enum_type):
 class section_place(PbField):
 
     def output(self, key, obj):
-        enum_t = obj.DESCRIPTOR.fields_by_name['type'].enum_type.values_by_name
-        if obj.type == enum_t['WAITING'].number:
+        if obj.type == response_pb2.WAITING:
             return None
         else:
             return super(PbField, self).output(key, obj)
@@ -246,6 +245,9 @@ journeys = {
     "links": fields.List(Links()),
 }
 
+# the journeys responses are big, their schema is compiled once for all
+compiled_journeys = compile_fields(journeys)
+
 
 def dt_represents(value):
     if value == "arrival":
@@ -283,6 +285,25 @@ class add_debug_info(object):
             if hasattr(g, 'regions_called'):
                 get_debug()['regions_called'] = g.regions_called
 
+            if hasattr(g, 'speculative_regions'):
+                get_debug()['speculative_regions'] = g.speculative_regions
+
+            return objects
+        return wrapper
+
+
+class add_partial_response_flag(object):
+    """
+    flag the response when the deadline of the request has been reached before all the journeys were computed
+
+    must be called after the transformation from protobuff to dict
+    """
+    def __call__(self, f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            objects = f(*args, **kwargs)
+            if getattr(g, 'partial_response', False):
+                objects[0]['partial_response'] = True
             return objects
         return wrapper
 
@@ -484,13 +505,46 @@ class Journeys(ResourceUri, ResourceUtc):
                                             " else we consider it as UTC")
 
 
-        self.method_decorators.append(complete_links(self))
+        self.response_plugins.extend([CompleteNotes, CompleteExceptions])
+
+
+    def _spawn_region_call(self, region, args, api):
+        """
+        compute the journeys on a region in another thread
+
+        the datetime is converted here since the conversion depends on the state of the resource
+
+        return the future of the response and the arguments used (completed by the scenario)
+        """
+        region_args = deepcopy(args)
+        region_args['datetime'] = date_to_timestamp(self.convert_to_utc(args['original_datetime'], region))
 
+        def call():
+            set_request_timezone(region)
+            return i_manager.dispatch(region_args, api, instance_name=region)
 
+        return parallel.spawn(call), region_args
+
+    def _record_speculation(self, nb_speculative_regions, winner_idx, ignored_calls):
+        """
+        record if the parallel computation of the regions was useful:
+        it has paid off if the chosen region has been computed at the same time as a region
+        that came before it (or if no region has been chosen, they all have been needed),
+        the computation of the regions after the chosen one has been wasted
+        """
+        if nb_speculative_regions <= 1:
+            return
+        paid_off = winner_idx is None or winner_idx % nb_speculative_regions != 0
+        new_relic.record_custom_parameter('speculative_regions_paid_off', paid_off)
+        new_relic.record_custom_parameter('speculative_regions_wasted', len(ignored_calls))
+        if getattr(g, 'debug', False):
+            g.speculative_regions = {'paid_off': paid_off, 'wasted_calls': len(ignored_calls)}
+
+    @add_partial_response_flag()
     @add_debug_info()
     @add_fare_links()
     @add_journey_href()
-    @marshal_with(journeys)
+    @marshal_with(compiled_journeys)
     @ManageError()
     def get(self, region=None, lon=None, lat=None, uri=None):
         args = self.parsers['get'].parse_args()
@@ -594,9 +648,22 @@ class Journeys(ResourceUri, ResourceUtc):
         self._register_interpreted_parameters(args)
 
         logging.getLogger(__name__).debug("We are about to ask journeys on regions : {}" .format(possible_regions))
+
+        nb_speculative_regions = 1
+        if len(possible_regions) > 1:
+            nb_speculative_regions = max(app.config.get('JOURNEYS_SPECULATIVE_REGIONS_NB', 1), 1)
+        # the regions computed in parallel but not yet examined
+        speculative_calls = {}
+
         #we want to store the different errors
         responses = {}
-        for r in possible_regions:
+        for idx, r in enumerate(possible_regions):
+            if nb_speculative_regions > 1 and r not in speculative_calls:
+                # we launch the computation of the next regions all at once,
+                # but we examine their responses in the order of priority, as we would sequentially
+                for next_region in possible_regions[idx:idx + nb_speculative_regions]:
+                    speculative_calls[next_region] = self._spawn_region_call(next_region, args, api)
+
             self.region = r
 
             #we store the region in the 'g' object, which is local to a request
@@ -608,11 +675,19 @@ class Journeys(ResourceUri, ResourceUtc):
                     g.regions_called = []
                 g.regions_called.append(r)
 
-            original_datetime = args['original_datetime']
-            new_datetime = self.convert_to_utc(original_datetime)
-            args['datetime'] = date_to_timestamp(new_datetime)
+            if nb_speculative_regions > 1:
+                future, region_args = speculative_calls.pop(r)
+                response = future.result()
+                # what the scenario has stored in g (and the args it has completed, for the stats)
+                # is kept as if the region had been computed by the request itself
+                future.merge_g()
+                args.update(region_args)
+            else:
+                original_datetime = args['original_datetime']
+                new_datetime = self.convert_to_utc(original_datetime)
+                args['datetime'] = date_to_timestamp(new_datetime)
 
-            response = i_manager.dispatch(args, api, instance_name=self.region)
+                response = i_manager.dispatch(args, api, instance_name=self.region)
 
             if response.HasField(b'error') \
                     and len(possible_regions) != 1:
@@ -632,8 +707,14 @@ class Journeys(ResourceUri, ResourceUtc):
                 responses[r] = response
                 continue
 
+            self._record_speculation(nb_speculative_regions, idx, speculative_calls)
+            # the computation of the following regions is not needed anymore
+            for future, _ in speculative_calls.values():
+                future.cancel()
             return response
 
+        self._record_speculation(nb_speculative_regions, None, speculative_calls)
+
         for response in responses.values():
             if not response.HasField(b"error"):
                 return response
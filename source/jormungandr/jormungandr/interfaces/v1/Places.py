@@ -35,7 +35,6 @@ from flask.ext.restful import Resource, fields, reqparse, abort
 from flask.globals import g
 from jormungandr import i_manager, timezone, global_autocomplete, bss_provider_manager
 from jormungandr.interfaces.v1.fields import disruption_marshaller
-from jormungandr.interfaces.v1.make_links import add_id_links
 from jormungandr.interfaces.v1.fields import place, NonNullList, NonNullNested, PbField, pagination, error, coord, feed_publisher
 from jormungandr.interfaces.v1.ResourceUri import ResourceUri
 from jormungandr.interfaces.argument import ArgumentDoc
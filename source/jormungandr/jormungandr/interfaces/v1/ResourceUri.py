@@ -28,15 +28,17 @@
 # www.navitia.io
 
 from __future__ import absolute_import, print_function, unicode_literals, division
+from abc import abstractmethod, ABCMeta
 from flask.ext.restful import Resource, abort
 from jormungandr.interfaces.v1.converters_collection_type import collections_to_resource_type
 from jormungandr.interfaces.v1.converters_collection_type import resource_type_to_collection
 from jormungandr import utils
 from jormungandr.interfaces.v1.StatedResource import StatedResource
 from jormungandr.stat_manager import manage_stat_caller
-from jormungandr.interfaces.v1.make_links import add_id_links, clean_links, add_pagination_links
+from jormungandr.interfaces.v1.make_links import IdLinks, clean_links, add_pagination_links
+from jormungandr.interfaces.v1.response_post_processing import ResponsePlugin, post_process_response
 from functools import wraps
-from collections import OrderedDict, deque
+from collections import OrderedDict
 from flask import url_for
 from flask.ext.restful.utils import unpack
 from jormungandr.authentication import authentication_required
@@ -54,8 +56,11 @@ class ResourceUri(StatedResource):
     def __init__(self, authentication=True, links=True, *args, **kwargs):
         StatedResource.__init__(self, *args, **kwargs)
         self.region = None
+        # the plugins post processing the response in a single walk, the resources can add their own
+        self.response_plugins = []
         if links:
-            self.method_decorators.append(add_id_links())
+            self.response_plugins.append(IdLinks)
+            self.method_decorators.append(post_process_response(self))
             self.method_decorators.append(add_computed_resources(self))
             self.method_decorators.append(add_pagination_links())
             self.method_decorators.append(clean_links())
@@ -168,60 +173,53 @@ class add_computed_resources(object):
                 return data
         return wrapper
 
-class complete_links(object):
-    def __init__(self, resource):
-        self.resource = resource
-    def complete(self, data, collect):
-        queue = deque()
-        result = deque()
-        queue.extend(data.values())
-        collect_type = collect["type"]
-        del_types = collect["del"]
-        while queue:
-            elem = queue.pop()
-            if isinstance(elem, (list, tuple)):
-                queue.extend(elem)
-            elif hasattr(elem, 'keys'):
-                if elem.get('type') == collect_type:
-                    if collect_type == "notes":
-                        result.append({"id": elem['id'], "value": elem['value'], "type": collect_type})
-                    elif collect_type == "exceptions":
-                        type_ = "Add" if elem['except_type'] == 0 else "Remove"
-                        result.append({"id": elem['id'], "date": elem['date'], "type": type_})
-
-                    map(elem.pop, del_types)
-                else:
-                    queue.extend(elem.values())
-        return result
+class CompleteLinks(ResponsePlugin):
+    """
+    gather in a top level list the objects of a given type found in the response
+    (and remove from them the fields that are only needed in this list)
 
-    def __call__(self, f):
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            objects = f(*args, **kwargs)
-            if isinstance(objects, tuple):
-                data, code, header = unpack(objects)
-            else:
-                data = objects
-
-            if self.resource.region:
-                collection = {
-                    "notes" : {"type" : "notes",
-                              "del":["value"]},
-                    "exceptions" : {"type" : "exceptions",
-                              "del":["date","except_type"]}
-                }
-                # Add notes exceptions
-                for col in collection:
-                    if not col in data or not isinstance(data[col], list):
-                        data[col] = []
-                        res = []
-                        note = self.complete(data, collection[col])
-                        [res.append(item) for item in note if not item in res]
-                        data[col].extend(res)
-
-            if isinstance(objects, tuple):
-                return data, code, header
-            else:
-                return data
+    the items are deduplicated, in the order they are found
+    """
+    __metaclass__ = ABCMeta
+    collect_type = None
+    del_fields = []
 
-        return wrapper
+    def __init__(self):
+        self.items = OrderedDict()
+
+    def start(self, resource, data, code, kwargs):
+        return bool(resource.region) and \
+            (self.collect_type not in data or not isinstance(data[self.collect_type], list))
+
+    @abstractmethod
+    def make_item(self, elem):
+        """
+        the item of the top level list for an object of the response
+        """
+        pass
+
+    def visit(self, key, node):
+        if node.get('type') == self.collect_type:
+            item = self.make_item(node)
+            self.items.setdefault(tuple(sorted(item.items())), item)
+            map(node.pop, self.del_fields)
+
+    def finish(self, data):
+        data[self.collect_type] = list(self.items.values())
+
+
+class CompleteNotes(CompleteLinks):
+    name = collect_type = "notes"
+    del_fields = ["value"]
+
+    def make_item(self, elem):
+        return {"id": elem['id'], "value": elem['value'], "type": self.collect_type}
+
+
+class CompleteExceptions(CompleteLinks):
+    name = collect_type = "exceptions"
+    del_fields = ["date", "except_type"]
+
+    def make_item(self, elem):
+        type_ = "Add" if elem['except_type'] == 0 else "Remove"
+        return {"id": elem['id'], "date": elem['date'], "type": type_}
@@ -38,7 +38,7 @@ from jormungandr.interfaces.v1.fields import stop_point, route, pagination, PbFi
     additional_informations, stop_time_properties_links, display_informations_vj, \
     display_informations_route, UrisToLinks, error, \
     enum_type, SplitDateTime, MultiLineString, NonNullList, PbEnum, feed_publisher
-from jormungandr.interfaces.v1.ResourceUri import ResourceUri, complete_links
+from jormungandr.interfaces.v1.ResourceUri import ResourceUri, CompleteNotes, CompleteExceptions
 import datetime
 from jormungandr.interfaces.argument import ArgumentDoc
 from jormungandr.interfaces.parsers import option_value, date_time_format, default_count_arg_type
@@ -110,8 +110,10 @@ class Schedules(ResourceUri, ResourceUtc):
                                             " Default is the current date and it is mainly used for debug.")
         parser_get.add_argument("items_per_schedule", type=natural, default=10000,
                                 description="maximum number of date_times per schedule")
+        parser_get.add_argument("debug", type=boolean, default=False,
+                                hidden=True)
 
-        self.method_decorators.append(complete_links(self))
+        self.response_plugins.extend([CompleteNotes, CompleteExceptions])
 
     def get(self, uri=None, region=None, lon=None, lat=None):
         args = self.parsers["get"].parse_args()
@@ -122,6 +124,9 @@ class Schedules(ResourceUri, ResourceUtc):
 
         args["nb_stoptimes"] = args["count"]
 
+        if args['debug']:
+            g.debug = True
+
         # retrocompatibility
         if args['max_date_times'] is not None:
             args['items_per_schedule'] = args['max_date_times']
@@ -253,11 +258,28 @@ stop_schedules = {
 }
 
 
+class add_realtime_debug_info(object):
+    """
+    display the number of realtime proxies calls that have timed out (stored in g by the MixedSchedule)
+
+    only for the debug requests
+    """
+    def __call__(self, f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            response, status, other = f(*args, **kwargs)
+            if getattr(g, 'debug', False) and hasattr(g, 'realtime_proxies_timeouts'):
+                response.setdefault('debug', {})['realtime_proxies_timeouts'] = g.realtime_proxies_timeouts
+            return response, status, other
+        return wrapper
+
+
 class StopSchedules(Schedules):
 
     def __init__(self):
         super(StopSchedules, self).__init__("departure_boards")
 
+    @add_realtime_debug_info()
     @marshal_with(stop_schedules)
     @ManageError()
     def get(self, uri=None, region=None, lon=None, lat=None):
@@ -340,6 +362,7 @@ class NextDepartures(Schedules):
     def __init__(self):
         super(NextDepartures, self).__init__("next_departures")
 
+    @add_realtime_debug_info()
     @add_passages_links()
     @marshal_with(departures)
     @ManageError()
@@ -29,10 +29,10 @@
 
 from __future__ import absolute_import, print_function, unicode_literals, division
 from flask.ext.restful import Resource, fields, marshal_with
-from jormungandr import i_manager, travelers_profile
+from jormungandr import i_manager, travelers_profile, stat_manager
 from jormungandr.protobuf_to_dict import protobuf_to_dict
 from jormungandr.interfaces.v1.fields import instance_status_with_parameters
-from jormungandr import app
+from jormungandr import app, cache
 from navitiacommon import models
 
 status = {
@@ -51,4 +51,10 @@ class Status(Resource):
         response['status']['realtime_proxies'] = []
         for realtime_proxy in instance.realtime_proxy_manager.realtime_proxies.values():
             response['status']['realtime_proxies'].append(realtime_proxy.status())
+        prefetcher_status = instance.realtime_proxy_manager.prefetcher_status()
+        if prefetcher_status:
+            response['status']['realtime_prefetcher'] = prefetcher_status
+        if stat_manager.save_stat:
+            response['status']['stat_manager'] = stat_manager.status()
+        response['status']['cache'] = cache.status()
         return response, 200
@@ -29,7 +29,7 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 from functools import wraps
 from flask.ext.restful import fields, marshal
-from copy import deepcopy
+from copy import copy, deepcopy
 from collections import OrderedDict, defaultdict
 import datetime
 import logging
@@ -40,6 +40,128 @@ from jormungandr.interfaces.v1.make_links import create_internal_link, create_ex
 from jormungandr.timezone import get_timezone
 from jormungandr.utils import timestamp_to_str
 from navitiacommon import response_pb2, type_pb2
+from google.protobuf.message import Message
+
+
+_enum_names_cache = {}
+
+
+def enum_names(enum_descriptor):
+    """
+    lower case names of the values of a protobuf enum, by number
+
+    they are computed only once for each enum descriptor
+    """
+    names = _enum_names_cache.get(enum_descriptor)
+    if names is None:
+        names = {v.number: v.name.lower() for v in enum_descriptor.values}
+        _enum_names_cache[enum_descriptor] = names
+    return names
+
+
+def _function(method):
+    return getattr(method, '__func__', method)
+
+
+class _PbAttribute(fields.Raw):
+    """
+    compiled plain field: the value is read directly on the protobuf messages
+
+    the other objects are still given to fields.get_value
+    """
+    def __init__(self, field, name):
+        super(_PbAttribute, self).__init__(default=field.default, attribute=field.attribute)
+        self.name = name
+        self.format = field.format
+
+    def output(self, key, obj):
+        if not isinstance(obj, Message):
+            return super(_PbAttribute, self).output(key, obj)
+        value = getattr(obj, self.name, None)
+        if value is None:
+            return self.default
+        return self.format(value)
+
+
+class CompiledFields(dict):
+    """
+    compiled marshalling schema
+
+    marshal only iterates on the items of the schema, they are given in the order of
+    the original schema without building a new list each time
+    """
+    def __init__(self, items):
+        super(CompiledFields, self).__init__(items)
+        self._items = items
+
+    def items(self):
+        return self._items
+
+    def keys(self):
+        return [k for k, _ in self._items]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+def compile_fields(schema, _compiled=None):
+    """
+    compile a marshalling schema once, to marshal lots of objects with it
+
+    the compiled schema is given to marshal (or marshal_with) like the original one,
+    and the output is the same, but:
+     * the field classes are instantiated once, not once for each marshalled object
+     * the schemas of the Nested and List fields are compiled too
+     * the plain fields read their attribute directly on the protobuf messages
+
+    >>> from flask.ext.restful import marshal
+    >>> schema = {'name': fields.String, 'nested': {'id': fields.String(attribute='uri')}}
+    >>> compiled = compile_fields(schema)
+    >>> compiled.keys() == list(schema.keys())
+    True
+    >>> print(compiled['nested']['id'].name)
+    uri
+    >>> marshal({'name': 'bob', 'uri': 'A'}, compiled) == marshal({'name': 'bob', 'uri': 'A'}, schema)
+    True
+    """
+    if _compiled is None:
+        _compiled = {}
+    # a schema shared by several fields is compiled only once
+    if id(schema) in _compiled:
+        return _compiled[id(schema)][1]
+    items = []
+    compiled = CompiledFields(items)
+    _compiled[id(schema)] = (schema, compiled)
+    # the keys are kept in the iteration order of the schema, it's the order of the output
+    for key, field in schema.items():
+        items.append((key, _compile_field(key, field, _compiled)))
+    compiled.update(items)
+    return compiled
+
+
+def _compile_container(field, _compiled):
+    if isinstance(field, fields.Nested):
+        field = copy(field)
+        field.nested = compile_fields(field.nested, _compiled)
+    elif isinstance(field, fields.List):
+        field = copy(field)
+        field.container = _compile_container(field.container, _compiled)
+    return field
+
+
+def _compile_field(key, field, _compiled):
+    if isinstance(field, dict):
+        return compile_fields(field, _compiled)
+    if isinstance(field, type):
+        field = field()
+    if isinstance(field, (fields.Nested, fields.List)):
+        # the elements of a list are not changed since fields.List checks their type
+        return _compile_container(field, _compiled)
+    if isinstance(field, fields.Raw) and _function(type(field).output) is _function(fields.Raw.output):
+        name = key if field.attribute is None else field.attribute
+        if '.' not in name:
+            return _PbAttribute(field, name)
+    return field
 
 
 class PbField(fields.Nested):
@@ -183,21 +305,21 @@ class enum_type(fields.Raw):
         if self.attribute:
             key = self.attribute
         keys = key.split(".")
-        if len(keys) > 1:
+        # we follow the path of the nested messages
+        for k in keys[:-1]:
             try:
-                if obj.HasField(keys[0]):
-                    return enum_type().output(".".join(keys[1:]),
-                                              getattr(obj, keys[0]))
-                return None
+                if not obj.HasField(k):
+                    return None
             except ValueError:
                 return None
+            obj = getattr(obj, k)
+        key = keys[-1]
         try:
             if not obj.HasField(key):
                 return None
         except ValueError:
             return None
-        enum = obj.DESCRIPTOR.fields_by_name[key].enum_type.values_by_number
-        return enum[getattr(obj, key)].name.lower()
+        return enum_names(obj.DESCRIPTOR.fields_by_name[key].enum_type)[getattr(obj, key)]
 
 
 class PbEnum(fields.Raw):
@@ -208,9 +330,14 @@ class PbEnum(fields.Raw):
     def __init__(self, pb_enum_type, *args, **kwargs):
         super(PbEnum, self).__init__(*args, **kwargs)
         self.pb_enum_type = pb_enum_type
+        self.names = {}
 
     def format(self, value):
-        return self.pb_enum_type.Name(value).lower()
+        name = self.names.get(value)
+        if name is None:
+            name = self.pb_enum_type.Name(value).lower()
+            self.names[value] = name
+        return name
 
 
 class NonNullList(fields.List):
@@ -240,33 +367,29 @@ class additional_informations(fields.Raw):
     def output(self, key, obj):
         properties = obj.properties
         descriptor = properties.DESCRIPTOR
-        enum = descriptor.enum_types_by_name["AdditionalInformation"]
-        return [enum.values_by_number[v].name.lower() for v
-                in properties.additional_informations]
+        names = enum_names(descriptor.enum_types_by_name["AdditionalInformation"])
+        return [names[v] for v in properties.additional_informations]
 
 
 class equipments(fields.Raw):
     def output(self, key, obj):
         equipments = obj.has_equipments
         descriptor = equipments.DESCRIPTOR
-        enum = descriptor.enum_types_by_name["Equipment"]
-        return [enum.values_by_number[v].name.lower() for v
-                in equipments.has_equipments]
+        names = enum_names(descriptor.enum_types_by_name["Equipment"])
+        return [names[v] for v in equipments.has_equipments]
 
 
 class disruption_status(fields.Raw):
     def output(self, key, obj):
         status = obj.status
-        enum = type_pb2._ACTIVESTATUS
-        return enum.values_by_number[status].name.lower()
+        return enum_names(type_pb2._ACTIVESTATUS)[status]
 
 class channel_types(fields.Raw):
     def output(self, key, obj):
         channel = obj
         descriptor = channel.DESCRIPTOR
-        enum = descriptor.enum_types_by_name["ChannelType"]
-        return [enum.values_by_number[v].name.lower() for v
-                in channel.channel_types]
+        names = enum_names(descriptor.enum_types_by_name["ChannelType"])
+        return [names[v] for v in channel.channel_types]
 
 
 class notes(fields.Raw):
@@ -388,13 +511,11 @@ class SectionGeoJson(fields.Raw):
 
         response = {
             "type": "LineString",
-            "coordinates": [],
+            "coordinates": [[coord.lon, coord.lat] for coord in coords],
             "properties": [{
                 "length": 0 if not obj.HasField(b"length") else obj.length
             }]
         }
-        for coord in coords:
-            response["coordinates"].append([coord.lon, coord.lat])
         return response
 
 
@@ -801,6 +922,9 @@ instance_parameters = {
 
 instance_status_with_parameters = deepcopy(instance_status)
 instance_status_with_parameters['parameters'] = fields.Nested(instance_parameters, allow_null=True)
+instance_status_with_parameters['stat_manager'] = fields.Raw()
+instance_status_with_parameters['realtime_prefetcher'] = fields.Raw()
+instance_status_with_parameters['cache'] = fields.Raw()
 
 instance_traveler_types = {
     'traveler_type': fields.String,
@@ -35,6 +35,7 @@ from sqlalchemy.sql.elements import _type_from_args
 from jormungandr.interfaces.v1.converters_collection_type import resource_type_to_collection,\
     collections_to_resource_type
 from flask.ext.restful.utils import unpack
+from jormungandr.interfaces.v1.response_post_processing import ResponsePlugin
 
 
 def create_external_link(url, rel, _type=None, templated=False, description=None, **kwargs):
@@ -243,62 +244,49 @@ class add_collection_links(generate_links):
         return wrapper
 
 
-class add_id_links(generate_links):
+class IdLinks(ResponsePlugin, generate_links):
+    """
+    add the links to the collections of the objects (dict with an id but no href) of the response
+    """
+    name = 'id_links'
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self):
         self.data = set()
-
-    def __call__(self, f):
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            objects = f(*args, **kwargs)
-            if objects[1] != 200:
-                return objects
-            if isinstance(objects, tuple):
-                data, code, header = unpack(objects)
-            else:
-                data = objects
-            self.get_objets(data)
-            data = self.prepare_objetcs(objects, True)
-            kwargs = self.prepare_kwargs(kwargs, data)
-
-            if 'region' not in kwargs and 'lon' not in kwargs:
-                # we don't know how to put links on this object, there is no coverage, we don't add links
-                return objects
-
-            uri_id = None
-            if "id" in kwargs and "collection" in kwargs and kwargs["collection"] in data:
-                uri_id = kwargs["id"]
-            for obj in self.data:
-                kwargs["collection"] = resource_type_to_collection.get(obj, obj)
-                if kwargs["collection"] in collections_to_resource_type:
-                    if not uri_id:
-                        kwargs["id"] = "{" + obj + ".id}"
-
-                    endpoint = "v1." + kwargs["collection"] + ".id"
-
-                    collection = kwargs["collection"]
-                    to_pass = {k: v for k, v in kwargs.items() if k != "collection"}
-                    data["links"].append(create_external_link(url=endpoint, rel=collection,
-                                                              _type=obj, templated=True,
-                                                              **to_pass))
-            if isinstance(objects, tuple):
-                return data, code, header
-            else:
-                return data
-        return wrapper
-
-    def get_objets(self, data, collection_name=None):
-        if hasattr(data, 'keys'):
-            if "id" in data \
-               and ("href" not in data) \
-               and collection_name:
-                self.data.add(collection_name)
-            for key, value in data.items():
-                self.get_objets(value, key)
-        if isinstance(data, (list, tuple)):
-            for item in data:
-                self.get_objets(item, collection_name)
+        self.kwargs = None
+
+    def start(self, resource, data, code, kwargs):
+        if code != 200:
+            return False
+        self.prepare_objetcs(data, True)
+        self.kwargs = self.prepare_kwargs(kwargs, data)
+        return True
+
+    def visit(self, key, node):
+        if "id" in node and "href" not in node and key:
+            self.data.add(key)
+
+    def finish(self, data):
+        kwargs = self.kwargs
+        if 'region' not in kwargs and 'lon' not in kwargs:
+            # we don't know how to put links on this object, there is no coverage, we don't add links
+            return
+
+        uri_id = None
+        if "id" in kwargs and "collection" in kwargs and kwargs["collection"] in data:
+            uri_id = kwargs["id"]
+        for obj in self.data:
+            kwargs["collection"] = resource_type_to_collection.get(obj, obj)
+            if kwargs["collection"] in collections_to_resource_type:
+                if not uri_id:
+                    kwargs["id"] = "{" + obj + ".id}"
+
+                endpoint = "v1." + kwargs["collection"] + ".id"
+
+                collection = kwargs["collection"]
+                to_pass = {k: v for k, v in kwargs.items() if k != "collection"}
+                data["links"].append(create_external_link(url=endpoint, rel=collection,
+                                                          _type=obj, templated=True,
+                                                          **to_pass))
 
 
 class clean_links(object):
@@ -0,0 +1,141 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from functools import wraps
+import logging
+import time
+from flask import g, has_request_context
+from flask.ext.restful.utils import unpack
+from jormungandr import new_relic
+
+
+class ResponsePlugin(object):
+    """
+    a concern of the post processing of the marshalled responses
+
+    all the plugins of a resource visit the nodes of the response during the same walk
+    """
+    name = None
+
+    def start(self, resource, data, code, kwargs):
+        """
+        called before the walk, return False if the plugin has nothing to do on this response
+        """
+        return True
+
+    def visit(self, key, node):
+        """
+        called for each dict of the response, key is the key holding the dict (or the list of the dict)
+        """
+        pass
+
+    def finish(self, data):
+        """
+        called after the walk, to update the response
+        """
+        pass
+
+
+def walk_response(data, plugins, timed=False):
+    """
+    depth first walk of the response, the nodes are visited in the same order as a stack based search
+
+    return the number of visited nodes and, if timed, by plugin name the time spent in its visits
+    (timing each visit costs about as much as the visit itself, so it is only done when debugging)
+    """
+    nb_visits = 0
+    durations = {plugin.name: 0. for plugin in plugins} if timed else None
+    stack = list(data.items())
+    while stack:
+        key, elem = stack.pop()
+        if isinstance(elem, (list, tuple)):
+            stack.extend((key, item) for item in elem)
+        elif hasattr(elem, 'keys'):
+            nb_visits += 1
+            if timed:
+                for plugin in plugins:
+                    start = time.time()
+                    plugin.visit(key, elem)
+                    durations[plugin.name] += time.time() - start
+            else:
+                for plugin in plugins:
+                    plugin.visit(key, elem)
+            stack.extend(elem.items())
+    return nb_visits, durations
+
+
+class post_process_response(object):
+    """
+    post process the response with the plugins of the resource (resource.response_plugins, the classes of the
+    plugins) walking the response only once
+
+    the time spent in the walk and in the finish of each plugin is recorded, the time of the visits of each
+    plugin only in debug (g.debug), otherwise the walk time is split evenly between the plugins
+    """
+    def __init__(self, resource):
+        self.resource = resource
+
+    def __call__(self, f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            objects = f(*args, **kwargs)
+            if isinstance(objects, tuple):
+                data, code, header = unpack(objects)
+            else:
+                data, code = objects, 200
+            if not hasattr(data, 'keys'):
+                return objects
+
+            plugins = [plugin_class() for plugin_class in self.resource.response_plugins]
+            plugins = [p for p in plugins if p.start(self.resource, data, code, dict(kwargs))]
+            if not plugins:
+                return objects
+
+            timed = has_request_context() and getattr(g, 'debug', False)
+            start = time.time()
+            nb_visits, durations = walk_response(data, plugins, timed)
+            walk_duration = time.time() - start
+            timings = {'walk': walk_duration, 'nb_visits': nb_visits}
+            for plugin in plugins:
+                start = time.time()
+                plugin.finish(data)
+                timings[plugin.name] = time.time() - start
+                if timed:
+                    timings['{}_visits'.format(plugin.name)] = durations[plugin.name]
+                else:
+                    timings['{}_visits'.format(plugin.name)] = walk_duration / len(plugins)
+
+            for name, duration in timings.items():
+                new_relic.record_custom_parameter('post_processing_{}'.format(name), duration)
+            logging.getLogger(__name__).debug('post processing of the response: %s', timings)
+            return objects
+        return wrapper
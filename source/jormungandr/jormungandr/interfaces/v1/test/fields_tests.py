@@ -0,0 +1,258 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+import json
+import pytz
+from flask import g
+from flask.ext.restful import marshal
+from navitiacommon import response_pb2, type_pb2
+from jormungandr import app
+from jormungandr.interfaces.v1 import fields
+from jormungandr.interfaces.v1.Journeys import section_place, journeys, compiled_journeys
+from jormungandr.scenarios.tests.protobuf_builder import ResponseBuilder
+"""
+golden outputs of the protobuf fields used to marshal the journeys
+"""
+
+
+def build_section():
+    section = response_pb2.Section()
+    section.id = 'section_1'
+    section.type = response_pb2.STREET_NETWORK
+    section.length = 42
+    section.street_network.mode = response_pb2.Bike
+    for lon, lat in ((2.1, 48.1), (2.2, 48.2), (2.3, 48.3)):
+        coord = section.street_network.coordinates.add()
+        coord.lon = lon
+        coord.lat = lat
+    return section
+
+
+def enum_type_test():
+    section = build_section()
+    assert fields.enum_type().output('type', section) == 'street_network'
+    assert fields.enum_type(attribute='street_network.mode').output('mode', section) == 'bike'
+    # the nested message is not there
+    assert fields.enum_type(attribute='street_network.mode').output('mode', response_pb2.Section()) is None
+    # the field is not there
+    assert fields.enum_type().output('transfer_type', section) is None
+    # not a field of the message
+    assert fields.enum_type().output('bob', section) is None
+
+
+def enum_names_test():
+    names = fields.enum_names(response_pb2.Section.DESCRIPTOR.fields_by_name['type'].enum_type)
+    assert names[response_pb2.PUBLIC_TRANSPORT] == 'public_transport'
+    assert names[response_pb2.WAITING] == 'waiting'
+    # the names are computed only once
+    assert fields.enum_names(response_pb2.Section.DESCRIPTOR.fields_by_name['type'].enum_type) is names
+
+
+def pb_enum_test():
+    field = fields.PbEnum(response_pb2.SectionAdditionalInformationType)
+    for value in response_pb2.SectionAdditionalInformationType.DESCRIPTOR.values:
+        expected = value.name.lower()
+        value = value.number
+        # twice, the second time it's cached
+        assert field.format(value) == expected
+        assert field.format(value) == expected
+
+
+def section_geojson_test():
+    section = build_section()
+    assert fields.SectionGeoJson().output('geojson', section) == {
+        "type": "LineString",
+        "coordinates": [[2.1, 48.1], [2.2, 48.2], [2.3, 48.3]],
+        "properties": [{"length": 42}]
+    }
+    section.type = response_pb2.WAITING
+    assert fields.SectionGeoJson().output('geojson', section) is None
+
+
+def section_place_waiting_test():
+    section = build_section()
+    section.type = response_pb2.WAITING
+    section.origin.uri = 'stop_point:A'
+    assert section_place(fields.place, attribute='origin').output('from', section) is None
+
+
+def build_place(place, uri, name):
+    place.uri = uri
+    place.name = name
+    place.embedded_type = type_pb2.STOP_POINT
+    place.stop_point.uri = uri
+    place.stop_point.name = name
+    place.stop_point.coord.lon = 2.3
+    place.stop_point.coord.lat = 48.8
+    admin = place.stop_point.administrative_regions.add()
+    admin.uri = 'admin:paris'
+    admin.name = 'Paris'
+    admin.level = 8
+    admin.zip_code = '75000'
+
+
+def build_journeys_response():
+    """
+    a journeys response with all the kinds of fields: nested messages, lists, enums and dates
+    """
+    builder = ResponseBuilder()
+    builder.journey(uri='walk', departure='T0800', sections=[{'mode': 'Walking', 'duration': 600}])
+    builder.journey(uri='pt', departure='T0805', type='best', nb_transfers=0,
+                    sections=[{'mode': 'Walking', 'duration': 60},
+                              {'type': 'PT', 'duration': 300},
+                              {'type': 'WAITING', 'duration': 30}])
+    response = builder.response
+
+    walk = builder.get_journey('walk')
+    walk.co2_emission.value = 0
+    walk.co2_emission.unit = 'gEC'
+    section = walk.sections[0]
+    section.id = 'section_walk'
+    section.length = 700
+    build_place(section.origin, 'stop_point:A', 'A')
+    build_place(section.destination, 'stop_point:B', 'B')
+    for lon, lat in ((2.1, 48.1), (2.2, 48.2)):
+        coord = section.street_network.coordinates.add()
+        coord.lon = lon
+        coord.lat = lat
+    path_item = section.street_network.path_items.add()
+    path_item.name = 'rue de la gare'
+    path_item.length = 700
+    path_item.duration = 600
+    path_item.direction = 0
+
+    pt = builder.get_journey('pt')
+    pt.requested_date_time = pt.departure_date_time
+    pt.tags.extend(['walking', 'ecologic'])
+    pt.most_serious_disruption_effect = 'SIGNIFICANT_DELAYS'
+    pt.fare.found = True
+    pt.fare.total.value = 1.7
+    pt.fare.total.currency = 'euro'
+    pt.fare.ticket_id.append('ticket_1')
+    section = pt.sections[1]
+    section.id = 'section_pt'
+    section.begin_date_time = pt.departure_date_time + 60
+    section.end_date_time = pt.departure_date_time + 360
+    section.base_begin_date_time = section.begin_date_time
+    section.base_end_date_time = section.end_date_time
+    build_place(section.origin, 'stop_point:B', 'B')
+    build_place(section.destination, 'stop_point:C', 'C')
+    section.pt_display_informations.uris.line = 'line:1'
+    section.pt_display_informations.uris.vehicle_journey = 'vj:1'
+    note = section.pt_display_informations.notes.add()
+    note.uri = 'note:1'
+    note.note = 'the train is yellow'
+    section.pt_display_informations.network = 'network'
+    section.pt_display_informations.code = '1'
+    section.pt_display_informations.color = 'FF0000'
+    section.pt_display_informations.headsign = 'to C'
+    section.pt_display_informations.impact_uris.append('impact_1')
+    section.additional_informations.append(response_pb2.HAS_DATETIME_ESTIMATED)
+    for uri, name, dt in (('stop_point:B', 'B', section.begin_date_time),
+                          ('stop_point:C', 'C', section.end_date_time)):
+        stop_date_time = section.stop_date_times.add()
+        stop_date_time.departure_date_time = dt
+        stop_date_time.arrival_date_time = dt
+        stop_date_time.stop_point.uri = uri
+        stop_date_time.stop_point.name = name
+        stop_date_time.properties.vehicle_journey_id = 'vj:1'
+
+    ticket = response.tickets.add()
+    ticket.id = 'ticket_1'
+    ticket.name = 'ticket t+'
+    ticket.found = True
+    ticket.cost.value = 1.7
+    ticket.cost.currency = 'euro'
+    ticket.section_id.append('section_pt')
+
+    impact = response.impacts.add()
+    impact.uri = 'impact_1'
+    impact.disruption_uri = 'disruption_1'
+    impact.cause = 'works'
+    impact.tags.append('rer')
+    impact.updated_at = pt.departure_date_time
+    period = impact.application_periods.add()
+    period.begin = pt.departure_date_time
+    period.end = pt.arrival_date_time
+    impact.severity.name = 'delays'
+    impact.severity.effect = 'SIGNIFICANT_DELAYS'
+    impact.severity.priority = 1
+    message = impact.messages.add()
+    message.text = 'there are works'
+    message.channel.id = 'sms'
+    message.channel.name = 'sms'
+
+    feed_publisher = response.feed_publishers.add()
+    feed_publisher.id = 'builder'
+    feed_publisher.name = 'protobuf builder'
+    return response
+
+
+def check_compiled_journeys(response):
+    with app.test_request_context('/'):
+        g.timezone = pytz.timezone('Europe/Paris')
+        expected = json.dumps(marshal(response, journeys))
+        assert json.dumps(marshal(response, compiled_journeys)) == expected
+        return expected
+
+
+def compiled_journeys_test():
+    """
+    the journeys marshalled with the compiled schema are the same, byte for byte
+    """
+    expected = check_compiled_journeys(build_journeys_response())
+    # to be sure that the response is not empty
+    assert '"rue de la gare"' in expected
+    assert '"administrative_regions"' in expected
+    assert '"disruptions"' in expected
+
+
+def compiled_journeys_error_test():
+    response = response_pb2.Response()
+    response.error.id = response_pb2.Error.no_solution
+    response.error.message = 'no solution found for this journey'
+    check_compiled_journeys(response)
+    check_compiled_journeys(response_pb2.Response())
+
+
+def compile_fields_test():
+    compiled = fields.compile_fields(fields.admin)
+    # the classes are instantiated once and the attributes are read directly on the messages
+    assert compiled['level'].name == 'level'
+    assert compiled['id'].name == 'uri'
+    # the nested schemas are compiled
+    assert compiled['coord'].nested['lon'].name == 'lon'
+    # the original schema is not changed
+    assert fields.admin['level'] is fields.fields.Integer
+    assert not hasattr(fields.admin['coord'].nested['lon'], 'name')
+    # the fields with their own output are kept as they are
+    assert fields.compile_fields(fields.period)['begin'] is fields.period['begin']
@@ -0,0 +1,234 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+import mock
+from flask import g
+from nose.tools import raises
+from jormungandr import app
+from jormungandr.interfaces.v1.response_post_processing import ResponsePlugin, walk_response, \
+    post_process_response
+from jormungandr.interfaces.v1.ResourceUri import CompleteLinks, CompleteNotes, CompleteExceptions
+from jormungandr.interfaces.v1.make_links import IdLinks
+
+
+class VisitedKeys(ResponsePlugin):
+    name = 'visited_keys'
+
+    def __init__(self):
+        self.keys = []
+
+    def visit(self, key, node):
+        self.keys.append(key)
+
+
+class FakeResource(object):
+    def __init__(self, region='paris', plugins=None):
+        self.region = region
+        self.response_plugins = plugins or [CompleteNotes, CompleteExceptions]
+
+
+def response():
+    return {
+        'journeys': [
+            {'id': 'j1', 'sections': [
+                {'id': 's1', 'links': [{'id': 'note:1', 'type': 'notes', 'value': 'hello'},
+                                       {'id': 'exc:1', 'type': 'exceptions', 'date': '20160101',
+                                        'except_type': 0}]},
+                {'id': 's2', 'links': [{'id': 'note:2', 'type': 'notes', 'value': 'world'},
+                                       {'id': 'note:1', 'type': 'notes', 'value': 'hello'}]},
+            ]},
+        ],
+        'links': [],
+    }
+
+
+def walk_response_test():
+    """
+    each dict of the response is visited once with the key holding it, the top level dict is not visited
+
+    the visits are not timed by default
+    """
+    plugin = VisitedKeys()
+    nb_visits, durations = walk_response(response(), [plugin, CompleteNotes()])
+    assert sorted(plugin.keys) == sorted(['journeys', 'sections', 'sections', 'links', 'links',
+                                          'links', 'links'])
+    assert nb_visits == 7
+    assert durations is None
+
+
+def walk_response_timed_test():
+    """
+    when timed, the time spent in the visits of each plugin is returned
+    """
+    plugin = VisitedKeys()
+    nb_visits, durations = walk_response(response(), [plugin, CompleteNotes()], timed=True)
+    assert len(plugin.keys) == nb_visits == 7
+    assert sorted(durations.keys()) == ['notes', 'visited_keys']
+    assert all(d >= 0 for d in durations.values())
+
+
+def timed_visits_in_debug_test():
+    """
+    the visits of the plugins are only timed in debug
+    """
+    resource = FakeResource(plugins=[CompleteNotes])
+    with app.test_request_context('/'), \
+            mock.patch('jormungandr.interfaces.v1.response_post_processing.walk_response',
+                       wraps=walk_response) as walk:
+        post_process_response(resource)(lambda: (response(), 200))()
+        assert walk.call_args[0][2] is False
+        g.debug = True
+        post_process_response(resource)(lambda: (response(), 200))()
+        assert walk.call_args[0][2] is True
+
+
+def complete_notes_and_exceptions_test():
+    """
+    the notes and exceptions are gathered, without duplicates, in the same walk
+    """
+    data = response()
+    resource = FakeResource()
+    result = post_process_response(resource)(lambda: (data, 200))()
+
+    assert result == (data, 200)
+    assert data['notes'] == [{'id': 'note:1', 'value': 'hello', 'type': 'notes'},
+                             {'id': 'note:2', 'value': 'world', 'type': 'notes'}]
+    assert data['exceptions'] == [{'id': 'exc:1', 'date': '20160101', 'type': 'Add'}]
+    # the fields moved to the top level lists are removed from the links
+    links = data['journeys'][0]['sections'][0]['links']
+    assert links == [{'id': 'note:1', 'type': 'notes'}, {'id': 'exc:1', 'type': 'exceptions'}]
+
+
+def no_region_test():
+    """
+    without region, the notes and exceptions are not gathered
+    """
+    data = response()
+    post_process_response(FakeResource(region=None))(lambda: (data, 200))()
+    assert 'notes' not in data
+    assert 'exceptions' not in data
+    assert data['journeys'][0]['sections'][0]['links'][0]['value'] == 'hello'
+
+
+def already_completed_test():
+    """
+    a response already having a list of notes is not modified
+    """
+    data = response()
+    data['notes'] = []
+    post_process_response(FakeResource(plugins=[CompleteNotes]))(lambda: (data, 200))()
+    assert data['notes'] == []
+    assert data['journeys'][0]['sections'][0]['links'][0]['value'] == 'hello'
+
+
+@raises(TypeError)
+def complete_links_abstract_test():
+    """
+    a CompleteLinks plugin must tell how to make its items
+    """
+    CompleteLinks()
+
+
+class FakeUriResource(object):
+    response_plugins = [IdLinks]
+
+
+def fake_url_for(endpoint, _external=False, **kwargs):
+    return '{}?{}'.format(endpoint, '&'.join('{}={}'.format(k, v) for k, v in sorted(kwargs.items())))
+
+
+def id_links(data, code=200, **kwargs):
+    with mock.patch('jormungandr.interfaces.v1.make_links.url_for', fake_url_for):
+        return post_process_response(FakeUriResource())(lambda **kw: (data, code))(**kwargs)
+
+
+def id_links_test():
+    """
+    a templated link to its collection is added for each kind of nested object having an id but no href
+    """
+    data = {
+        'lines': [
+            {'id': 'l1', 'network': {'id': 'n1'}, 'routes': [{'id': 'r1'}, {'id': 'r2'}],
+             'physical_modes': [{'id': 'pm1', 'href': 'http://physical_modes/pm1'}],
+             'codes': [{'type': 'external_code', 'value': 'l1'}], 'foo': {'id': 'bar'}},
+            {'id': 'l2', 'network': {'id': 'n2'}, 'routes': []},
+        ],
+    }
+    id_links(data, region='paris', uri='lines/l1')
+
+    links = sorted(data['links'], key=lambda l: l['type'])
+    assert links == [
+        {'href': 'v1.lines.id?id={lines.id}&region=paris', 'templated': True,
+         'rel': 'lines', 'type': 'lines'},
+        {'href': 'v1.networks.id?id={network.id}&region=paris', 'templated': True,
+         'rel': 'networks', 'type': 'network'},
+        {'href': 'v1.routes.id?id={routes.id}&region=paris', 'templated': True,
+         'rel': 'routes', 'type': 'routes'},
+    ]
+
+
+def id_links_of_object_test():
+    """
+    on the response of an object of a collection, the links are made with its id
+    """
+    data = {'lines': [{'id': 'l1', 'network': {'id': 'n1'}}]}
+    id_links(data, region='paris', collection='lines', id='l1')
+
+    assert sorted(l['href'] for l in data['links']) == ['v1.lines.id?id=l1&region=paris',
+                                                         'v1.networks.id?id=l1&region=paris']
+
+
+def id_links_coverage_from_response_test():
+    """
+    without region in the request, the region of the response is used
+    """
+    data = {'regions': [{'id': 'paris'}], 'lines': [{'id': 'l1'}]}
+    id_links(data)
+    assert [l['href'] for l in data['links']] == ['v1.lines.id?id={lines.id}&region={regions.id}']
+
+
+def id_links_no_region_test():
+    """
+    without coverage, no link is added
+    """
+    data = {'lines': [{'id': 'l1'}]}
+    id_links(data)
+    assert data['links'] == []
+
+
+def id_links_error_test():
+    """
+    the links are not added to an error
+    """
+    data = {'error': {'id': 'unknown_object', 'message': 'oops'}}
+    assert id_links(data, code=404, region='paris') == (data, 404)
+    assert 'links' not in data
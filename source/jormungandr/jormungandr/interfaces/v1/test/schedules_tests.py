@@ -0,0 +1,66 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from flask import g
+from jormungandr import app
+from jormungandr.interfaces.v1.Schedules import add_realtime_debug_info
+
+
+@add_realtime_debug_info()
+def get_schedules():
+    return {'stop_schedules': []}, 200, None
+
+
+def realtime_debug_info_test():
+    with app.test_request_context('/'):
+        g.debug = True
+        g.realtime_proxies_timeouts = 2
+        response, status, _ = get_schedules()
+        assert response['debug'] == {'realtime_proxies_timeouts': 2}
+
+
+def realtime_debug_info_without_debug_test():
+    """
+    the timeouts are only displayed for the debug requests
+    """
+    with app.test_request_context('/'):
+        g.realtime_proxies_timeouts = 2
+        response, status, _ = get_schedules()
+        assert 'debug' not in response
+
+
+def realtime_debug_info_without_timeout_test():
+    with app.test_request_context('/'):
+        g.debug = True
+        response, status, _ = get_schedules()
+        assert 'debug' not in response
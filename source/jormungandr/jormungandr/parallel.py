@@ -0,0 +1,243 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Thread, Event, Lock
+from collections import deque
+import sys
+import time
+import flask
+import six
+
+
+class ParallelTimeout(Exception):
+    pass
+
+
+class Future(object):
+    """
+    result of a call done in another thread
+    """
+    def __init__(self):
+        self._event = Event()
+        self._cancelled = Event()
+        self._result = None
+        self._exc_info = None
+        # the future of the call that spawned this one, its cancellation cancels this call too
+        self.parent = None
+        # the attributes of flask.g set by the call, they are not seen by the request until merge_g
+        self.g_updates = {}
+
+    def done(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """
+        the result of the call is not needed anymore
+
+        a thread cannot be stopped, the call is only told that it has been cancelled (see is_cancelled)
+        and has to stop by itself
+        """
+        self._cancelled.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled())
+
+    def merge_g(self):
+        """
+        set in the flask.g of the current request the attributes set by the call in its copy of flask.g
+        """
+        if self.g_updates and flask.has_app_context():
+            flask.g.__dict__.update(self.g_updates)
+
+    def wait(self, timeout=None):
+        """
+        wait for the call to be finished, at most timeout seconds
+
+        return True if the call is finished
+        """
+        return self._event.wait(timeout)
+
+    def result(self, timeout=None):
+        """
+        return the result of the call, or raise the exception raised by the call
+
+        raise ParallelTimeout if the call is not finished after timeout seconds
+        """
+        if not self.wait(timeout):
+            raise ParallelTimeout()
+        if self._exc_info:
+            six.reraise(*self._exc_info)
+        return self._result
+
+    def _set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def _set_exc_info(self, exc_info):
+        self._exc_info = exc_info
+        self._event.set()
+
+
+def _in_request_context(func, future):
+    """
+    if we are in a request, we want the called function to run in the same request context,
+    with a copy of flask.g (g is not shared between threads)
+
+    the attributes of g set by the call are kept in the future
+    """
+    if not flask.has_request_context():
+        return func
+
+    parent_g = dict(flask.g.__dict__)
+    future.parent = parent_g.get('parallel_future')
+
+    @flask.copy_current_request_context
+    def wrapper(*args, **kwargs):
+        flask.g.__dict__.update(parent_g)
+        flask.g.parallel_future = future
+        try:
+            return func(*args, **kwargs)
+        finally:
+            future.g_updates = {k: v for k, v in flask.g.__dict__.items()
+                                if k != 'parallel_future' and (k not in parent_g or parent_g[k] is not v)}
+
+    return wrapper
+
+
+def is_cancelled():
+    """
+    return True if the current call has been cancelled by the thread waiting for it
+    """
+    if not flask.has_request_context():
+        return False
+    future = getattr(flask.g, 'parallel_future', None)
+    return future is not None and future.cancelled()
+
+
+def _run(future, func, args, kwargs):
+    try:
+        future._set_result(func(*args, **kwargs))
+    except:
+        future._set_exc_info(sys.exc_info())
+
+
+def _start_daemon(target, *args):
+    thread = Thread(target=target, args=args)
+    # a call that never answer must not block the exit of the process
+    thread.daemon = True
+    thread.start()
+
+
+def spawn(func, *args, **kwargs):
+    """
+    call func(*args, **kwargs) in a new daemon thread
+
+    return a Future to get the result of the call
+    """
+    future = Future()
+    _start_daemon(_run, future, _in_request_context(func, future), args, kwargs)
+    return future
+
+
+class Executor(object):
+    """
+    run the calls in at most max_workers threads at the same time, the other calls wait for a free thread
+
+    the threads are started when needed and stop when there is no call left.
+    A call run by an executor must not wait for a call of the same executor: no thread might be left for it
+    """
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._calls = deque()
+        self._nb_workers = 0
+        self._lock = Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        call func(*args, **kwargs) in a thread of the executor
+
+        return a Future to get the result of the call
+        """
+        future = Future()
+        with self._lock:
+            self._calls.append((future, _in_request_context(func, future), args, kwargs))
+            if self._nb_workers >= self.max_workers:
+                return future
+            self._nb_workers += 1
+        _start_daemon(self._work)
+        return future
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if not self._calls:
+                    self._nb_workers -= 1
+                    return
+                future, func, args, kwargs = self._calls.popleft()
+            _run(future, func, args, kwargs)
+
+
+DEFAULT_MAX_WORKERS_BY_REQUEST = 8
+_executor_lock = Lock()
+
+
+def request_executor():
+    """
+    the executor shared by all the threads of the current request,
+    the request does not use more than PARALLEL_MAX_WORKERS_BY_REQUEST threads with it
+
+    outside of a request, a new executor is returned
+    """
+    if not flask.has_request_context():
+        return Executor(DEFAULT_MAX_WORKERS_BY_REQUEST)
+    request = flask.request._get_current_object()
+    with _executor_lock:
+        executor = getattr(request, 'parallel_executor', None)
+        if executor is None:
+            executor = Executor(flask.current_app.config.get('PARALLEL_MAX_WORKERS_BY_REQUEST',
+                                                             DEFAULT_MAX_WORKERS_BY_REQUEST))
+            request.parallel_executor = executor
+    return executor
+
+
+def wait_all(futures, timeout=None):
+    """
+    wait for all the futures to be finished, at most timeout seconds
+
+    return True if they all have finished
+    """
+    deadline = time.time() + timeout if timeout is not None else None
+    for f in futures:
+        remaining = max(deadline - time.time(), 0) if deadline is not None else None
+        if not f.wait(remaining):
+            return False
+    return True
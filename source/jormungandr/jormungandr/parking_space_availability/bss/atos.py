@@ -53,15 +53,20 @@ class AtosProvider(BssProvider):
                properties.get('network') == self.network
 
     def get_informations(self, poi):
+        return self.get_informations_of_pois([poi])[0]
+
+    def get_informations_of_pois(self, pois):
+        """
+        all the stands are fetched at once, so they are fetched once for all the pois
+        """
         try:
             all_stands = self.get_all_stands()
-            ref = poi.get('properties', {}).get('ref')
-            stands = all_stands.get(ref)
-            return stands
+            return [all_stands.get(poi.get('properties', {}).get('ref')) for poi in pois]
         except URLError as e:
             logging.getLogger(__name__).info(str(e))
         except suds.WebFault as e:
             logging.getLogger(__name__).info('{} in document {}'.format(e.fault, e.document))
+        return [None] * len(pois)
 
     @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_ATOS', 30))
     def get_all_stands(self):
@@ -28,6 +28,7 @@
 # www.navitia.io
 from __future__ import absolute_import, print_function, unicode_literals, division
 from abc import abstractmethod, ABCMeta
+from jormungandr import parallel
 
 
 class BssProvider(object):
@@ -43,3 +44,15 @@ class BssProvider(object):
     @abstractmethod
     def get_informations(self, poi):
         pass
+
+    def get_informations_of_pois(self, pois):
+        """
+        get the stands of several pois, in the same order
+
+        by default the pois are looked up concurrently, the providers able to get all their stands at once
+        should override it
+        """
+        if len(pois) == 1:
+            return [self.get_informations(pois[0])]
+        futures = [parallel.spawn(self.get_informations, poi) for poi in pois]
+        return [f.result() for f in futures]
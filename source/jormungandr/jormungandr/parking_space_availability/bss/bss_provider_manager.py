@@ -27,8 +27,9 @@
 # https://groups.google.com/d/forum/navitia
 # www.navitia.io
 from __future__ import absolute_import, print_function, unicode_literals, division
-from jormungandr import app
+from jormungandr import app, parallel
 from importlib import import_module
+import collections
 import logging
 
 
@@ -42,11 +43,33 @@ class BssProviderManager(object):
             self.bss_providers.append(self.init_class(configuration['class'], arguments))
 
     def handle_places(self, places):
+        """
+        add the stands of the bss stations
+
+        the pois are grouped by provider and the providers are called concurrently, the stands not known
+        after BSS_PROVIDERS_TIMEOUT seconds are left empty
+        """
+        pois_by_provider = collections.OrderedDict()
         for place in places or []:
             if place['embedded_type'] == 'poi' and place['poi']['poi_type']['id'] == 'poi_type:amenity:bicycle_rental':
                 provider = self.find_provider(place['poi'])
                 if provider:
-                    place['poi']['stands'] = provider.get_informations(place['poi'])
+                    pois_by_provider.setdefault(provider, []).append(place['poi'])
+
+        calls = [(provider, pois, parallel.spawn(provider.get_informations_of_pois, pois))
+                 for provider, pois in pois_by_provider.items()]
+        parallel.wait_all([f for _, _, f in calls], timeout=app.config.get('BSS_PROVIDERS_TIMEOUT', 5))
+
+        for provider, pois, future in calls:
+            stands = [None] * len(pois)
+            try:
+                stands = future.result(timeout=0)
+            except parallel.ParallelTimeout:
+                self.log.error('timeout while getting the stands of {} pois from {}'.format(len(pois), provider))
+            except:
+                self.log.exception('impossible to get the stands from {}'.format(provider))
+            for poi, s in zip(pois, stands):
+                poi['stands'] = s
         return places
 
     def find_provider(self, poi):
@@ -30,7 +30,9 @@ from __future__ import absolute_import, print_function, unicode_literals, divisi
 from jormungandr.parking_space_availability.bss.bss_provider import BssProvider
 from jormungandr.parking_space_availability.bss.stands import Stands
 from jormungandr import cache, app
+from jormungandr.realtime_schedule import http_session
 import pybreaker
+from jormungandr.circuit_breaker import CircuitBreaker
 import requests as requests
 import logging
 
@@ -38,6 +40,7 @@ import logging
 class JcdecauxProvider(BssProvider):
 
     WS_URL_TEMPLATE = 'https://api.jcdecaux.com/vls/v1/stations/{}?contract={}&apiKey={}'
+    WS_ALL_STATIONS_URL_TEMPLATE = 'https://api.jcdecaux.com/vls/v1/stations?contract={}&apiKey={}'
     OPERATOR = 'JCDecaux'
 
     def __init__(self, network, contract, api_key, timeout=10):
@@ -45,18 +48,17 @@ class JcdecauxProvider(BssProvider):
         self.contract = contract
         self.api_key = api_key
         self.timeout = timeout
-        self.breaker = pybreaker.CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_JCDECAUX_FAIL'],
-                                                reset_timeout=app.config['CIRCUIT_BREAKER_JCDECAUX_TIMEOUT_S'])
+        self.breaker = CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_JCDECAUX_FAIL'],
+                                      reset_timeout=app.config['CIRCUIT_BREAKER_JCDECAUX_TIMEOUT_S'])
 
     def support_poi(self, poi):
         properties = poi.get('properties', {})
         return properties.get('operator') == self.OPERATOR and \
                properties.get('network') == self.network
 
-    @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_JCDECAUX', 5))
-    def _call_webservice(self, station_id):
+    def _get(self, url):
         try:
-            data = self.breaker.call(requests.get, self.WS_URL_TEMPLATE.format(station_id, self.contract, self.api_key), timeout=self.timeout)
+            data = self.breaker.call(http_session.get, url, timeout=self.timeout)
             return data.json()
         except pybreaker.CircuitBreakerError as e:
             logging.getLogger(__name__).error('JCDecaux service dead (error: {})'.format(e))
@@ -66,8 +68,41 @@ class JcdecauxProvider(BssProvider):
             logging.getLogger(__name__).exception('JCDecaux error')
         return None
 
+    @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_JCDECAUX', 5))
+    def _call_webservice(self, station_id):
+        return self._get(self.WS_URL_TEMPLATE.format(station_id, self.contract, self.api_key))
+
+    @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_JCDECAUX', 5))
+    def _call_webservice_all_stations(self):
+        return self._get(self.WS_ALL_STATIONS_URL_TEMPLATE.format(self.contract, self.api_key))
+
+    @staticmethod
+    def _make_stands(data):
+        if data and 'available_bike_stands' in data and 'available_bikes' in data:
+            return Stands(data['available_bike_stands'], data['available_bikes'])
+        return None
+
     def get_informations(self, poi):
         ref = poi.get('properties', {}).get('ref')
         data = self._call_webservice(ref)
-        if data and 'available_bike_stands' in data and 'available_bikes' in data:
-            return Stands(data['available_bike_stands'], data['available_bikes'])
+        return self._make_stands(data)
+
+    def get_all_stands(self):
+        """
+        get the stands of all the stations of the contract, by station number
+        """
+        data = self._call_webservice_all_stations()
+        if not isinstance(data, list):
+            return None
+        return {unicode(station.get('number')): self._make_stands(station) for station in data}
+
+    def get_informations_of_pois(self, pois):
+        """
+        for several pois, all the stations of the contract are fetched at once
+        """
+        if len(pois) == 1:
+            return [self.get_informations(pois[0])]
+        all_stands = self.get_all_stands()
+        if all_stands is None:
+            return [None] * len(pois)
+        return [all_stands.get(poi.get('properties', {}).get('ref')) for poi in pois]
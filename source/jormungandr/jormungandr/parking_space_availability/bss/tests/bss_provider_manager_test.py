@@ -30,7 +30,10 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 from jormungandr.parking_space_availability.bss.bss_provider_manager import BssProviderManager
 from jormungandr import app
+from jormungandr.parking_space_availability.bss.bss_provider import BssProvider
+from jormungandr.parking_space_availability.bss.stands import Stands
 from nose.tools import raises
+import time
 
 CONFIG = ([
     {
@@ -99,3 +102,78 @@ def realtime_place_find_provider_test():
     manager = BssProviderManager()
     provider = manager.find_provider(poi)
     assert provider == manager.bss_providers[0]
+
+
+class SlowProvider(BssProvider):
+    """
+    provider of the pois of a network, taking some time to answer
+    """
+    def __init__(self, network, latency):
+        self.network = network
+        self.latency = latency
+        self.calls = []
+
+    def support_poi(self, poi):
+        return poi['properties']['network'] == self.network
+
+    def get_informations(self, poi):
+        pass
+
+    def get_informations_of_pois(self, pois):
+        self.calls.append([poi['properties']['ref'] for poi in pois])
+        time.sleep(self.latency)
+        return [Stands(int(poi['properties']['ref']), 0) for poi in pois]
+
+
+def make_bss_place(network, ref):
+    return {
+        'embedded_type': 'poi',
+        'poi': {
+            'poi_type': {'name': 'station vls', 'id': 'poi_type:amenity:bicycle_rental'},
+            'properties': {'network': network, 'ref': ref}
+        }
+    }
+
+
+def realtime_place_handle_concurrent_test():
+    """
+    the pois are grouped by provider and the providers are called concurrently
+    """
+    app.config['BSS_PROVIDER'] = []
+    manager = BssProviderManager()
+    provider_a = SlowProvider('a', 0.2)
+    provider_b = SlowProvider('b', 0.2)
+    manager.bss_providers = [provider_a, provider_b]
+    places = [make_bss_place('a', '1'), make_bss_place('b', '2'), make_bss_place('a', '3'),
+              {'embedded_type': 'stop_area'}]
+
+    start = time.time()
+    manager.handle_places(places)
+
+    assert time.time() - start < 0.35
+    assert provider_a.calls == [['1', '3']]
+    assert provider_b.calls == [['2']]
+    assert [p['poi']['stands'] for p in places[:3]] == [Stands(1, 0), Stands(2, 0), Stands(3, 0)]
+    assert 'poi' not in places[3]
+
+
+def realtime_place_handle_timeout_test():
+    """
+    the stands of a provider too slow to answer are left empty
+    """
+    app.config['BSS_PROVIDER'] = []
+    previous_timeout = app.config.get('BSS_PROVIDERS_TIMEOUT')
+    app.config['BSS_PROVIDERS_TIMEOUT'] = 0.1
+    try:
+        manager = BssProviderManager()
+        manager.bss_providers = [SlowProvider('fast', 0), SlowProvider('slow', 1)]
+        places = [make_bss_place('fast', '1'), make_bss_place('slow', '2')]
+
+        start = time.time()
+        manager.handle_places(places)
+
+        assert time.time() - start < 0.5
+        assert places[0]['poi']['stands'] == Stands(1, 0)
+        assert places[1]['poi']['stands'] is None
+    finally:
+        app.config['BSS_PROVIDERS_TIMEOUT'] = previous_timeout
@@ -30,6 +30,7 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 from jormungandr.parking_space_availability.bss.jcdecaux import JcdecauxProvider
 from jormungandr.parking_space_availability.bss.stands import Stands
+from jormungandr.realtime_schedule.tests.utils import http_stub
 from mock import MagicMock
 
 poi = {
@@ -82,3 +83,53 @@ def parking_space_availability_jcdecaux_get_informations_test_unauthorized():
     provider = JcdecauxProvider(u"Vélib'", 'Paris', 'unauthorized_api_key')
     provider._call_webservice = MagicMock(return_value=webservice_unauthorized_response)
     assert provider.get_informations(poi) is None
+
+
+def stub_provider(server):
+    provider = JcdecauxProvider(u"Vélib'", 'Paris', 'api_key')
+    base_url = 'http://127.0.0.1:{}/vls/v1/stations'.format(server.server_port)
+    provider.WS_URL_TEMPLATE = base_url + '/{}?contract={}&apiKey={}'
+    provider.WS_ALL_STATIONS_URL_TEMPLATE = base_url + '?contract={}&apiKey={}'
+    return provider
+
+
+def make_poi(ref):
+    return {'properties': {'network': u"Vélib'", 'operator': 'JCDecaux', 'ref': ref}}
+
+
+def parking_space_availability_jcdecaux_get_informations_of_pois_test():
+    """
+    the stands of several stations are fetched with only one call
+    """
+    all_stations = [
+        {'number': 2, 'available_bike_stands': 4, 'available_bikes': 8},
+        {'number': 3, 'available_bike_stands': 1, 'available_bikes': 12},
+        {'number': 4, 'status': 'CLOSED'},
+    ]
+    with http_stub({'/vls/v1/stations': all_stations}) as server:
+        provider = stub_provider(server)
+        stands = provider.get_informations_of_pois([make_poi('3'), make_poi('2'), make_poi('4'), make_poi('5')])
+
+        assert stands == [Stands(1, 12), Stands(4, 8), None, None]
+        assert server.requests == ['/vls/v1/stations?contract=Paris&apiKey=api_key']
+
+
+def parking_space_availability_jcdecaux_get_informations_of_one_poi_test():
+    """
+    for only one station, we only ask for this one
+    """
+    with http_stub({'/vls/v1/stations/2': {'available_bike_stands': 4, 'available_bikes': 8}}) as server:
+        provider = stub_provider(server)
+
+        assert provider.get_informations_of_pois([make_poi('2')]) == [Stands(4, 8)]
+        assert server.requests == ['/vls/v1/stations/2?contract=Paris&apiKey=api_key']
+
+
+def parking_space_availability_jcdecaux_get_informations_of_pois_error_test():
+    """
+    if the stations cannot be fetched, all the stands are unknown
+    """
+    with http_stub({}) as server:
+        provider = stub_provider(server)
+
+        assert provider.get_informations_of_pois([make_poi('2'), make_poi('3')]) == [None, None]
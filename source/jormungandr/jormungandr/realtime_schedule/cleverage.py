@@ -31,9 +31,12 @@
 from jormungandr.realtime_schedule.realtime_proxy import RealtimeProxy
 from flask import logging
 import pybreaker
+from jormungandr.circuit_breaker import CircuitBreaker
 import pytz
 import requests as requests
-from jormungandr import cache, app
+from jormungandr import app
+from jormungandr.realtime_schedule import http_session
+from jormungandr.realtime_schedule.stale_cache import StaleWhileRevalidateCache
 from jormungandr.schedule import RealTimePassage
 from datetime import datetime
 
@@ -48,8 +51,12 @@ class Cleverage(RealtimeProxy):
         self.timeout = timeout  # timeout in seconds
         self.rt_system_id = id
         self.object_id_tag = object_id_tag if object_id_tag else id
-        self.breaker = pybreaker.CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_CLEVERAGE_FAIL'],
-                                                reset_timeout=app.config['CIRCUIT_BREAKER_CLEVERAGE_TIMEOUT_S'])
+        self.breaker = CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_CLEVERAGE_FAIL'],
+                                      reset_timeout=app.config['CIRCUIT_BREAKER_CLEVERAGE_TIMEOUT_S'])
+        # the cache is shared between servers in production with the rt_system_id in the key
+        self.cache = StaleWhileRevalidateCache('Cleverage:{}'.format(id),
+                                               timeout=app.config['CACHE_CONFIGURATION'].get('TIMEOUT_CLEVERAGE', 30),
+                                               stale_timeout=app.config.get('REALTIME_PROXIES_STALE_TIMEOUT', 120))
         self.timezone = pytz.timezone(timezone)
 
     def __repr__(self):
@@ -58,13 +65,18 @@ class Cleverage(RealtimeProxy):
         """
         return self.rt_system_id
 
-    @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_CLEVERAGE', 30))
     def _call_cleverage(self, url):
+        """
+        cached call, an expired response is served while it is refreshed
+        """
+        return self.cache.get(url, self._call_cleverage_without_cache, url)
+
+    def _call_cleverage_without_cache(self, url):
         """
         http call to cleverage
         """
         try:
-            return self.breaker.call(requests.get, url, timeout=self.timeout, headers=self.service_args)
+            return self.breaker.call(http_session.get, url, timeout=self.timeout, headers=self.service_args)
         except pybreaker.CircuitBreakerError as e:
             logging.getLogger(__name__).error('Cleverage RT service dead, using base '
                                               'schedule (error: {}'.format(e))
@@ -141,4 +153,6 @@ class Cleverage(RealtimeProxy):
                 'circuit_breaker': {'current_state': self.breaker.current_state,
                                     'fail_counter': self.breaker.fail_counter,
                                     'reset_timeout': self.breaker.reset_timeout},
+                'http': http_session.host_stats(self.service_url),
+                'cache': self.cache.status(),
                 }
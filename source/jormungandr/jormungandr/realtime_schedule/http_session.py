@@ -0,0 +1,184 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Lock
+import time
+import urlparse
+import cookielib
+import requests
+from requests.adapters import HTTPAdapter, DEFAULT_POOLBLOCK
+from requests.packages.urllib3 import connectionpool, poolmanager
+from jormungandr import app
+
+# HTTP session shared by the realtime proxies and the bss providers
+#
+# The connections are pooled by host and kept alive, so only the first call to a service pays the tcp (and tls)
+# connection, not every cache miss.
+
+
+class HttpStats(object):
+    """
+    number of requests and of new connections (the other requests reused a pooled one) by host
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.by_host = {}
+
+    def _get(self, host):
+        return self.by_host.setdefault(host, {'requests': 0, 'new_connections': 0, 'connect_time': 0.0})
+
+    def add_request(self, host):
+        with self.lock:
+            self._get(host)['requests'] += 1
+
+    def add_connection(self, host, duration):
+        with self.lock:
+            stats = self._get(host)
+            stats['new_connections'] += 1
+            stats['connect_time'] += duration
+
+    def get(self, host):
+        with self.lock:
+            stats = dict(self._get(host))
+        new_connections = stats['new_connections']
+        return {'requests': stats['requests'],
+                'new_connections': new_connections,
+                'pool_hits': max(stats['requests'] - new_connections, 0),
+                'mean_connect_time': stats['connect_time'] / new_connections if new_connections else None}
+
+
+def _timed_connection_class(connection_cls, stats):
+    class TimedConnection(connection_cls):
+        def connect(self):
+            start = time.time()
+            connection_cls.connect(self)
+            stats.add_connection(self.host, time.time() - start)
+    return TimedConnection
+
+
+def _timed_pool_class(pool_cls, stats):
+    class TimedConnectionPool(pool_cls):
+        ConnectionCls = _timed_connection_class(pool_cls.ConnectionCls, stats)
+    return TimedConnectionPool
+
+
+class _PoolManager(poolmanager.PoolManager):
+    """
+    PoolManager whose pools have their size by host, and record their connections
+    """
+    def __init__(self, stats, maxsize_by_host, **kwargs):
+        poolmanager.PoolManager.__init__(self, **kwargs)
+        self.maxsize_by_host = maxsize_by_host
+        self.pool_classes = {scheme: _timed_pool_class(cls, stats)
+                             for scheme, cls in poolmanager.pool_classes_by_scheme.items()}
+
+    def _new_pool(self, scheme, host, port):
+        kwargs = dict(self.connection_pool_kw)
+        if scheme == 'http':
+            for kw in poolmanager.SSL_KEYWORDS:
+                kwargs.pop(kw, None)
+        if host in self.maxsize_by_host:
+            kwargs['maxsize'] = self.maxsize_by_host[host]
+        return self.pool_classes[scheme](host, port, **kwargs)
+
+
+class _PooledAdapter(HTTPAdapter):
+    def __init__(self, stats, maxsize_by_host, **kwargs):
+        self.stats = stats
+        self.maxsize_by_host = maxsize_by_host
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _PoolManager(self.stats, self.maxsize_by_host, num_pools=connections,
+                                        maxsize=maxsize, block=block, strict=True, **pool_kwargs)
+
+
+class PooledSession(object):
+    """
+    :param pool_connections: number of hosts whose connections are kept
+    :param pool_maxsize: number of connections kept by host
+    :param pool_maxsize_by_host: dict host -> number of connections kept, for the hosts needing another size
+    :param compression: if False, the services are asked not to compress their responses
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_maxsize_by_host=None, compression=True):
+        self.stats = HttpStats()
+        self.session = requests.Session()
+        # the session is shared by all the proxies: the cookie set by a service is neither kept
+        # nor sent with the next calls, to this service or to the service of another proxy
+        self.session.cookies.set_policy(cookielib.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = _PooledAdapter(self.stats, pool_maxsize_by_host or {},
+                                 pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not compression:
+            # requests asks for gzip and deflate by default
+            self.session.headers['Accept-Encoding'] = 'identity'
+
+    def get(self, url, **kwargs):
+        self.stats.add_request(urlparse.urlparse(url).hostname)
+        return self.session.get(url, **kwargs)
+
+    def host_stats(self, url):
+        return self.stats.get(urlparse.urlparse(url).hostname)
+
+
+_session = None
+_session_lock = Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = PooledSession(pool_connections=app.config.get('HTTP_POOL_CONNECTIONS', 10),
+                                         pool_maxsize=app.config.get('HTTP_POOL_MAXSIZE', 10),
+                                         pool_maxsize_by_host=app.config.get('HTTP_POOL_MAXSIZE_BY_HOST', {}),
+                                         compression=app.config.get('HTTP_COMPRESSION', True))
+    return _session
+
+
+def get(url, **kwargs):
+    """
+    same as requests.get, with the shared session
+    """
+    return get_session().get(url, **kwargs)
+
+
+def host_stats(url):
+    """
+    stats of the connections to the host of the url
+    """
+    return get_session().host_stats(url)
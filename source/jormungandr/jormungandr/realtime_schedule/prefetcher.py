@@ -0,0 +1,219 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Lock, Thread
+from copy import deepcopy
+import hashlib
+import logging
+import struct
+import time
+from jormungandr.schedule import RoutePoint
+
+# Background prefetching of the next passages of the most requested route points
+#
+# The realtime proxies are called with the route points of a request grouped by call, the most frequent calls
+# are replayed in background every period, so their responses stay in the proxies cache and the requests for the
+# busy stops do not wait for the realtime services.
+# The replayed calls do not use the cached responses, each one is a call to the service.
+
+
+class FrequencySketch(object):
+    """
+    count-min sketch: approximate number of occurrences of the keys, in a fixed memory
+
+    the counters are halved every reset_after additions, so the old occurrences are forgotten
+
+    >>> sketch = FrequencySketch(width=64, reset_after=100)
+    >>> for _ in range(10):
+    ...     _ = sketch.add('bob')
+    >>> sketch.estimate('bob')
+    10
+    >>> sketch.estimate('bobette')
+    0
+    >>> for _ in range(90):
+    ...     _ = sketch.add('bobitto')
+    >>> sketch.estimate('bob')
+    5
+    """
+    depth = 4  # 4 indexes are taken from the md5 of the key
+
+    def __init__(self, width=1024, reset_after=None):
+        self.width = width
+        self.reset_after = reset_after or 10 * width
+        self.table = [[0] * width for _ in range(self.depth)]
+        self.additions = 0
+
+    def _indexes(self, key):
+        return [h % self.width for h in struct.unpack(b'<4I', hashlib.md5(key.encode('utf-8')).digest())]
+
+    def add(self, key):
+        """
+        count an occurrence of key, return its new estimated frequency
+        """
+        indexes = self._indexes(key)
+        for row, i in zip(self.table, indexes):
+            row[i] += 1
+        self.additions += 1
+        if self.additions >= self.reset_after:
+            self._age()
+        return min(row[i] for row, i in zip(self.table, indexes))
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.table, self._indexes(key)))
+
+    def _age(self):
+        for row in self.table:
+            for i, v in enumerate(row):
+                row[i] = v // 2
+        self.additions //= 2
+
+
+class HotCalls(object):
+    """
+    the max_size most frequent calls (a proxy and the route points given in one call)
+
+    a call enters when it is more frequent than the least frequent of the kept ones (TinyLFU admission)
+    """
+    def __init__(self, max_size, sketch=None):
+        self.max_size = max_size
+        self.sketch = sketch or FrequencySketch()
+        self.lock = Lock()
+        self.calls = {}  # key -> [frequency, proxy id, route points]
+
+    def add(self, proxy_id, route_points):
+        key = '{}|{}'.format(proxy_id, '|'.join('{};{}'.format(rp.pb_route.uri, rp.pb_stop_point.uri)
+                                                 for rp in route_points))
+        with self.lock:
+            aging = self.sketch.additions + 1 >= self.sketch.reset_after
+            frequency = self.sketch.add(key)
+            if aging:
+                for call in self.calls.values():
+                    call[0] //= 2
+            call = self.calls.get(key)
+            if call:
+                call[0] = frequency
+                return
+            if len(self.calls) >= self.max_size:
+                victim = min(self.calls, key=lambda k: self.calls[k][0])
+                if self.calls[victim][0] >= frequency:
+                    return
+                del self.calls[victim]
+        # we keep a copy of the route points, not to keep the whole kraken response alive
+        route_points = [RoutePoint(route=deepcopy(rp.pb_route), stop_point=deepcopy(rp.pb_stop_point))
+                        for rp in route_points]
+        with self.lock:
+            if len(self.calls) < self.max_size:
+                self.calls[key] = [frequency, proxy_id, route_points]
+
+    def most_frequent(self):
+        """
+        return the calls as a list of (proxy id, route points), the most frequent first
+        """
+        with self.lock:
+            calls = sorted(self.calls.values(), key=lambda c: c[0], reverse=True)
+        return [(proxy_id, route_points) for _, proxy_id, route_points in calls]
+
+
+class Prefetcher(object):
+    """
+    replay the hot calls of a RealtimeProxyManager every period seconds,
+    with at most max_calls_by_second calls to the proxies
+    """
+    def __init__(self, proxy_manager, max_calls=100, period=30, max_calls_by_second=5):
+        self.proxy_manager = proxy_manager
+        self.hot_calls = HotCalls(max_calls)
+        self.period = period
+        self.min_interval = 1. / max_calls_by_second
+        self.thread = None
+        self.lock = Lock()
+        self.next_call = 0
+        self.stats = {'cycles': 0, 'calls': 0, 'errors': 0, 'last_cycle_duration': None}
+
+    def record(self, proxy_id, route_points):
+        """
+        record a call to a proxy, the prefetching thread is started on the first one
+        """
+        self.hot_calls.add(proxy_id, route_points)
+        if self.thread is None:
+            self._start()
+
+    def _start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = Thread(target=self._run, name='realtime_prefetcher')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.period)
+            try:
+                self.prefetch()
+            except:
+                logging.getLogger(__name__).exception('error while prefetching the realtime passages')
+
+    def _wait_next_call(self):
+        time.sleep(max(self.next_call - time.time(), 0))
+        self.next_call = time.time() + self.min_interval
+
+    def prefetch(self):
+        """
+        get from the services the passages of all the hot calls and store them in the proxies cache
+
+        the cached responses are not used: all the hot calls are refreshed at each cycle,
+        with at most max_calls_by_second calls to the services
+        """
+        start = time.time()
+        self.next_call = start
+        for proxy_id, route_points in self.hot_calls.most_frequent():
+            proxy = self.proxy_manager.get(proxy_id)
+            cache = getattr(proxy, 'cache', None)
+            if cache is None:
+                # there is no cache to keep fresh
+                continue
+            with cache.refreshing(before_call=self._wait_next_call) as refreshed:
+                try:
+                    proxy.next_passages_for_route_points(route_points)
+                except:
+                    self.stats['errors'] += 1
+                    logging.getLogger(__name__).exception('impossible to prefetch the passages from {}'
+                                                          .format(proxy_id))
+            self.stats['calls'] += refreshed['calls']
+        self.stats['cycles'] += 1
+        self.stats['last_cycle_duration'] = time.time() - start
+
+    def status(self):
+        status = dict(self.stats)
+        status['hot_calls'] = len(self.hot_calls.calls)
+        status['period'] = self.period
+        return status
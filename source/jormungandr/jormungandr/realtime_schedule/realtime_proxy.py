@@ -38,10 +38,23 @@ class RealtimeProxy(object):
     """
     __metaclass__ = ABCMeta
 
+    # True if the service gives the next passages of several route points in one call,
+    # next_passages_for_route_points is then called once with all the route points of a request
+    batch_api = False
+
     @abstractmethod
     def next_passage_for_route_point(self, route_point):
         pass
 
+    def next_passages_for_route_points(self, route_points):
+        """
+        return the next passages of several route points as a dict {route_point: next passages}
+
+        by default the route points are queried one by one,
+        the proxies able to do better must override it and set batch_api
+        """
+        return {rp: self.next_passage_for_route_point(rp) for rp in route_points}
+
     @abstractmethod
     def status(self):
         """
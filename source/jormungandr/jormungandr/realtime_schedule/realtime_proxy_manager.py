@@ -31,6 +31,8 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 from importlib import import_module
 import logging
+from jormungandr import app
+from jormungandr.realtime_schedule.prefetcher import Prefetcher
 
 
 class RealtimeProxyManager(object):
@@ -79,5 +81,22 @@ class RealtimeProxyManager(object):
 
             self.realtime_proxies[proxy_id] = rt_proxy
 
+        self.prefetcher = None
+        if app.config.get('REALTIME_PREFETCH_ENABLED', False) and self.realtime_proxies:
+            self.prefetcher = Prefetcher(self,
+                                         max_calls=app.config.get('REALTIME_PREFETCH_MAX_CALLS', 100),
+                                         period=app.config.get('REALTIME_PREFETCH_PERIOD', 30),
+                                         max_calls_by_second=app.config.get('REALTIME_PREFETCH_MAX_CALLS_BY_SECOND', 5))
+
     def get(self, proxy_name):
         return self.realtime_proxies.get(proxy_name)
+
+    def record_call(self, proxy_name, route_points):
+        """
+        record a call to a proxy, for the prefetching of the most frequent ones
+        """
+        if self.prefetcher:
+            self.prefetcher.record(proxy_name, route_points)
+
+    def prefetcher_status(self):
+        return self.prefetcher.status() if self.prefetcher else None
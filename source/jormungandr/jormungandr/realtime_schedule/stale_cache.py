@@ -0,0 +1,187 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from contextlib import contextmanager
+from threading import Lock, Event, Thread, local
+import logging
+import time
+from jormungandr import cache
+
+# Cache of the realtime proxies responses
+#
+# An expired response is still served during stale_timeout seconds while a call refreshes it in background,
+# so only the first call for a route point waits for the service, not the first call after each expiration.
+# The concurrent calls missing the same key wait for the same call to the service instead of all calling it.
+
+
+class _Call(object):
+    """
+    call to the service in progress for a key
+    """
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+
+
+class StaleWhileRevalidateCache(object):
+    """
+    the values are stored with their fetch time in the flask cache (shared by the workers),
+    the calls in progress and the stats are by process
+    """
+    def __init__(self, name, timeout, stale_timeout, backend=None):
+        self.name = name
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.backend = backend if backend is not None else cache
+        self.lock = Lock()
+        self.in_progress = {}
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+                      'refreshes': 0, 'prefetches': 0, 'failed_calls': 0}
+        # state of the refreshing block of each thread
+        self.local = local()
+        self.last_stale_age = None
+        self.max_stale_age = None
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    @contextmanager
+    def refreshing(self, before_call=None):
+        """
+        within the block, the gets of this thread ignore the cached values: they call the service and store its
+        response in the cache, unless the key is already being fetched
+
+        before_call is called before each call to the service, the number of calls is given by the yielded dict
+        """
+        refreshed = {'calls': 0, 'before_call': before_call}
+        self.local.refreshed = refreshed
+        try:
+            yield refreshed
+        finally:
+            self.local.refreshed = None
+
+    def _get_fresh(self, cache_key, refreshed, func, args, kwargs):
+        call, is_new = self._get_call(cache_key)
+        if not is_new:
+            call.done.wait()
+            return call.value
+        if refreshed['before_call']:
+            refreshed['before_call']()
+        refreshed['calls'] += 1
+        self._count('prefetches')
+        self._run(cache_key, call, func, args, kwargs)
+        return call.value
+
+    def get(self, key, func, *args, **kwargs):
+        """
+        return the cached value of key, func(*args, **kwargs) is called to get it when needed
+
+        a None value is not cached (the errors are not cached)
+        """
+        cache_key = '{}:{}'.format(self.name, key)
+        refreshed = getattr(self.local, 'refreshed', None)
+        if refreshed is not None:
+            return self._get_fresh(cache_key, refreshed, func, args, kwargs)
+
+        entry = self.backend.get(cache_key)
+        if entry is not None:
+            value, fetch_time = entry
+            age = time.time() - fetch_time
+            if age < self.timeout:
+                self._count('hits')
+                return value
+            if age < self.timeout + self.stale_timeout:
+                with self.lock:
+                    self.stats['stale_hits'] += 1
+                    self.last_stale_age = age
+                    self.max_stale_age = age if self.max_stale_age is None else max(age, self.max_stale_age)
+                self._refresh(cache_key, func, args, kwargs)
+                return value
+
+        call, is_new = self._get_call(cache_key)
+        if not is_new:
+            self._count('coalesced')
+            call.done.wait()
+            return call.value
+
+        self._count('misses')
+        self._run(cache_key, call, func, args, kwargs)
+        return call.value
+
+    def _get_call(self, cache_key):
+        """
+        return the call in progress for the key, or a new one if there is none
+        """
+        with self.lock:
+            call = self.in_progress.get(cache_key)
+            if call:
+                return call, False
+            call = self.in_progress[cache_key] = _Call()
+            return call, True
+
+    def _refresh(self, cache_key, func, args, kwargs):
+        """
+        refresh the value in background, unless it is already being refreshed
+        """
+        call, is_new = self._get_call(cache_key)
+        if not is_new:
+            return
+        self._count('refreshes')
+        thread = Thread(target=self._run, args=(cache_key, call, func, args, kwargs))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, cache_key, call, func, args, kwargs):
+        try:
+            call.value = func(*args, **kwargs)
+            if call.value is not None:
+                self.backend.set(cache_key, (call.value, time.time()), timeout=self.timeout + self.stale_timeout)
+            else:
+                self._count('failed_calls')
+        except:
+            self._count('failed_calls')
+            logging.getLogger(__name__).exception('impossible to get {}'.format(cache_key))
+        finally:
+            with self.lock:
+                del self.in_progress[cache_key]
+            call.done.set()
+
+    def status(self):
+        with self.lock:
+            status = dict(self.stats)
+            status['in_progress'] = len(self.in_progress)
+            status['last_stale_age'] = self.last_stale_age
+            status['max_stale_age'] = self.max_stale_age
+        status['timeout'] = self.timeout
+        status['stale_timeout'] = self.stale_timeout
+        return status
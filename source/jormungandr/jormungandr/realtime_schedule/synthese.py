@@ -30,6 +30,7 @@
 # www.navitia.io
 from __future__ import absolute_import, print_function, unicode_literals, division
 
+import collections
 from jormungandr.realtime_schedule.realtime_proxy import RealtimeProxy
 from jormungandr.schedule import RealTimePassage
 import xml.etree.ElementTree as et
@@ -37,8 +38,11 @@ from jormungandr.interfaces.parsers import date_time_format
 import pytz
 from flask import logging
 import pybreaker
+from jormungandr.circuit_breaker import CircuitBreaker
 import requests as requests
-from jormungandr import cache, app
+from jormungandr import app
+from jormungandr.realtime_schedule import http_session
+from jormungandr.realtime_schedule.stale_cache import StaleWhileRevalidateCache
 from datetime import datetime, time
 from navitiacommon.ratelimit import RateLimiter
 import redis
@@ -76,13 +80,20 @@ class Synthese(RealtimeProxy):
 
     def __init__(self, id, service_url, timezone, object_id_tag=None, timeout=10, redis_host=None, redis_db=0,
                  redis_port=6379, redis_password=None, max_requests_by_second=15,
-                 redis_namespace='jormungandr.rate_limiter'):
+                 redis_namespace='jormungandr.rate_limiter', batch_api=False):
         self.service_url = service_url
         self.timeout = timeout  # timeout in seconds
         self.rt_system_id = id
         self.object_id_tag = object_id_tag if object_id_tag else id
-        self.breaker = pybreaker.CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_SYNTHESE_FAIL'],
-                                                reset_timeout=app.config['CIRCUIT_BREAKER_SYNTHESE_TIMEOUT_S'])
+        # a call gives the next passages of all the routes of a stop point,
+        # if batch_api the route points of a request are grouped by stop point
+        self.batch_api = batch_api
+        self.breaker = CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_SYNTHESE_FAIL'],
+                                      reset_timeout=app.config['CIRCUIT_BREAKER_SYNTHESE_TIMEOUT_S'])
+        # the cache is shared between servers in production with the rt_system_id in the key
+        self.cache = StaleWhileRevalidateCache('Synthese:{}'.format(id),
+                                               timeout=app.config['CACHE_CONFIGURATION'].get('TIMEOUT_SYNTHESE', 30),
+                                               stale_timeout=app.config.get('REALTIME_PROXIES_STALE_TIMEOUT', 120))
         self.timezone = pytz.timezone(timezone)
         if not redis_host:
             self.rate_limiter = FakeRateLimiter()
@@ -97,15 +108,20 @@ class Synthese(RealtimeProxy):
         """
         return self.rt_system_id
 
-    @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_SYNTHESE', 30))
     def _call_synthese(self, url):
+        """
+        cached call, an expired response is served while it is refreshed
+        """
+        return self.cache.get(url, self._call_synthese_without_cache, url)
+
+    def _call_synthese_without_cache(self, url):
         """
         http call to synthese
         """
         try:
             if not self.rate_limiter.acquire(self.rt_system_id, block=False):
                 return None#this should not be cached :(
-            return self.breaker.call(requests.get, url, timeout=self.timeout)
+            return self.breaker.call(http_session.get, url, timeout=self.timeout)
         except pybreaker.CircuitBreakerError as e:
             logging.getLogger(__name__).error('Synthese RT service dead, using base '
                                               'schedule (error: {}'.format(e))
@@ -118,11 +134,11 @@ class Synthese(RealtimeProxy):
             logging.getLogger(__name__).exception('Synthese RT error, using base schedule')
         return None
 
-    def next_passage_for_route_point(self, route_point):
-        url = self._make_url(route_point)
-        if not url:
-            return None
-
+    def _get_passages_of_stop(self, url):
+        """
+        call synthese and return the next passages of the stop point by SyntheseRoutePoint,
+        None if there is a problem
+        """
         r = self._call_synthese(url)
         if not r:
             return None
@@ -134,11 +150,44 @@ class Synthese(RealtimeProxy):
             return None
 
         logging.getLogger(__name__).debug("synthese response: {}".format(r.text))
+        return self._get_synthese_passages(r.content)
+
+    def _make_synthese_route_point(self, route_point):
         stop_point_id = str(route_point.fetch_stop_id(self.object_id_tag))
         route_id = str(route_point.fetch_route_id(self.object_id_tag))
-        route_point = SyntheseRoutePoint(route_id, stop_point_id)
-        m = self._get_synthese_passages(r.content)
-        return m.get(route_point)# if there is nothing from synthese, we keep the base
+        return SyntheseRoutePoint(route_id, stop_point_id)
+
+    def next_passage_for_route_point(self, route_point):
+        url = self._make_url(route_point)
+        if not url:
+            return None
+
+        m = self._get_passages_of_stop(url)
+        if m is None:
+            return None
+
+        return m.get(self._make_synthese_route_point(route_point))# if there is nothing from synthese, we keep the base
+
+    def next_passages_for_route_points(self, route_points):
+        """
+        synthese is called once by stop point, for all the route points of the stop point
+        """
+        result = {}
+        route_points_by_url = collections.OrderedDict()
+        for route_point in route_points:
+            result[route_point] = None
+            url = self._make_url(route_point)
+            if url:
+                route_points_by_url.setdefault(url, []).append(route_point)
+
+        for url, rps in route_points_by_url.items():
+            m = self._get_passages_of_stop(url)
+            if m is None:
+                continue
+            for route_point in rps:
+                result[route_point] = m.get(self._make_synthese_route_point(route_point))
+
+        return result
 
     def _make_url(self, route_point):
         """
@@ -203,5 +252,7 @@ class Synthese(RealtimeProxy):
                 'circuit_breaker': {'current_state': self.breaker.current_state,
                                     'fail_counter': self.breaker.fail_counter,
                                     'reset_timeout': self.breaker.reset_timeout},
+                'http': http_session.host_stats(self.service_url),
+                'cache': self.cache.status(),
                 }
 
@@ -267,7 +267,7 @@ def next_passage_for_route_point_test():
 
     route_point = MockRoutePoint(line_code='05', stop_id='stop_tutu')
 
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         passages = cleverage.next_passage_for_route_point(route_point)
 
         assert len(passages) == 2
@@ -290,7 +290,7 @@ def next_passage_for_route_point_local_timezone_test():
 
     route_point = MockRoutePoint(line_code='05', stop_id='stop_tutu')
 
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         passages = cleverage.next_passage_for_route_point(route_point)
 
         assert len(passages) == 2
@@ -313,7 +313,7 @@ def next_passage_for_empty_response_test():
 
     route_point = MockRoutePoint(line_code='05', stop_id='stop_tutu')
 
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         passages = cleverage.next_passage_for_route_point(route_point)
 
         assert passages is None
@@ -333,7 +333,7 @@ def next_passage_for_missing_line_response_test():
 
     route_point = MockRoutePoint(line_code='05', stop_id='stop_tutu')
 
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         passages = cleverage.next_passage_for_route_point(route_point)
 
         assert passages is None
@@ -0,0 +1,97 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from jormungandr.realtime_schedule.http_session import PooledSession
+from jormungandr.realtime_schedule.tests.utils import http_stub
+
+
+def stub_url(server, path):
+    return 'http://127.0.0.1:{}{}'.format(server.server_port, path)
+
+
+def connections_reused_test():
+    """
+    the connection to a host is kept alive and reused by the following calls
+    """
+    with http_stub({'/bob': {'bob': 42}}) as server:
+        session = PooledSession()
+        url = stub_url(server, '/bob')
+        for _ in range(5):
+            r = session.get(url, timeout=1)
+            assert r.status_code == 200
+            assert r.json() == {'bob': 42}
+
+        stats = session.host_stats(url)
+        assert stats['requests'] == 5
+        assert stats['new_connections'] == 1
+        assert stats['pool_hits'] == 4
+        assert stats['mean_connect_time'] >= 0
+
+
+def no_stats_test():
+    session = PooledSession()
+    stats = session.host_stats('http://bob.com/')
+    assert stats == {'requests': 0, 'new_connections': 0, 'pool_hits': 0, 'mean_connect_time': None}
+
+
+def pool_size_by_host_test():
+    session = PooledSession(pool_maxsize=3, pool_maxsize_by_host={'127.0.0.1': 7})
+    adapter = session.session.get_adapter('http://127.0.0.1/')
+
+    assert adapter.poolmanager.connection_from_url('http://127.0.0.1:1234/').pool.maxsize == 7
+    assert adapter.poolmanager.connection_from_url('http://localhost:1234/').pool.maxsize == 3
+
+
+def compression_test():
+    with http_stub({'/bob': {}}) as server:
+        PooledSession().get(stub_url(server, '/bob'), timeout=1)
+        PooledSession(compression=False).get(stub_url(server, '/bob'), timeout=1)
+
+        assert 'gzip' in server.headers[0]['accept-encoding']
+        assert server.headers[1]['accept-encoding'] == 'identity'
+
+
+def no_cookies_test():
+    """
+    the session is shared by the proxies, the cookies of a service are not kept
+    """
+    with http_stub({'/bob': {}}, set_cookie='session=secret_of_bob; Path=/') as server:
+        session = PooledSession()
+        r = session.get(stub_url(server, '/bob'), timeout=1)
+        assert r.cookies.get('session') == 'secret_of_bob'
+        session.get(stub_url(server, '/bob'), timeout=1)
+
+        assert len(session.session.cookies) == 0
+        assert 'cookie' not in server.headers[1]
+        # the cookies given for a call are still sent
+        session.get(stub_url(server, '/bob'), timeout=1, cookies={'token': 'bob'})
+        assert server.headers[2]['cookie'] == 'token=bob'
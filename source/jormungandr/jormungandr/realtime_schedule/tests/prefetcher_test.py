@@ -0,0 +1,202 @@
+# coding=utf-8
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+# the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from collections import namedtuple
+import mock
+from werkzeug.contrib.cache import SimpleCache
+from jormungandr.realtime_schedule.prefetcher import HotCalls, Prefetcher, FrequencySketch
+from jormungandr.realtime_schedule.stale_cache import StaleWhileRevalidateCache
+from jormungandr.schedule import RoutePoint
+
+PbObject = namedtuple('PbObject', ['uri'])
+
+
+def _rp(route, stop):
+    return RoutePoint(route=PbObject(route), stop_point=PbObject(stop))
+
+
+def _uris(route_points):
+    return [(rp.pb_route.uri, rp.pb_stop_point.uri) for rp in route_points]
+
+
+def hot_calls_test():
+    """
+    the most frequent calls are kept, a new call must be more frequent than the least frequent one to enter
+    """
+    hot_calls = HotCalls(max_size=2, sketch=FrequencySketch(width=256))
+    for _ in range(4):
+        hot_calls.add('timeo', [_rp('r1', 's1'), _rp('r2', 's1')])
+    for _ in range(2):
+        hot_calls.add('timeo', [_rp('r3', 's3')])
+
+    # not frequent enough
+    hot_calls.add('synthese', [_rp('r4', 's4')])
+    hot_calls.add('synthese', [_rp('r4', 's4')])
+    calls = hot_calls.most_frequent()
+    assert [(proxy_id, _uris(rps)) for proxy_id, rps in calls] == [
+        ('timeo', [('r1', 's1'), ('r2', 's1')]),
+        ('timeo', [('r3', 's3')])
+    ]
+
+    # now it is more frequent than r3
+    hot_calls.add('synthese', [_rp('r4', 's4')])
+    calls = hot_calls.most_frequent()
+    assert [(proxy_id, _uris(rps)) for proxy_id, rps in calls] == [
+        ('timeo', [('r1', 's1'), ('r2', 's1')]),
+        ('synthese', [('r4', 's4')])
+    ]
+
+
+def hot_calls_copy_test():
+    """
+    the kept route points are copies
+    """
+    hot_calls = HotCalls(max_size=2)
+    rp = _rp('r1', 's1')
+    hot_calls.add('timeo', [rp])
+    _, rps = hot_calls.most_frequent()[0]
+    assert rps[0] == rp
+    assert rps[0].pb_route is not rp.pb_route
+
+
+class MockProxy(object):
+    """
+    the service is called through the cache, once for all the route points or once by route point
+    """
+    def __init__(self, call_by_route_point=False):
+        self.calls = []
+        self.call_by_route_point = call_by_route_point
+        self.cache = StaleWhileRevalidateCache('mock', timeout=60, stale_timeout=120, backend=SimpleCache())
+
+    def _call_service(self, uris):
+        self.calls.append(uris)
+        return 'passages'
+
+    def next_passages_for_route_points(self, route_points):
+        calls = [[rp] for rp in route_points] if self.call_by_route_point else [route_points]
+        for rps in calls:
+            self.cache.get('{}'.format(_uris(rps)), self._call_service, _uris(rps))
+        return {}
+
+
+class MockManager(object):
+    def __init__(self, proxies):
+        self.proxies = proxies
+
+    def get(self, name):
+        return self.proxies.get(name)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.
+
+    def time(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.now += duration
+
+
+def prefetch_test():
+    """
+    the hot calls are replayed, the most frequent first, with at most max_calls_by_second calls by second
+    """
+    timeo = MockProxy()
+    manager = MockManager({'timeo': timeo})
+    prefetcher = Prefetcher(manager, max_calls=10, period=30, max_calls_by_second=2)
+    # we don't want the prefetching thread in the test
+    prefetcher.thread = 'fake'
+
+    prefetcher.record('timeo', [_rp('r1', 's1')])
+    for _ in range(2):
+        prefetcher.record('timeo', [_rp('r2', 's2')])
+    prefetcher.record('unknown', [_rp('r3', 's3')])
+    prefetcher.record('timeo', [_rp('r4', 's4')])
+
+    clock = Clock()
+    with mock.patch('jormungandr.realtime_schedule.prefetcher.time', clock):
+        prefetcher.prefetch()
+
+    assert timeo.calls[0] == [('r2', 's2')]
+    assert sorted(timeo.calls[1:]) == [[('r1', 's1')], [('r4', 's4')]]
+    # 3 calls at 2 calls by second
+    assert clock.now == 1.
+    status = prefetcher.status()
+    assert status['calls'] == 3
+    assert status['cycles'] == 1
+    assert status['hot_calls'] == 4
+
+
+def prefetch_upstream_calls_test():
+    """
+    at each cycle, the services are called for all the hot calls even if their responses are in the cache,
+    the limit of calls by second is on the calls to the services
+    """
+    proxy = MockProxy(call_by_route_point=True)
+    prefetcher = Prefetcher(MockManager({'timeo': proxy}), max_calls=10, period=30, max_calls_by_second=2)
+    prefetcher.thread = 'fake'
+    prefetcher.record('timeo', [_rp('r1', 's1'), _rp('r2', 's2')])
+    prefetcher.record('timeo', [_rp('r3', 's3')])
+    # a request has just put the passages in the cache
+    proxy.next_passages_for_route_points([_rp('r1', 's1')])
+    proxy.calls = []
+
+    clock = Clock()
+    with mock.patch('jormungandr.realtime_schedule.prefetcher.time', clock):
+        prefetcher.prefetch()
+        assert len(proxy.calls) == 3
+        # 3 calls to the service at 2 calls by second
+        assert clock.now == 1.
+        prefetcher.prefetch()
+        assert len(proxy.calls) == 6
+
+    assert prefetcher.status()['calls'] == 6
+    assert proxy.cache.status()['prefetches'] == 6
+
+    # the requests are answered by the cache
+    proxy.next_passages_for_route_points([_rp('r3', 's3')])
+    assert len(proxy.calls) == 6
+
+
+def prefetch_without_cache_test():
+    """
+    a proxy without cache is not prefetched
+    """
+    class NoCacheProxy(object):
+        def next_passages_for_route_points(self, route_points):
+            assert False, 'the proxy should not be called'
+
+    prefetcher = Prefetcher(MockManager({'timeo': NoCacheProxy()}))
+    prefetcher.thread = 'fake'
+    prefetcher.record('timeo', [_rp('r1', 's1')])
+    prefetcher.prefetch()
+    assert prefetcher.status()['calls'] == 0
@@ -29,6 +29,8 @@
 from nose.tools.nontrivial import raises
 import pytz
 from jormungandr.realtime_schedule.realtime_proxy_manager import RealtimeProxyManager
+from jormungandr import app
+import mock
 
 
 def realtime_proxy_creation_test():
@@ -161,3 +163,24 @@ def multi_proxy_creation_test():
     manager = RealtimeProxyManager(config)
     assert manager.get('proxy_id') is not None
     assert manager.get('wrong') is None
+
+
+def prefetcher_creation_test():
+    """
+    the prefetcher is created only if it is enabled
+    """
+    config = [{
+                  'id': 'proxy_id',
+                  'class': 'jormungandr.realtime_schedule.timeo.Timeo',
+                  'args': {
+                      'timezone': 'Europe/Paris',
+                      'service_url': 'http://custom_url.com',
+                      'service_args': {}
+                  }
+              }]
+
+    assert RealtimeProxyManager(config).prefetcher_status() is None
+
+    with mock.patch.dict(app.config, {'REALTIME_PREFETCH_ENABLED': True, 'REALTIME_PREFETCH_PERIOD': 10}):
+        manager = RealtimeProxyManager(config)
+    assert manager.prefetcher_status()['period'] == 10
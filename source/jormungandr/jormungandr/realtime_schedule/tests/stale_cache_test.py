@@ -0,0 +1,202 @@
+# coding=utf-8
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+# the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Event, Thread
+import mock
+from werkzeug.contrib.cache import SimpleCache
+from jormungandr.realtime_schedule.stale_cache import StaleWhileRevalidateCache
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.
+
+    def time(self):
+        return self.now
+
+
+class Service(object):
+    """
+    count the calls and answer the number of the call
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        return '{}_{}'.format(key, self.calls)
+
+
+def wait_for_refresh(cache):
+    while cache.in_progress:
+        for call in list(cache.in_progress.values()):
+            call.done.wait(1)
+
+
+def fresh_value_test():
+    """
+    the value is cached during timeout seconds
+    """
+    clock = Clock()
+    service = Service()
+    cache = StaleWhileRevalidateCache('test', timeout=10, stale_timeout=60, backend=SimpleCache())
+
+    with mock.patch('jormungandr.realtime_schedule.stale_cache.time', clock):
+        assert cache.get('a', service.get, 'a') == 'a_1'
+        clock.now += 9
+        assert cache.get('a', service.get, 'a') == 'a_1'
+        assert cache.get('b', service.get, 'b') == 'b_2'
+
+    assert service.calls == 2
+    status = cache.status()
+    assert status['hits'] == 1
+    assert status['misses'] == 2
+    assert status['stale_hits'] == 0
+    assert status['last_stale_age'] is None
+
+
+def stale_value_test():
+    """
+    an expired value is served while it is refreshed in background,
+    once the stale_timeout is passed the call waits for the service
+    """
+    clock = Clock()
+    service = Service()
+    cache = StaleWhileRevalidateCache('test', timeout=10, stale_timeout=60, backend=SimpleCache())
+
+    with mock.patch('jormungandr.realtime_schedule.stale_cache.time', clock):
+        assert cache.get('a', service.get, 'a') == 'a_1'
+        clock.now += 15
+        assert cache.get('a', service.get, 'a') == 'a_1'
+        wait_for_refresh(cache)
+        assert service.calls == 2
+        assert cache.get('a', service.get, 'a') == 'a_2'
+
+        clock.now += 100
+        assert cache.get('a', service.get, 'a') == 'a_3'
+
+    status = cache.status()
+    assert status['stale_hits'] == 1
+    assert status['refreshes'] == 1
+    assert status['last_stale_age'] == 15
+    assert status['max_stale_age'] == 15
+
+
+def stale_value_one_refresh_test():
+    """
+    the stale value is served to all the calls, but there is only one refresh at a time
+    """
+    clock = Clock()
+    service = Service()
+    cache = StaleWhileRevalidateCache('test', timeout=10, stale_timeout=60, backend=SimpleCache())
+    refresh_allowed = Event()
+
+    def slow_get(key):
+        refresh_allowed.wait(1)
+        return service.get(key)
+
+    with mock.patch('jormungandr.realtime_schedule.stale_cache.time', clock):
+        refresh_allowed.set()
+        cache.get('a', slow_get, 'a')
+        refresh_allowed.clear()
+        clock.now += 20
+        values = [cache.get('a', slow_get, 'a') for _ in range(5)]
+        refresh_allowed.set()
+        wait_for_refresh(cache)
+
+    assert values == ['a_1'] * 5
+    assert service.calls == 2
+    assert cache.status()['refreshes'] == 1
+
+
+def coalesced_misses_test():
+    """
+    the concurrent calls missing the same key wait for a single call to the service
+    """
+    service = Service()
+    cache = StaleWhileRevalidateCache('test', timeout=10, stale_timeout=60, backend=SimpleCache())
+    answer = Event()
+
+    def slow_get(key):
+        answer.wait(1)
+        return service.get(key)
+
+    values = []
+    threads = [Thread(target=lambda: values.append(cache.get('a', slow_get, 'a'))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    # we wait for all the calls to be waiting for the first one
+    while cache.status()['coalesced'] + cache.status()['misses'] < 5:
+        pass
+    answer.set()
+    for t in threads:
+        t.join()
+
+    assert values == ['a_1'] * 5
+    assert service.calls == 1
+    assert cache.status()['misses'] == 1
+    assert cache.status()['coalesced'] == 4
+
+
+def error_not_cached_test():
+    """
+    None is not cached, the next call calls the service again
+    """
+    cache = StaleWhileRevalidateCache('test', timeout=10, stale_timeout=60, backend=SimpleCache())
+    calls = []
+
+    def get(key):
+        calls.append(key)
+        return None
+
+    assert cache.get('a', get, 'a') is None
+    assert cache.get('a', get, 'a') is None
+    assert calls == ['a', 'a']
+    assert cache.status()['failed_calls'] == 2
+
+
+def refreshing_test():
+    """
+    in a refreshing block the service is called even for a fresh value, which is then updated in the cache
+    """
+    service = Service()
+    cache = StaleWhileRevalidateCache('test', timeout=10, stale_timeout=60, backend=SimpleCache())
+    assert cache.get('a', service.get, 'a') == 'a_1'
+
+    before_calls = []
+    with cache.refreshing(before_call=lambda: before_calls.append(1)) as refreshed:
+        assert cache.get('a', service.get, 'a') == 'a_2'
+    assert refreshed['calls'] == 1
+    assert len(before_calls) == 1
+
+    assert cache.get('a', service.get, 'a') == 'a_2'
+    assert service.calls == 2
+    assert cache.status()['prefetches'] == 1
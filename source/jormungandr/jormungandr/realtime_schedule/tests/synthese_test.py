@@ -121,7 +121,7 @@ def next_passage_for_route_point_test():
 
     route_point = MockRoutePoint(route_id='route_tata', line_id='line_toto', stop_id='stop_tutu')
 
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         passages = synthese.next_passage_for_route_point(route_point)
 
         assert len(passages) == 3
@@ -146,11 +146,39 @@ def next_passage_for_route_point_failure_test():
 
     route_point = MockRoutePoint(route_id='route_tata', line_id='line_toto', stop_id='stop_tutu')
 
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         passages = synthese.next_passage_for_route_point(route_point)
 
         assert passages is None
 
+def next_passages_for_route_points_test():
+    """
+    the route points of a same stop point are given by one synthese call
+    """
+    synthese = Synthese(id='tata', timezone='UTC', service_url='http://bob.com/')
+
+    calls = []
+
+    def get(url, *args, **kwargs):
+        calls.append(url)
+        return MockResponse(mock_good_response(), 200, url)
+
+    rp_tata = MockRoutePoint(route_id='route_tata', line_id='line_toto', stop_id='stop_tutu')
+    rp_toto = MockRoutePoint(route_id='route_toto', line_id='line_toto', stop_id='stop_tutu')
+    rp_titi = MockRoutePoint(route_id='route_titi', line_id='line_toto', stop_id='stop_tutu')
+    rp_no_code = MockRoutePoint(route_id='route_tata', line_id='line_toto', stop_id=None)
+
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', get):
+        passages = synthese.next_passages_for_route_points([rp_tata, rp_toto, rp_titi, rp_no_code])
+
+    assert calls == ['http://bob.com/?SERVICE=tdg&roid=stop_tutu']
+    assert len(passages[rp_tata]) == 3
+    assert [p.datetime for p in passages[rp_toto]] == [datetime.datetime(2016, 3, 29, 13, 48, tzinfo=pytz.UTC)]
+    # nothing from synthese for these route points, the base schedule is kept
+    assert passages[rp_titi] is None
+    assert passages[rp_no_code] is None
+
+
 def status_test():
     synthese = Synthese(id='tata', timezone='UTC', service_url='http://bob.com/')
     status = synthese.status()
@@ -237,7 +237,7 @@ def next_passage_for_route_point_test():
 
     route_point = MockRoutePoint(route_id='route_tata', line_id='line_toto', stop_id='stop_tutu')
     # we mock the http call to return the hard coded mock_response
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         with mock.patch('jormungandr.realtime_schedule.timeo._get_current_date', lambda: _dt("02:02")):
             passages = timeo.next_passage_for_route_point(route_point)
 
@@ -264,13 +264,103 @@ def next_passage_for_route_point_timeo_failure_test():
     })
 
     route_point = MockRoutePoint(route_id='route_tata', line_id='line_toto', stop_id='stop_tutu')
-    with mock.patch('requests.get', mock_requests.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', mock_requests.get):
         with mock.patch('jormungandr.realtime_schedule.timeo._get_current_date', lambda: _dt("02:02")):
             passages = timeo.next_passage_for_route_point(route_point)
 
             assert passages is None
 
 
+def make_url_several_route_points_test():
+    """
+    the StopDescription of the route points are concatenated
+    """
+    timeo = Timeo(id='tata', timezone='Europe/Paris', service_url='http://bob.com/tata',
+                  service_args={'a': 'bobette'})
+
+    url = timeo._make_url_from_codes([('stop_tutu', 'line_toto', 'route_tata'),
+                                      ('stop_titi', 'line_toto', 'route_tata')])
+
+    assert url == 'http://bob.com/tata?a=bobette&StopDescription=' \
+                  '?StopTimeoCode=stop_tutu&LineTimeoCode=line_toto&Way=route_tata' \
+                  '&NextStopTimeNumber=5&StopTimeType=TR;' \
+                  '?StopTimeoCode=stop_titi&LineTimeoCode=line_toto&Way=route_tata' \
+                  '&NextStopTimeNumber=5&StopTimeType=TR;'
+
+
+def next_passages_for_route_points_test():
+    """
+    the route points are queried with one timeo call by max_stop_descriptions_by_call route points
+
+    the answers are matched with the route points by position, the route points of a call whose response cannot
+    be split or without the timeo codes are given None
+    """
+    timeo = Timeo(id='tata', timezone='UTC', service_url='http://bob.com/tata',
+                  service_args={'a': 'bobette'}, max_stop_descriptions_by_call=2, batch_api=True)
+
+    def st_response(stop, line, way, next_stops):
+        return {
+            "StopTimeoCode": stop,
+            "NextStopTimesMessage": {
+                "LineTimeoCode": line,
+                "Way": way,
+                "NextExpectedStopTime": [{"NextStop": n, "Destination": "A direction"} for n in next_stops]
+            }
+        }
+
+    calls = []
+
+    def get(url, *args, **kwargs):
+        calls.append(url)
+        if len(calls) == 1:
+            # timeo does not always give back the codes of the request
+            data = {"StopTimesResponse": [st_response('3331', 'l1', 'A', ['15:40:04', '15:55:04']),
+                                          st_response('s2', 'l1', 'A', ['16:10:04'])]}
+        else:
+            # s4 is not in the response, we cannot know which route point s3's answer is for
+            data = {"StopTimesResponse": [st_response('s3', 'l1', 'R', [])]}
+        return MockResponse(data, 200, url)
+
+    rps = [MockRoutePoint(route_id=way, line_id='l1', stop_id=stop)
+           for stop, way in [('s1', 'A'), ('s2', 'A'), ('s3', 'R'), ('s4', 'R')]]
+    rp_no_code = MockRoutePoint(route_id='A', line_id=None, stop_id='s1')
+
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', get):
+        with mock.patch('jormungandr.realtime_schedule.timeo._get_current_date', lambda: _dt("02:02")):
+            passages = timeo.next_passages_for_route_points(rps + [rp_no_code])
+
+    assert len(calls) == 2
+    assert 'StopTimeoCode=s1' in calls[0] and 'StopTimeoCode=s2' in calls[0]
+    assert 'StopTimeoCode=s3' in calls[1] and 'StopTimeoCode=s4' in calls[1]
+
+    assert [p.datetime for p in passages[rps[0]]] == [_dt('15:40:04'), _dt('15:55:04')]
+    assert [p.datetime for p in passages[rps[1]]] == [_dt('16:10:04')]
+    assert passages[rps[2]] is None
+    assert passages[rps[3]] is None
+    assert passages[rp_no_code] is None
+
+
+def batch_api_test():
+    """
+    the batch calls must be activated in the configuration of the proxy
+    """
+    timeo = Timeo(id='tata', timezone='UTC', service_url='http://bob.com/tata', service_args={})
+    assert not timeo.batch_api
+
+    timeo = Timeo(id='tata', timezone='UTC', service_url='http://bob.com/tata', service_args={}, batch_api=True)
+    assert timeo.batch_api
+
+
+def get_passages_by_position_test():
+    timeo = Timeo(id='tata', timezone='UTC', service_url='http://bob.com/tata', service_args={})
+    with mock.patch('jormungandr.realtime_schedule.timeo._get_current_date', lambda: _dt("02:02")):
+        passages = timeo._get_passages_by_position(mock_good_timeo_response(), 1)
+        assert [p.datetime for p in passages[0]] == [_dt('15:40:04'), _dt('15:55:04'), _dt('16:10:04')]
+
+        assert timeo._get_passages_by_position(mock_good_timeo_response(), 2) is None
+        assert timeo._get_passages_by_position({}, 1) is None
+
+
 def timeo_circuit_breaker_test():
     """
     Test the circuit breaker around Timeo
@@ -299,7 +389,7 @@ def timeo_circuit_breaker_test():
             raise Exception('test error')
 
     m = Mocker()
-    with mock.patch('requests.get', m.get):
+    with mock.patch('jormungandr.realtime_schedule.http_session.get', m.get):
         responses = [timeo._call_timeo('http://bob.com') for _ in range(0, 6)]
 
         assert responses == [None,
@@ -316,3 +406,5 @@ def status_test():
     timeo = Timeo(id='tata', timezone='UTC', service_url='http://bob.com/', service_args={'a': 'bobette', 'b': '12'})
     status = timeo.status()
     assert status['id'] == 'tata'
+    assert 'pool_hits' in status['http']
+    assert 'stale_hits' in status['cache']
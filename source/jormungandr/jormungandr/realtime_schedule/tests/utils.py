@@ -29,6 +29,13 @@
 # https://groups.google.com/d/forum/navitia
 # www.navitia.io
 from __future__ import absolute_import, print_function, unicode_literals, division
+from contextlib import contextmanager
+import BaseHTTPServer
+import SocketServer
+import json
+import socket
+import threading
+import urlparse
 
 class MockRoutePoint(object):
     def __init__(self, *args, **kwars):
@@ -44,3 +51,72 @@ class MockRoutePoint(object):
 
     def fetch_route_id(self, rt_proxy_id):
         return self._hardcoded_route_id
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # HTTP/1.1 to keep the connections alive
+    protocol_version = 'HTTP/1.1'
+    # the response is sent at once, not line by line (to not wait for the delayed acks on a kept alive connection)
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.headers.append(dict(self.headers))
+        response = self.server.responses.get(urlparse.urlparse(self.path).path)
+        if response is None:
+            self._send(404, b'not found')
+        else:
+            self._send(200, json.dumps(response).encode('utf-8'), 'application/json')
+
+    def _send(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if self.server.set_cookie:
+            self.send_header('Set-Cookie', self.server.set_cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    # a kept alive connection holds its thread
+    daemon_threads = True
+
+    def process_request(self, request, client_address):
+        self.connections.append(request)
+        SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+
+    def close_connections(self):
+        for connection in self.connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+@contextmanager
+def http_stub(responses, set_cookie=None):
+    """
+    local http server answering the given json by path, with the set_cookie cookie if any
+
+    the paths requested and their headers are stored in server.requests and server.headers
+    """
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.responses = responses
+    server.set_cookie = set_cookie
+    server.requests = []
+    server.headers = []
+    server.connections = []
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.close_connections()
+        server.server_close()
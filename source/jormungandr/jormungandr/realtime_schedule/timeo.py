@@ -31,9 +31,12 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 from flask import logging
 import pybreaker
+from jormungandr.circuit_breaker import CircuitBreaker
 import pytz
 import requests as requests
-from jormungandr import cache, app
+from jormungandr import app
+from jormungandr.realtime_schedule import http_session
+from jormungandr.realtime_schedule.stale_cache import StaleWhileRevalidateCache
 from jormungandr.realtime_schedule.realtime_proxy import RealtimeProxy
 from jormungandr.schedule import RealTimePassage
 from datetime import datetime, time
@@ -57,14 +60,23 @@ class Timeo(RealtimeProxy):
     class managing calls to timeo external service providing real-time next passages
     """
 
-    def __init__(self, id, service_url, service_args, timezone, object_id_tag=None, timeout=10):
+    def __init__(self, id, service_url, service_args, timezone, object_id_tag=None, timeout=10,
+                 max_stop_descriptions_by_call=20, batch_api=False):
         self.service_url = service_url
         self.service_args = service_args
         self.timeout = timeout  # timeout in seconds
         self.rt_system_id = id
         self.object_id_tag = object_id_tag if object_id_tag else id
-        self.breaker = pybreaker.CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_TIMEO_FAIL'],
-                                                reset_timeout=app.config['CIRCUIT_BREAKER_TIMEO_TIMEOUT_S'])
+        # several StopDescription can be given in one call, if the timeo service supports it
+        self.batch_api = batch_api
+        # the url length is limited, the route points of a batch are split in several calls if needed
+        self.max_stop_descriptions_by_call = max_stop_descriptions_by_call
+        self.breaker = CircuitBreaker(fail_max=app.config['CIRCUIT_BREAKER_MAX_TIMEO_FAIL'],
+                                      reset_timeout=app.config['CIRCUIT_BREAKER_TIMEO_TIMEOUT_S'])
+        # the cache is shared between servers in production with the rt_system_id in the key
+        self.cache = StaleWhileRevalidateCache('Timeo:{}'.format(id),
+                                               timeout=app.config['CACHE_CONFIGURATION'].get('TIMEOUT_TIMEO', 60),
+                                               stale_timeout=app.config.get('REALTIME_PROXIES_STALE_TIMEOUT', 120))
 
         # Note: if the timezone is not know, pytz raise an error
         self.timezone = pytz.timezone(timezone)
@@ -75,17 +87,20 @@ class Timeo(RealtimeProxy):
         """
         return self.rt_system_id
 
-    @cache.memoize(app.config['CACHE_CONFIGURATION'].get('TIMEOUT_TIMEO', 60))
     def _call_timeo(self, url):
+        """
+        cached call, an expired response is served while it is refreshed
+        """
+        return self.cache.get(url, self._call_timeo_without_cache, url)
+
+    def _call_timeo_without_cache(self, url):
         """
         http call to timeo
 
         The call is handled by a circuit breaker not to continue calling timeo if the service is dead.
-
-        The call is also cached
         """
         try:
-            return self.breaker.call(requests.get, url, timeout=self.timeout)
+            return self.breaker.call(http_session.get, url, timeout=self.timeout)
         except pybreaker.CircuitBreakerError as e:
             logging.getLogger(__name__).error('Timeo RT service dead, using base '
                                               'schedule (error: {}'.format(e))
@@ -96,11 +111,10 @@ class Timeo(RealtimeProxy):
             logging.getLogger(__name__).exception('Timeo RT error, using base schedule')
         return None
 
-    def next_passage_for_route_point(self, route_point):
-        url = self._make_url(route_point)
-        if not url:
-            return None
-
+    def _get_response(self, url):
+        """
+        call timeo and return its json response, None if there is a problem
+        """
         r = self._call_timeo(url)
         if not r:
             return None
@@ -111,7 +125,46 @@ class Timeo(RealtimeProxy):
                                               .format(r.url))
             return None
 
-        return self._get_passages(r.json())
+        return r.json()
+
+    def next_passage_for_route_point(self, route_point):
+        url = self._make_url(route_point)
+        if not url:
+            return None
+
+        timeo_resp = self._get_response(url)
+        if timeo_resp is None:
+            return None
+
+        return self._get_passages(timeo_resp)
+
+    def next_passages_for_route_points(self, route_points):
+        """
+        the route points are packed by max_stop_descriptions_by_call StopDescription in a call
+
+        the route points without realtime or whose call has failed are given None passages
+        """
+        result = {}
+        stop_descriptions = []
+        for route_point in route_points:
+            result[route_point] = None
+            codes = self._get_codes(route_point)
+            if codes:
+                stop_descriptions.append((codes, route_point))
+
+        max_by_call = self.max_stop_descriptions_by_call
+        for i in range(0, len(stop_descriptions), max_by_call):
+            chunk = stop_descriptions[i:i + max_by_call]
+            timeo_resp = self._get_response(self._make_url_from_codes([codes for codes, _ in chunk]))
+            if timeo_resp is None:
+                continue
+            passages = self._get_passages_by_position(timeo_resp, len(chunk))
+            if passages is None:
+                continue
+            for (_, route_point), route_point_passages in zip(chunk, passages):
+                result[route_point] = route_point_passages
+
+        return result
 
     def _get_passages(self, timeo_resp):
         logging.getLogger(__name__).debug('timeo response: {}'.format(timeo_resp))
@@ -122,8 +175,28 @@ class Timeo(RealtimeProxy):
             logging.getLogger(__name__).warning('invalid timeo response: {}'.format(timeo_resp))
             return None
 
-        next_st = st_responses[0]['NextStopTimesMessage']
+        return self._get_next_passages(st_responses[0]['NextStopTimesMessage'])
+
+    def _get_passages_by_position(self, timeo_resp, nb_stop_descriptions):
+        """
+        split the response of a call with several StopDescription
+
+        timeo answers a StopTimesResponse by StopDescription, in the order of the request.
+        The codes in the StopTimesResponse are not always the ones of the request, so they are not used.
+        If the number of StopTimesResponse is not the one expected, the response cannot be split and None is returned
+        """
+        logging.getLogger(__name__).debug('timeo response: {}'.format(timeo_resp))
+
+        st_responses = timeo_resp.get('StopTimesResponse')
+        if not st_responses or len(st_responses) != nb_stop_descriptions:
+            logging.getLogger(__name__).warning('invalid timeo response for {} StopDescription: {}'
+                                                .format(nb_stop_descriptions, timeo_resp))
+            return None
 
+        return [self._get_next_passages(st_response.get('NextStopTimesMessage', {}))
+                for st_response in st_responses]
+
+    def _get_next_passages(self, next_st):
         next_passages = []
         for next_expected_st in next_st.get('NextExpectedStopTime', []):
             # for the moment we handle only the NextStop and the direction
@@ -134,6 +207,23 @@ class Timeo(RealtimeProxy):
 
         return next_passages
 
+    def _get_codes(self, route_point):
+        """
+        return the timeo codes (stop, line, way) of the route point, None if one of them is missing
+        """
+        stop = route_point.fetch_stop_id(self.object_id_tag)
+        line = route_point.fetch_line_id(self.object_id_tag)
+        route = route_point.fetch_route_id(self.object_id_tag)
+
+        if not all((stop, line, route)):
+            # one a the id is missing, we'll not find any realtime
+            logging.getLogger(__name__).debug('missing realtime id for {obj}: '
+                                              'stop code={s}, line code={l}, route code={r}'.
+                                              format(obj=route_point, s=stop, l=line, r=route))
+            return None
+
+        return stop, line, route
+
     def _make_url(self, route_point):
         """
         the route point identifier is set with the StopDescription argument
@@ -148,34 +238,34 @@ class Timeo(RealtimeProxy):
          Note: since there are some strange symbol ('?' and ';') in the url we can't use param as dict in
          requests
          """
+        codes = self._get_codes(route_point)
+        if not codes:
+            return None
 
-        base_params = '&'.join([k + '=' + v for k, v in self.service_args.items()])
-
-        stop = route_point.fetch_stop_id(self.object_id_tag)
-        line = route_point.fetch_line_id(self.object_id_tag)
-        route = route_point.fetch_route_id(self.object_id_tag)
+        return self._make_url_from_codes([codes])
 
-        if not all((stop, line, route)):
-            # one a the id is missing, we'll not find any realtime
-            logging.getLogger(__name__).debug('missing realtime id for {obj}: '
-                                              'stop code={s}, line code={l}, route code={r}'.
-                                              format(obj=route_point, s=stop, l=line, r=route))
-            return None
+    def _make_url_from_codes(self, codes_list):
+        """
+        several route points can be queried at once, their StopDescription are concatenated
+        (each one is ended by ';')
+        """
+        base_params = '&'.join([k + '=' + v for k, v in self.service_args.items()])
 
-        stop_id_url = ("StopDescription=?"
-                       "StopTimeoCode={stop}"
-                       "&LineTimeoCode={line}"
-                       "&Way={route}"
-                       "&NextStopTimeNumber={count}"
-                       "&StopTimeType={data_freshness};").format(stop=stop,
-                                                                 line=line,
-                                                                 route=route,
-                                                                 count='5',  # TODO better pagination
-                                                                 data_freshness='TR')
-
-        url = "{base_url}?{base_params}&{stop_id}".format(base_url=self.service_url,
-                                                          base_params=base_params,
-                                                          stop_id=stop_id_url)
+        stop_descriptions = ''.join(("?StopTimeoCode={stop}"
+                                     "&LineTimeoCode={line}"
+                                     "&Way={route}"
+                                     "&NextStopTimeNumber={count}"
+                                     "&StopTimeType={data_freshness};").format(stop=stop,
+                                                                               line=line,
+                                                                               route=route,
+                                                                               count='5',  # TODO better pagination
+                                                                               data_freshness='TR')
+                                    for stop, line, route in codes_list)
+
+        url = "{base_url}?{base_params}&StopDescription={stop_descriptions}".format(
+            base_url=self.service_url,
+            base_params=base_params,
+            stop_descriptions=stop_descriptions)
 
         return url
 
@@ -195,4 +285,6 @@ class Timeo(RealtimeProxy):
                 'circuit_breaker': {'current_state': self.breaker.current_state,
                                     'fail_counter': self.breaker.fail_counter,
                                     'reset_timeout': self.breaker.reset_timeout},
+                'http': http_session.host_stats(self.service_url),
+                'cache': self.cache.status(),
                 }
@@ -41,24 +41,32 @@ class ResourceUtc:
 
     def tz(self):
         if not self._tz:
-            instance = i_manager.instances.get(self.region, None)
+            tz = self.region_tz(self.region)
+            if tz is None:
+                return None
+            self._tz = (tz,)
+        return self._tz[0]
 
-            if not instance:
-                raise RegionNotFound(self.region)
+    def region_tz(self, region):
+        instance = i_manager.instances.get(region, None)
 
-            tz_name = instance.timezone  # TODO store directly the tz?
+        if not instance:
+            raise RegionNotFound(region)
 
-            if not tz_name:
-                logging.Logger(__name__).warn("unknown timezone for region {}"
-                                              .format(self.region))
-                return None
-            self._tz = (pytz.timezone(tz_name),)
-        return self._tz[0]
+        tz_name = instance.timezone  # TODO store directly the tz?
+
+        if not tz_name:
+            logging.Logger(__name__).warn("unknown timezone for region {}"
+                                          .format(region))
+            return None
+        return pytz.timezone(tz_name)
 
-    def convert_to_utc(self, original_datetime):
+    def convert_to_utc(self, original_datetime, region=None):
         """
         convert the original_datetime in the args to UTC
 
+        the timezone of the given region is used instead of the one of the resource if region is given
+
         for that we need to 'guess' the timezone wanted by the user
 
         For the moment We only use the default instance timezone.
@@ -72,10 +80,11 @@ class ResourceUtc:
         we'll have to store the tz for stop area and the coord for admin, poi, ...
         """
 
-        if self.tz() is None:
+        tz = self.tz() if region is None else self.region_tz(region)
+        if tz is None:
             return original_datetime
         try:
-            utctime = self.tz().normalize(self.tz().localize(original_datetime)).astimezone(pytz.utc)
+            utctime = tz.normalize(tz.localize(original_datetime)).astimezone(pytz.utc)
         except ValueError as e:
             raise UnableToParse("Unable to parse datetime, " + e.message)
 
@@ -47,6 +47,8 @@ from jormungandr.scenarios.helpers import walking_duration, bss_duration, bike_d
 from jormungandr.scenarios.helpers import select_best_journey_by_time, select_best_journey_by_duration, max_duration_fallback_modes
 from jormungandr.scenarios.helpers import fallback_mode_comparator
 from jormungandr.utils import pb_del_if, date_to_timestamp
+from jormungandr import deadline
+from jormungandr.exceptions import DeadlineExceeded
 
 non_pt_types = ['non_pt_walk', 'non_pt_bike', 'non_pt_bss']
 
@@ -232,7 +234,17 @@ class Scenario(simple.Scenario):
 
         while ((request["min_nb_journeys"] and request["min_nb_journeys"] > nb_typed_journeys) or\
             (not request["min_nb_journeys"] and nb_typed_journeys == 0)) and cpt_attempt < max_attempts:
-            tmp_resp = self.call_kraken(next_request, instance)
+            if cpt_attempt > 0 and deadline.is_exhausted():
+                # no time left for more journeys, we return those already found
+                deadline.flag_partial_response()
+                break
+            try:
+                tmp_resp = self.call_kraken(next_request, instance)
+            except DeadlineExceeded:
+                if cpt_attempt == 0:
+                    raise
+                deadline.flag_partial_response()
+                break
             if len(tmp_resp.journeys) == 0:
                 # if we do not yet have journeys, we get the tmp_resp to have the error if there are some
                 if len(resp.journeys) == 0:
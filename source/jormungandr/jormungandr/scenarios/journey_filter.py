@@ -28,7 +28,6 @@
 # www.navitia.io
 from __future__ import absolute_import, print_function, unicode_literals, division
 import logging
-import itertools
 import datetime
 from jormungandr.scenarios.utils import compare, get_pseudo_duration, get_or_default
 from navitiacommon import response_pb2
@@ -41,7 +40,7 @@ def delete_journeys(responses, request):
 
     nb_deleted = 0
     for r in responses:
-        nb_deleted += pb_del_if(r.journeys, lambda j: _to_be_deleted(j))
+        nb_deleted += pb_del_if(r.journeys, lambda j: _to_be_deleted(j), bulk=True)
 
     if nb_deleted:
         logging.getLogger(__name__).info('filtering {} journeys'.format(nb_deleted))
@@ -140,21 +139,33 @@ def _filter_similar_journeys(journeys, request, similar_journey_generator):
     The given generator tells which part of journeys are compared
 
     in case of similar journeys we let _get_worst_similar_vjs decide which one to delete
+
+    Similar journeys have the same output from the generator, so rather than comparing each pair of
+    journeys, the journeys are grouped by this output.
+    In a group, the journeys are compared in order to the best one found so far, which is what
+    comparing all pairs in order used to end up doing.
     """
 
     logger = logging.getLogger(__name__)
-    for j1, j2 in itertools.combinations(journeys, 2):
-        if _to_be_deleted(j1) or _to_be_deleted(j2):
+    best_by_signature = {}
+    for j in journeys:
+        if _to_be_deleted(j):
+            continue
+        signature = tuple(similar_journey_generator(j))
+        best = best_by_signature.get(signature)
+        if best is None:
+            best_by_signature[signature] = j
             continue
-        if compare(j1, j2, similar_journey_generator):
-            #chose the best
-            worst = _get_worst_similar(j1, j2, request)
-            logger.debug("the journeys {}, {} are similar, we delete {}".format(j1.internal_id,
-                                                                                j2.internal_id,
-                                                                                worst.internal_id))
-
-            mark_as_dead(worst, 'duplicate_journey', 'similar_to_{other}'
-                          .format(other=j1.internal_id if worst == j2 else j2.internal_id))
+        #chose the best
+        worst = _get_worst_similar(best, j, request)
+        logger.debug("the journeys {}, {} are similar, we delete {}".format(best.internal_id,
+                                                                            j.internal_id,
+                                                                            worst.internal_id))
+
+        mark_as_dead(worst, 'duplicate_journey', 'similar_to_{other}'
+                      .format(other=best.internal_id if worst == j else j.internal_id))
+        if worst is best:
+            best_by_signature[signature] = j
 
 
 def _filter_too_short_heavy_journeys(journeys, request):
@@ -42,10 +42,14 @@ from jormungandr.scenarios.qualifier import min_from_criteria, arrival_crit, dep
 import numpy as np
 import collections
 from jormungandr.utils import date_to_timestamp
+from jormungandr import app, parallel, deadline
+from jormungandr.exceptions import DeadlineExceeded
 
 SECTION_TYPES_TO_RETAIN = {response_pb2.PUBLIC_TRANSPORT, response_pb2.STREET_NETWORK}
 JOURNEY_TYPES_TO_RETAIN = ['best', 'comfort', 'non_pt_walk', 'non_pt_bike', 'non_pt_bss']
 STREET_NETWORK_MODE_TO_RETAIN = {response_pb2.Car, response_pb2.Bike, response_pb2.Bss}
+# extra time (in s) given to the parallel kraken calls to answer after their own timeout
+KRAKEN_CALLS_MARGIN = 0.5
 
 
 def get_kraken_calls(request):
@@ -151,6 +155,29 @@ def create_pb_request(requested_type, request, dep_mode, arr_mode):
     return req
 
 
+def create_pb_requests(requested_type, request, krakens_call):
+    """the protobuf requests of all the fallback modes of the kraken calls"""
+    return [create_pb_request(requested_type, request, dep_mode, arr_mode) for dep_mode, arr_mode in krakens_call]
+
+
+def send_and_receive_all(instance, pb_requests, timeout, calls_deadline=None):
+    """
+    the kraken calls one after the other
+
+    with calls_deadline, the calls must be answered before it: a call that has waited for a thread of the executor
+    only has the remaining time, and fails with DeadlineExceeded if there is none
+    """
+    if calls_deadline is None:
+        return [instance.send_and_receive(r, timeout=timeout) for r in pb_requests]
+    responses = []
+    with deadline.capped_request_deadline(calls_deadline):
+        for r in pb_requests:
+            if calls_deadline.is_expired():
+                raise DeadlineExceeded(instance.name)
+            responses.append(instance.send_and_receive(r, timeout=calls_deadline.cap(timeout)))
+    return responses
+
+
 def _has_pt(j):
     return any(s.type == response_pb2.PUBLIC_TRANSPORT for s in j.sections)
 
@@ -210,9 +237,135 @@ def _build_selected_sections_matrix(sections_set, candidates_pool):
     return np.array(selected_sections_matrix)
 
 
+def _build_sections_masks(sections_set, candidates_pool):
+    """
+    Same as _build_selected_sections_matrix, but every line is packed in an int:
+    the bit i of a journey's mask is set if the journey has the i-th section
+    """
+    sections_2_bit = dict((value, 1 << index) for index, value in enumerate(sections_set))
+    masks = []
+    for j in candidates_pool:
+        mask = 0
+        for s in j.sections:
+            mask |= sections_2_bit.get(_get_section_id(s), 0)
+        masks.append(mask)
+    return masks
+
+
+def _popcount(mask):
+    return bin(mask).count('1')
+
+
+def _get_best_combination(sections_masks, durations, nb_journeys_to_find, idx_of_jrny_must_keep):
+    """
+    Find the combination of nb_journeys_to_find journeys, containing the must-keep ones, that
+    _get_sorted_solutions_indexes then the sort by pseudo duration would choose, without enumerating
+    all the combinations.
+
+    A combination is scored by (integrity, nb_sections, sum of the pseudo durations), the ties being
+    broken like gen_all_combin enumerates the combinations: in colexicographic order, ie the smallest
+    sum(2 ** idx) first.
+
+    The must-keep journeys are fixed, a greedy choice of the other ones gives a first solution
+    then a depth-first branch and bound looks for the exact best one.
+
+    :return: the sorted list of the indexes of the chosen journeys
+
+    >>> _get_best_combination([0b0011, 0b0110, 0b1100, 0b0001], [10, 10, 10, 1], 2, [])
+    [0, 2]
+    >>> _get_best_combination([0b0011, 0b0110, 0b1100, 0b0001], [10, 10, 10, 1], 2, [1])
+    [1, 3]
+    >>> _get_best_combination([0b01, 0b01, 0b01, 0b10], [5, 3, 3, 1], 2, [])
+    [1, 3]
+    """
+    all_sections = 0
+    for mask in sections_masks:
+        all_sections |= mask
+    counts = [_popcount(mask) for mask in sections_masks]
+
+    must_keep = set(idx_of_jrny_must_keep)
+    cover, nb_sections, duration, idx_mask = 0, 0, 0, 0
+    for i in must_keep:
+        cover |= sections_masks[i]
+        nb_sections += counts[i]
+        duration += durations[i]
+        idx_mask |= 1 << i
+    nb_to_add = nb_journeys_to_find - len(must_keep)
+
+    # the journeys covering the most sections are tried first, they usually lead to the best solutions
+    others = sorted((i for i in range(len(sections_masks)) if i not in must_keep),
+                    key=lambda i: (-counts[i], durations[i], i))
+    nb_others = len(others)
+
+    def _smallest_sums(values):
+        """
+        res[p][k] is the sum of the k smallest values of others[p:]
+        """
+        res = []
+        for p in range(nb_others + 1):
+            sorted_values = sorted(values(i) for i in others[p:])
+            sums = [0]
+            for v in sorted_values[:nb_to_add]:
+                sums.append(sums[-1] + v)
+            res.append(sums)
+        return res
+
+    min_nb_sections = _smallest_sums(lambda i: counts[i])
+    min_durations = _smallest_sums(lambda i: durations[i])
+    min_idx_masks = _smallest_sums(lambda i: 1 << i)
+    suffix_cover = [0] * (nb_others + 1)
+    for p in range(nb_others - 1, -1, -1):
+        suffix_cover[p] = suffix_cover[p + 1] | sections_masks[others[p]]
+
+    def _score(cover, nb_sections, duration, idx_mask):
+        return _popcount(all_sections & ~cover), nb_sections, duration, idx_mask
+
+    # greedy: we add the journey that improves the most the score of the combination
+    greedy = (cover, nb_sections, duration, idx_mask)
+    remaining = list(others)
+    for _ in range(nb_to_add):
+        c, n, d, m = greedy
+        j = min(remaining, key=lambda i: _score(c | sections_masks[i], n + counts[i], d + durations[i], m | 1 << i))
+        remaining.remove(j)
+        greedy = (c | sections_masks[j], n + counts[j], d + durations[j], m | 1 << j)
+    best = [_score(*greedy)]
+
+    def _explore(pos, nb_left, cover, nb_sections, duration, idx_mask):
+        if nb_left == 0:
+            score = _score(cover, nb_sections, duration, idx_mask)
+            if score < best[0]:
+                best[0] = score
+            return
+        if nb_others - pos < nb_left:
+            return
+        uncovered = all_sections & ~cover
+        # the nb_left journeys to add cannot cover more than what the remaining ones cover altogether,
+        # nor more than the nb_left best ones
+        gains = sorted(_popcount(sections_masks[i] & uncovered) for i in others[pos:])
+        max_gain = min(_popcount(suffix_cover[pos] & uncovered), sum(gains[-nb_left:]))
+        lower_bound = (_popcount(uncovered) - max_gain,
+                       nb_sections + min_nb_sections[pos][nb_left],
+                       duration + min_durations[pos][nb_left],
+                       idx_mask | min_idx_masks[pos][nb_left])
+        if lower_bound >= best[0]:
+            return
+        j = others[pos]
+        _explore(pos + 1, nb_left - 1, cover | sections_masks[j], nb_sections + counts[j],
+                 duration + durations[j], idx_mask | 1 << j)
+        _explore(pos + 1, nb_left, cover, nb_sections, duration, idx_mask)
+
+    _explore(0, nb_to_add, cover, nb_sections, duration, idx_mask)
+
+    best_idx_mask = best[0][3]
+    return [i for i in range(len(sections_masks)) if best_idx_mask >> i & 1]
+
+
 def _get_sorted_solutions_indexes(selected_sections_matrix, nb_journeys_to_find, idx_of_jrny_must_keep):
     """
     The entry is a 2D array where its lines are journeys, its columns are (non) chosen sections
+
+    This enumerates all the combinations, culling_journeys uses _get_best_combination which gives the same
+    result without doing so, this one is kept as its reference
     """
     logger = logging.getLogger(__name__)
     """
@@ -283,6 +436,11 @@ def _get_sorted_solutions_indexes(selected_sections_matrix, nb_journeys_to_find,
     return best_indexes, selection_matrix
 
 
+def _inverse_selection(d, indexes):
+    select = np.in1d(range(d.shape[0]), indexes)
+    return d[~select]
+
+
 def culling_journeys(resp, request):
     """
     Remove some journeys if there are too many of them to have max_nb_journeys journeys.
@@ -337,10 +495,6 @@ def culling_journeys(resp, request):
     if (request["max_nb_journeys"] - nb_journeys_must_have) <= 0:
         # At this point, max_nb_journeys is smaller than nb_journeys_must_have, we have to make choices
 
-        def _inverse_selection(d, indexes):
-            select = np.in1d(range(d.shape[0]), indexes)
-            return d[~select]
-
         # Here we mark all journeys as dead that are not must-have
         for jrny in _inverse_selection(candidates_pool, idx_of_jrnys_must_keep):
              journey_filter.mark_as_dead(jrny, 'Filtered by max_nb_journeys')
@@ -381,38 +535,26 @@ def culling_journeys(resp, request):
     The candidate pool will be like [Journey_2, Journey_3]
     The sections set will be like set([Line 14, Line 6, Line 8, Bus 165])
 
-    selected_sections_matrix:
-    [[1,1,0,1] -> journey_2
-     [1,0,1,1] -> journey_3
+    sections_masks (the lines of the selected sections matrix packed in bitsets):
+    [0b1011 -> journey_2
+     0b1101 -> journey_3
     ]
     """
-    selected_sections_matrix = _build_selected_sections_matrix(sections_set, candidates_pool)
-
-    best_indexes, selection_matrix = _get_sorted_solutions_indexes(selected_sections_matrix,
-                                                                   nb_journeys_to_find,
-                                                                   idx_of_jrnys_must_keep)
+    sections_masks = _build_sections_masks(sections_set, candidates_pool)
 
-    logger.debug("Nb best solutions: {0}".format(best_indexes.shape[0]))
+    requested_dt = request['datetime']
+    is_clockwise = request.get('clockwise', True)
+    durations = [get_pseudo_duration(jrny, requested_dt, is_clockwise) for jrny in candidates_pool]
 
-    the_best_index = best_indexes[0]
-
-    logger.debug("Trying to find the best of best")
     """
-    Let's find the best of best :)
+    We want the journeys covering as many sections as possible with as few sections as possible, then the
+    ones with the smallest sum of pseudo durations
     """
-    # If there're several solutions which have the same score of integrity and nb_sections
-    if best_indexes.shape[0] != 1:
-        requested_dt = request['datetime']
-        is_clockwise = request.get('clockwise', True)
-
-        def combinations_sorter(v):
-            # Hoping to find We sort the solution by the sum of journeys' pseudo duration
-            return np.sum((get_pseudo_duration(jrny, requested_dt, is_clockwise)
-                           for jrny in np.array(candidates_pool)[np.where(selection_matrix[v, :])]))
-        the_best_index = min(best_indexes, key=combinations_sorter)
+    best_combination = _get_best_combination(sections_masks, durations, nb_journeys_to_find,
+                                             idx_of_jrnys_must_keep)
 
     logger.debug('Removing non selected journeys')
-    for jrny in candidates_pool[np.where(selection_matrix[the_best_index, :] == 0)]:
+    for jrny in _inverse_selection(candidates_pool, best_combination):
         journey_filter.mark_as_dead(jrny, 'Filtered by max_nb_journeys')
 
     journey_filter.delete_journeys((resp,), request)
@@ -600,24 +742,45 @@ class Scenario(simple.Scenario):
         request = deepcopy(api_request)
         min_asked_journeys = get_or_default(request, 'min_nb_journeys', 1)
         min_journeys_calls = get_or_default(request, '_min_journeys_calls', 1)
+        max_speculative_calls = app.config.get('JOURNEYS_SPECULATIVE_PAGINATION', 1)
 
         responses = []
         nb_try = 0
         while request is not None and \
                 ((nb_journeys(responses) < min_asked_journeys and nb_try < min_asked_journeys)
                  or nb_try < min_journeys_calls):
-            nb_try = nb_try + 1
-
-            tmp_resp = self.call_kraken(request_type, request, instance, krakens_call)
-            responses.extend(tmp_resp)  # we keep the error for building the response
-            if nb_journeys(tmp_resp) == 0:
-                # no new journeys found, we stop
+            if responses and deadline.is_exhausted():
+                # no time left for more journeys, we return those already found
+                deadline.flag_partial_response()
+                break
+            # we don't know how many calls will be needed, but not more than the max number of tries
+            nb_calls = max(min(max_speculative_calls, max(min_asked_journeys, min_journeys_calls) - nb_try), 1)
+            kraken_requests = self.create_speculative_kraken_requests(request, nb_calls)
+
+            try:
+                calls_resp = self.call_kraken_concurrently(request_type, kraken_requests, instance, krakens_call)
+            except DeadlineExceeded:
+                if not responses:
+                    raise
+                deadline.flag_partial_response()
                 break
 
-            request = self.create_next_kraken_request(request, tmp_resp)
-
-            # we filter unwanted journeys by side effects
-            journey_filter.filter_journeys(responses, instance, api_request)
+            new_journeys = False
+            for call_request, tmp_resp in zip(kraken_requests, calls_resp):
+                nb_try = nb_try + 1
+                responses.extend(tmp_resp)  # we keep the error for building the response
+                if nb_journeys(tmp_resp) == 0:
+                    # no new journeys found, we stop
+                    request = None
+                    break
+                new_journeys = True
+                request = self.create_next_kraken_request(call_request, tmp_resp)
+                if request is None:
+                    break
+
+            if new_journeys:
+                # we filter unwanted journeys by side effects
+                journey_filter.filter_journeys(responses, instance, api_request)
 
         journey_filter.final_filter_journeys(responses, instance, api_request)
         pb_resp = merge_responses(responses)
@@ -631,23 +794,131 @@ class Scenario(simple.Scenario):
 
         return pb_resp
 
+    @staticmethod
+    def create_speculative_kraken_requests(request, nb_calls):
+        """
+        when several calls are needed to get enough journeys, we don't wait for a call to know the datetime of
+        the next one: the following calls are done at the same time, every JOURNEYS_SPECULATIVE_PAGINATION_STEP
+        seconds after (resp before for non clockwise search) the request's datetime
+
+        the journeys found by several calls are removed by the filters
+        """
+        step = app.config.get('JOURNEYS_SPECULATIVE_PAGINATION_STEP', 600)
+        if not request['clockwise']:
+            step = -step
+        kraken_requests = [request]
+        for i in range(1, nb_calls):
+            speculative_request = deepcopy(request)
+            speculative_request['datetime'] = request['datetime'] + i * step
+            kraken_requests.append(speculative_request)
+        return kraken_requests
+
+    def call_kraken_concurrently(self, request_type, kraken_requests, instance, krakens_call):
+        """
+        call kraken for all the requests at the same time
+
+        return the list of the responses of each request. Only the first request is mandatory, the responses of
+        the following ones are kept until the first one that fails
+        """
+        if len(kraken_requests) == 1:
+            return [self.call_kraken(request_type, kraken_requests[0], instance, krakens_call)]
+
+        timeout = deadline.cap_timeout(app.config.get('INSTANCE_TIMEOUT', 10000))
+        # all the calls share the same deadline, even those waiting for a thread of the executor
+        calls_deadline = deadline.Deadline(timeout)
+        futures_by_request = [self._spawn_kraken_calls(create_pb_requests(request_type, r, krakens_call),
+                                                       instance, timeout, calls_deadline)
+                              for r in kraken_requests]
+        parallel.wait_all([f for futures in futures_by_request for f in futures],
+                          timeout=timeout / 1000 + 2 * KRAKEN_CALLS_MARGIN)
+
+        calls_resp = []
+        for idx, futures in enumerate(futures_by_request):
+            try:
+                local_responses = self._get_kraken_responses(futures)
+            except parallel.ParallelTimeout:
+                if idx == 0:
+                    logging.getLogger(__name__).error('kraken calls on %s did not finish in time', instance.name)
+                    raise DeadlineExceeded(instance.name)
+                break
+            except Exception:
+                if idx == 0:
+                    raise
+                logging.getLogger(__name__).info('speculative kraken call on %s failed', instance.name)
+                break
+            calls_resp.append(self._handle_kraken_responses(krakens_call, local_responses))
+
+        # the calls after the first failed one are not needed
+        for futures in futures_by_request[len(calls_resp):]:
+            for f in futures:
+                f.cancel()
+        return calls_resp
+
     def call_kraken(self, request_type, request, instance, krakens_call):
         """
         For all krakens_call, call the kraken and aggregate the responses
 
         return the list of all responses
         """
+        local_responses = self._send_kraken_calls(request_type, request, instance, krakens_call)
+        return self._handle_kraken_responses(krakens_call, local_responses)
+
+    @staticmethod
+    def _spawn_kraken_calls(pb_requests, instance, timeout, calls_deadline):
+        """
+        the kraken calls are done by the executor of the request, so a request does not start more than
+        PARALLEL_MAX_WORKERS_BY_REQUEST threads whatever its number of kraken calls.
+        The calls waiting for a thread are not given more time: they all end before calls_deadline
+
+        if PARALLEL_KRAKEN_CALLS, each call is done on its own socket of the instance's pool, else all the calls are
+        done one after the other. Each future gives a list of responses
+        """
+        executor = parallel.request_executor()
+        if app.config.get('PARALLEL_KRAKEN_CALLS', True):
+            return [executor.submit(send_and_receive_all, instance, [r], timeout, calls_deadline)
+                    for r in pb_requests]
+        return [executor.submit(send_and_receive_all, instance, pb_requests, timeout, calls_deadline)]
+
+    @staticmethod
+    def _get_kraken_responses(futures):
+        """
+        the responses of finished kraken calls, the flags set in g by the calls (like partial_response) are kept
+
+        raise ParallelTimeout if one of the calls is not finished, or the exception raised by a call
+        """
+        responses = [resp for f in futures for resp in f.result(timeout=0)]
+        for f in futures:
+            f.merge_g()
+        return responses
+
+    def _send_kraken_calls(self, request_type, request, instance, krakens_call):
         # TODO: handle min_alternative_journeys
         # TODO: call first bss|bss and do not call walking|walking if no bss in first results
 
+        timeout = deadline.cap_timeout(app.config.get('INSTANCE_TIMEOUT', 10000))
+        pb_requests = create_pb_requests(request_type, request, krakens_call)
+
+        if app.config.get('PARALLEL_KRAKEN_CALLS', True) and len(pb_requests) > 1:
+            # all calls are sent at once and we wait for the slowest one, as they share the same deadline
+            # they will have failed on their own before the end of the wait, even those waiting for a thread
+            futures = self._spawn_kraken_calls(pb_requests, instance, timeout, deadline.Deadline(timeout))
+            parallel.wait_all(futures, timeout=timeout / 1000 + KRAKEN_CALLS_MARGIN)
+            try:
+                return self._get_kraken_responses(futures)
+            except parallel.ParallelTimeout:
+                logging.getLogger(__name__).error('kraken calls on %s did not finish in time', instance.name)
+                raise DeadlineExceeded(instance.name)
+        return send_and_receive_all(instance, pb_requests, timeout)
+
+    def _handle_kraken_responses(self, krakens_call, local_responses):
+        """
+        done in the request's thread, the ids of the journeys must be unique
+        """
         resp = []
         logger = logging.getLogger(__name__)
-        for dep_mode, arr_mode in krakens_call:
-            pb_request = create_pb_request(request_type, request, dep_mode, arr_mode)
+        for (dep_mode, arr_mode), local_resp in zip(krakens_call, local_responses):
             self.nb_kraken_calls += 1
 
-            local_resp = instance.send_and_receive(pb_request)
-
             # for log purpose we put and id in each journeys
             for idx, j in enumerate(local_resp.journeys):
                 j.internal_id = "{resp}-{j}".format(resp=self.nb_kraken_calls, j=idx)
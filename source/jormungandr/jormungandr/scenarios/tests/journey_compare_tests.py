@@ -36,6 +36,7 @@ from jormungandr.scenarios.default import Scenario, are_equals
 from jormungandr.utils import str_to_time_stamp
 from nose.tools import eq_
 import random
+import itertools
 
 
 def empty_journeys_test():
@@ -473,6 +474,66 @@ def test_similar_journeys_bss_park():
 
     assert journey_filter.compare(journey1, journey2, journey_filter.similar_journeys_vj_generator)
 
+def test_similar_journeys_group():
+    """
+    When several journeys are similar, only the best one is kept
+    """
+    responses = [response_pb2.Response()]
+    for i, (vj, duration) in enumerate([('bob', 43), ('bob', 41), ('bobette', 45), ('bob', 42)]):
+        journey = responses[0].journeys.add()
+        journey.internal_id = 'j{}'.format(i)
+        journey.duration = duration
+        journey.sections.add()
+        journey.sections[-1].type = response_pb2.PUBLIC_TRANSPORT
+        journey.sections[-1].pt_display_informations.uris.vehicle_journey = vj
+
+    journey_filter._filter_similar_vj_journeys(list(journeys_gen(responses)), {})
+
+    eq_([j.internal_id for j in journeys_gen(responses)], ['j1', 'j2'])
+    assert 'similar_to_j1' in responses[0].journeys[0].tags
+    assert 'similar_to_j1' in responses[0].journeys[3].tags
+
+
+def _filter_similar_vj_journeys_by_pairs(journeys, request):
+    """
+    how the similar journeys were filtered before, by comparing all pairs of journeys
+    """
+    for j1, j2 in itertools.combinations(journeys, 2):
+        if _to_be_deleted(j1) or _to_be_deleted(j2):
+            continue
+        if journey_filter.compare(j1, j2, journey_filter.similar_journeys_vj_generator):
+            worst = journey_filter._get_worst_similar(j1, j2, request)
+            journey_filter.mark_as_dead(worst, 'duplicate_journey', 'similar_to_{other}'
+                                        .format(other=j1.internal_id if worst == j2 else j2.internal_id))
+
+
+def test_similar_journeys_random():
+    """
+    Grouping the similar journeys must delete the same journeys than comparing all of them 2 by 2
+    """
+    r = random.Random(42)
+    for _ in range(200):
+        response = response_pb2.Response()
+        for i in range(r.randint(0, 12)):
+            journey = response.journeys.add()
+            journey.internal_id = 'j{}'.format(i)
+            journey.arrival_date_time = r.randint(0, 2)
+            journey.departure_date_time = r.randint(0, 2)
+            journey.duration = r.randint(0, 2)
+            for _ in range(r.randint(1, 2)):
+                journey.sections.add()
+                journey.sections[-1].type = response_pb2.PUBLIC_TRANSPORT
+                journey.sections[-1].pt_display_informations.uris.vehicle_journey = 'vj{}'.format(r.randint(0, 2))
+        request = {'clockwise': r.random() < 0.5}
+        expected = response_pb2.Response()
+        expected.CopyFrom(response)
+
+        journey_filter._filter_similar_vj_journeys(list(response.journeys), request)
+        _filter_similar_vj_journeys_by_pairs(list(expected.journeys), request)
+
+        eq_([list(j.tags) for j in response.journeys], [list(j.tags) for j in expected.journeys])
+
+
 class MockInstance(object):
     def __init__(self):
         pass  #TODO when we'll got instances's param
@@ -29,7 +29,18 @@
 
 from __future__ import absolute_import, print_function, unicode_literals, division
 import navitiacommon.response_pb2 as response_pb2
+from navitiacommon import type_pb2
 from jormungandr.scenarios import new_default
+from jormungandr.scenarios.utils import get_pseudo_duration
+from jormungandr.exceptions import DeadSocketException, DeadlineExceeded
+from jormungandr import app
+from datetime import datetime
+from threading import Lock
+import flask
+import time
+import random
+import mock
+import numpy as np
 """
  sections       0   1   2   3   4   5   6   7   8   9   10
  -------------------------------------------------------------
@@ -189,6 +200,71 @@ def get_sorted_solutions_indexes_test():
     assert all(selection_matrix[best_indexes[0]] == [0, 0, 1, 1, 0, 1, 0, 1, 1, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0])
 
 
+def _get_best_combination_by_enumeration(selected_sections_matrix, durations, nb_journeys_to_find,
+                                         idx_jrny_must_keep):
+    """
+    what culling_journeys used to do, by enumerating all the combinations
+    """
+    best_indexes, selection_matrix = \
+        new_default._get_sorted_solutions_indexes(selected_sections_matrix, nb_journeys_to_find, idx_jrny_must_keep)
+    the_best_index = min(best_indexes,
+                         key=lambda v: sum(durations[i] for i in np.where(selection_matrix[v, :])[0]))
+    return np.where(selection_matrix[the_best_index, :])[0].tolist()
+
+
+def get_best_combination_test():
+    mocked_pb_response = build_mocked_response()
+    candidates_pool, sections_set, idx_jrny_must_keep = \
+        new_default._build_candidate_pool_and_sections_set(mocked_pb_response)
+    selected_sections_matrix = new_default._build_selected_sections_matrix(sections_set, candidates_pool)
+    sections_masks = new_default._build_sections_masks(sections_set, candidates_pool)
+    durations = [get_pseudo_duration(j, 1444903200, True) for j in candidates_pool]
+
+    for nb_journeys_to_find in range(5, 10):
+        expected = _get_best_combination_by_enumeration(selected_sections_matrix, durations,
+                                                        nb_journeys_to_find, idx_jrny_must_keep)
+        assert new_default._get_best_combination(sections_masks, durations, nb_journeys_to_find,
+                                                 idx_jrny_must_keep) == expected
+
+
+def get_best_combination_random_test():
+    """
+    the branch and bound must choose exactly what the enumeration of all the combinations chooses
+    """
+    r = random.Random(42)
+    for _ in range(300):
+        nb_journeys = r.randint(2, 10)
+        nb_sections = r.randint(1, 8)
+        selected_sections_matrix = np.array([[int(r.random() < 0.3) for _ in range(nb_sections)]
+                                             for _ in range(nb_journeys)])
+        sections_masks = [sum(1 << i for i, v in enumerate(line) if v) for line in selected_sections_matrix]
+        # few different durations, to have ties
+        durations = [r.randint(0, 3) * 60 for _ in range(nb_journeys)]
+        idx_jrny_must_keep = sorted(r.sample(range(nb_journeys), r.randint(0, min(3, nb_journeys - 2))))
+        nb_journeys_to_find = r.randint(len(idx_jrny_must_keep) + 1, nb_journeys - 1)
+
+        expected = _get_best_combination_by_enumeration(selected_sections_matrix, durations,
+                                                        nb_journeys_to_find, idx_jrny_must_keep)
+        assert new_default._get_best_combination(sections_masks, durations, nb_journeys_to_find,
+                                                 idx_jrny_must_keep) == expected
+
+
+def get_best_combination_many_journeys_test():
+    """
+    with 40 journeys there are more than 600000 combinations of 7 journeys, they cannot be enumerated
+    """
+    r = random.Random(42)
+    sections_masks = [sum(1 << i for i in r.sample(range(12), r.randint(1, 4))) for _ in range(40)]
+    durations = [r.randint(0, 3600) for _ in range(40)]
+
+    best = new_default._get_best_combination(sections_masks, durations, 7, [3, 12])
+
+    assert len(best) == 7
+    assert {3, 12}.issubset(best)
+    # all the sections are covered
+    assert reduce(lambda a, b: a | b, (sections_masks[i] for i in best)) == (1 << 12) - 1
+
+
 def culling_jounreys_1_test():
     """
     Test when max_nb_journeys is bigger than journey's length in response,
@@ -344,3 +420,247 @@ def create_next_kraken_request_test():
     # anticlockwise: we should have the next request one second after departure of pt journey 1015->1020
     next_request = new_def.create_next_kraken_request(request_anticlock, [response])
     assert next_request == {'datetime': 101999, 'clockwise': False}
+
+
+def build_journey_request(origin_modes, destination_modes):
+    return {'origin': 'stop_area:A', 'destination': 'stop_area:B',
+            'origin_mode': origin_modes, 'destination_mode': destination_modes,
+            '_current_datetime': datetime(2016, 1, 1), 'datetime': 1451606400, 'clockwise': True,
+            'max_walking_duration_to_pt': 900, 'max_bike_duration_to_pt': 900,
+            'max_bss_duration_to_pt': 900, 'max_car_duration_to_pt': 900,
+            'walking_speed': 1.12, 'bike_speed': 3.3, 'car_speed': 11.1, 'bss_speed': 3.3,
+            'max_duration': 86400, 'max_transfers': 10, 'max_extra_second_pass': None,
+            'wheelchair': False, 'data_freshness': 'base_schedule', '_walking_transfer_penalty': 120}
+
+
+class FakeKraken(object):
+    """
+    mock of an instance, each call waits for the latency of its fallback mode before answering
+    """
+    name = 'fake'
+    socket_path = 'ipc:///tmp/fake'
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+
+    def send_and_receive(self, request, timeout=None):
+        mode = request.journeys.streetnetwork_params.origin_mode
+        latency = self.latencies[mode]
+        if latency is None:
+            raise DeadSocketException(self.name, self.socket_path)
+        time.sleep(latency)
+        resp = response_pb2.Response()
+        j = resp.journeys.add()
+        j.type = mode
+        return resp
+
+
+def call_kraken_parallel_test():
+    """
+    the calls for the different fallback modes are done in parallel,
+    the latency of call_kraken is the latency of the slowest call, not the sum of all of them
+    """
+    latencies = {'walking': 0.2, 'bike': 0.3, 'bss': 0.2, 'car': 0.1}
+    instance = FakeKraken(latencies)
+    request = build_journey_request(['walking', 'bike', 'bss', 'car'], ['walking', 'bss'])
+    krakens_call = new_default.get_kraken_calls(request)
+    assert len(krakens_call) == 4
+
+    start = time.time()
+    resp = new_default.Scenario().call_kraken(type_pb2.PLANNER, request, instance, krakens_call)
+    duration = time.time() - start
+
+    assert duration < max(latencies.values()) + 0.2 < sum(latencies.values())
+    # the responses are still in the order of the kraken calls
+    assert [r.journeys[0].type for r in resp] == [dep for dep, _ in krakens_call]
+    assert [r.journeys[0].internal_id for r in resp] == ['1-0', '2-0', '3-0', '4-0']
+
+
+def call_kraken_parallel_error_test():
+    """
+    if one of the parallel calls fails, call_kraken fails like a sequential call would have
+    """
+    instance = FakeKraken({'walking': 0, 'bike': None, 'bss': 0, 'car': 0})
+    request = build_journey_request(['walking', 'bike'], ['walking'])
+    krakens_call = new_default.get_kraken_calls(request)
+    try:
+        new_default.Scenario().call_kraken(type_pb2.PLANNER, request, instance, krakens_call)
+        assert False, 'call_kraken should have failed'
+    except DeadSocketException:
+        pass
+
+
+def create_speculative_kraken_requests_test():
+    """
+    the speculative requests are every JOURNEYS_SPECULATIVE_PAGINATION_STEP seconds after the request
+    (before for non clockwise requests)
+    """
+    with mock.patch.dict(app.config, {'JOURNEYS_SPECULATIVE_PAGINATION_STEP': 600}):
+        requests = new_default.Scenario.create_speculative_kraken_requests({'datetime': 1000, 'clockwise': True}, 3)
+        assert [r['datetime'] for r in requests] == [1000, 1600, 2200]
+
+        requests = new_default.Scenario.create_speculative_kraken_requests({'datetime': 10000, 'clockwise': False},
+                                                                           2)
+        assert [r['datetime'] for r in requests] == [10000, 9400]
+
+        request = {'datetime': 1000, 'clockwise': True}
+        assert new_default.Scenario.create_speculative_kraken_requests(request, 1) == [request]
+
+
+class FakeDatetimeKraken(object):
+    """
+    mock of an instance, answering a journey leaving at the requested datetime after a latency
+    """
+    name = 'fake'
+    socket_path = 'ipc:///tmp/fake'
+
+    def __init__(self, latency, failing_datetimes=()):
+        self.latency = latency
+        self.failing_datetimes = failing_datetimes
+
+    def send_and_receive(self, request, timeout=None):
+        time.sleep(self.latency)
+        dt = request.journeys.datetimes[0]
+        if dt in self.failing_datetimes:
+            raise DeadSocketException(self.name, self.socket_path)
+        resp = response_pb2.Response()
+        j = resp.journeys.add()
+        j.departure_date_time = dt
+        return resp
+
+
+def call_kraken_concurrently_test():
+    """
+    the kraken calls of the speculative requests are done at the same time,
+    the responses are in the order of the requests and the journeys ids are still unique
+    """
+    instance = FakeDatetimeKraken(latency=0.2)
+    request = build_journey_request(['walking'], ['walking'])
+    krakens_call = new_default.get_kraken_calls(request)
+    requests = new_default.Scenario.create_speculative_kraken_requests(request, 3)
+
+    start = time.time()
+    calls_resp = new_default.Scenario().call_kraken_concurrently(type_pb2.PLANNER, requests, instance,
+                                                                 krakens_call)
+    duration = time.time() - start
+
+    assert duration < 0.2 * 2
+    assert [resp[0].journeys[0].departure_date_time for resp in calls_resp] == [r['datetime'] for r in requests]
+    assert [resp[0].journeys[0].internal_id for resp in calls_resp] == ['1-0', '2-0', '3-0']
+
+
+def call_kraken_concurrently_speculative_error_test():
+    """
+    a failing speculative call is ignored, with the calls after it, the first call is mandatory
+    """
+    request = build_journey_request(['walking'], ['walking'])
+    krakens_call = new_default.get_kraken_calls(request)
+    requests = new_default.Scenario.create_speculative_kraken_requests(request, 3)
+
+    instance = FakeDatetimeKraken(latency=0, failing_datetimes=[requests[1]['datetime']])
+    calls_resp = new_default.Scenario().call_kraken_concurrently(type_pb2.PLANNER, requests, instance,
+                                                                 krakens_call)
+    assert len(calls_resp) == 1
+
+    instance = FakeDatetimeKraken(latency=0, failing_datetimes=[requests[0]['datetime']])
+    try:
+        new_default.Scenario().call_kraken_concurrently(type_pb2.PLANNER, requests, instance, krakens_call)
+        assert False, 'call_kraken_concurrently should have failed'
+    except DeadSocketException:
+        pass
+
+
+class CountingKraken(FakeDatetimeKraken):
+    """
+    mock of an instance counting the calls running at the same time, each call flags a partial response
+    """
+    def __init__(self, latency):
+        super(CountingKraken, self).__init__(latency)
+        self.lock = Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def send_and_receive(self, request, timeout=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            flask.g.partial_response = True
+            return super(CountingKraken, self).send_and_receive(request, timeout)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def call_kraken_concurrently_bounded_test():
+    """
+    all the kraken calls of a request are done by at most PARALLEL_MAX_WORKERS_BY_REQUEST threads,
+    the flags set in g by the calls are kept
+    """
+    instance = CountingKraken(latency=0.05)
+    request = build_journey_request(['walking', 'bike'], ['walking'])
+    krakens_call = new_default.get_kraken_calls(request)
+    requests = new_default.Scenario.create_speculative_kraken_requests(request, 3)
+
+    with mock.patch.dict(app.config, {'PARALLEL_MAX_WORKERS_BY_REQUEST': 2}):
+        with app.test_request_context('/'):
+            calls_resp = new_default.Scenario().call_kraken_concurrently(type_pb2.PLANNER, requests, instance,
+                                                                         krakens_call)
+            assert flask.g.partial_response
+
+    assert instance.max_running == 2
+    assert [[r.journeys[0].departure_date_time for r in resp] for resp in calls_resp] == \
+        [[r['datetime']] * len(krakens_call) for r in requests]
+
+
+class TimeoutKraken(FakeDatetimeKraken):
+    """
+    mock of an instance failing like kraken when the latency is longer than the timeout of the call
+    """
+    def send_and_receive(self, request, timeout=None):
+        if timeout is not None and timeout < self.latency * 1000:
+            time.sleep(timeout / 1000)
+            raise DeadlineExceeded(self.name)
+        return super(TimeoutKraken, self).send_and_receive(request, timeout)
+
+
+def call_kraken_concurrently_more_calls_than_workers_test():
+    """
+    the calls waiting for a worker share the deadline of the first ones: with more calls than workers, the
+    requests whose calls could not be done in time are dropped, the others are answered
+    """
+    instance = TimeoutKraken(latency=0.1)
+    request = build_journey_request(['walking', 'bike'], ['walking'])
+    krakens_call = new_default.get_kraken_calls(request)
+    requests = new_default.Scenario.create_speculative_kraken_requests(request, 3)
+
+    with mock.patch.dict(app.config, {'PARALLEL_MAX_WORKERS_BY_REQUEST': 2, 'INSTANCE_TIMEOUT': 250}):
+        with app.test_request_context('/'):
+            start = time.time()
+            calls_resp = new_default.Scenario().call_kraken_concurrently(type_pb2.PLANNER, requests, instance,
+                                                                         krakens_call)
+            duration = time.time() - start
+
+    # 6 calls of 100ms by 2 workers: the third wave has only 50ms left
+    assert len(calls_resp) == 2
+    assert duration < 0.25 + new_default.KRAKEN_CALLS_MARGIN
+
+
+def call_kraken_concurrently_wait_timeout_test():
+    """
+    calls not finished at the end of the wait are reported as a deadline exceeded, not as a dead instance
+    """
+    # this instance does not respect the timeout of the calls
+    instance = FakeDatetimeKraken(latency=0.3)
+    request = build_journey_request(['walking'], ['walking'])
+    krakens_call = new_default.get_kraken_calls(request)
+    requests = new_default.Scenario.create_speculative_kraken_requests(request, 2)
+
+    with mock.patch.dict(app.config, {'INSTANCE_TIMEOUT': 50}), \
+            mock.patch.object(new_default, 'KRAKEN_CALLS_MARGIN', 0):
+        with app.test_request_context('/'):
+            try:
+                new_default.Scenario().call_kraken_concurrently(type_pb2.PLANNER, requests, instance, krakens_call)
+                assert False, 'call_kraken_concurrently should have failed'
+            except DeadlineExceeded:
+                pass
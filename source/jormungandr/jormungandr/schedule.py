@@ -30,11 +30,13 @@
 # www.navitia.io
 
 from __future__ import absolute_import, print_function, unicode_literals, division
+import collections
 import hashlib
 
 import logging
 import pytz
-from jormungandr import utils
+from flask import g, has_request_context
+from jormungandr import utils, app, parallel
 
 from navitiacommon import type_pb2, request_pb2, response_pb2
 from jormungandr.utils import date_to_timestamp, pb_del_if
@@ -138,7 +140,7 @@ def _update_passages(passages, route_point, template, next_realtime_passages):
         return
 
     # filter passages with entries of the asked route_point
-    pb_del_if(passages, lambda p: RoutePoint(p.route, p.stop_point) == route_point)
+    pb_del_if(passages, lambda p: RoutePoint(p.route, p.stop_point) == route_point, bulk=True)
 
     # append the realtime passages
     for rt_passage in next_realtime_passages:
@@ -207,25 +209,62 @@ class MixedSchedule(object):
     def __init__(self, instance):
         self.instance = instance
 
-    def _get_next_realtime_passages(self, route_point):
-        log = logging.getLogger(__name__)
-
-        if not route_point:
-            return None
-
-        rt_system_code = get_realtime_system_code(route_point)
+    def _get_realtime_proxy(self, rt_system_code):
         if not rt_system_code:
             return None
 
         rt_system = self.instance.realtime_proxy_manager.get(rt_system_code)
         if not rt_system:
-            log.info('impossible to find {}, no realtime added'.format(rt_system_code))
+            logging.getLogger(__name__).info('impossible to find {}, no realtime added'.format(rt_system_code))
             return None
 
-        next_rt_passages = rt_system.next_passage_for_route_point(route_point)
-        if next_rt_passages is None:
-            log.debug('no next passages, using base schedule')
-            return None
+        return rt_system
+
+    def _get_all_next_realtime_passages(self, route_points):
+        """
+        get the next realtime passages of the route points, the proxies are called concurrently
+
+        the proxies with a batch api are called once with all their route points,
+        the others are called once by route point
+
+        return a dict {route_point: next realtime passages}, the route points whose proxy hasn't answered
+        after REALTIME_PROXIES_TIMEOUT seconds are not in it (the base schedule is used for them)
+        the number of timed out calls is stored in g.realtime_proxies_timeouts to be displayed in the debug
+        """
+        calls = []  # [(proxy id, proxy, route points queried in one call)]
+        route_points_by_batch_proxy = collections.OrderedDict()
+        # the route points are sorted for the calls of the same route points to be the same (and cached)
+        for route_point in sorted(set(r for r in route_points if r),
+                                  key=lambda r: (r.pb_route.uri, r.pb_stop_point.uri)):
+            rt_system_code = get_realtime_system_code(route_point)
+            rt_system = self._get_realtime_proxy(rt_system_code)
+            if not rt_system:
+                continue
+            if rt_system.batch_api:
+                route_points_by_batch_proxy.setdefault((rt_system_code, rt_system), []).append(route_point)
+            else:
+                calls.append((rt_system_code, rt_system, [route_point]))
+        calls.extend((code, rt_system, rps) for (code, rt_system), rps in route_points_by_batch_proxy.items())
+
+        for rt_system_code, _, rps in calls:
+            self.instance.realtime_proxy_manager.record_call(rt_system_code, rps)
+
+        futures = [(rt_system, rps, parallel.spawn(rt_system.next_passages_for_route_points, rps))
+                   for _, rt_system, rps in calls]
+        parallel.wait_all([f for _, _, f in futures], timeout=app.config.get('REALTIME_PROXIES_TIMEOUT', 5))
+
+        next_rt_passages = {}
+        nb_timeouts = 0
+        for rt_system, rps, future in futures:
+            try:
+                next_rt_passages.update(future.result(timeout=0))
+            except parallel.ParallelTimeout:
+                logging.getLogger(__name__).info('timeout while getting the next passages of {} route points '
+                                                 'from {}, using base schedule'.format(len(rps), rt_system))
+                nb_timeouts += 1
+
+        if nb_timeouts and has_request_context():
+            g.realtime_proxies_timeouts = getattr(g, 'realtime_proxies_timeouts', 0) + nb_timeouts
 
         return next_rt_passages
 
@@ -281,8 +320,9 @@ class MixedSchedule(object):
                              _create_template_from_pb_route_point(rp))
                             for rp in resp.route_points)
 
+        all_next_rt_passages = self._get_all_next_realtime_passages(route_points.keys())
         for route_point, template in route_points.items():
-            next_rt_passages = self._get_next_realtime_passages(route_point)
+            next_rt_passages = all_next_rt_passages.get(route_point)
             _update_passages(resp.next_departures, route_point, template, next_rt_passages)
 
         # sort
@@ -309,8 +349,9 @@ class MixedSchedule(object):
         if request['data_freshness'] != RT_PROXY_DATA_FRESHNESS:
             return resp
 
-        for stop_schedule in resp.stop_schedules:
-            route_point = _get_route_point_from_stop_schedule(stop_schedule)
-            next_rt_passages = self._get_next_realtime_passages(route_point)
+        route_points = [_get_route_point_from_stop_schedule(s) for s in resp.stop_schedules]
+        all_next_rt_passages = self._get_all_next_realtime_passages(route_points)
+        for stop_schedule, route_point in zip(resp.stop_schedules, route_points):
+            next_rt_passages = all_next_rt_passages.get(route_point)
             _update_stop_schedule(stop_schedule, next_rt_passages)
         return resp
@@ -37,9 +37,16 @@ from datetime import datetime
 import logging
 from jormungandr import app
 from jormungandr.authentication import get_user, get_token, get_app_name
+from jormungandr.warm_up_manager import is_warm_up_request
 from jormungandr import utils
 import re
-from threading import Lock
+import itertools
+from threading import Lock, Thread
+import queue
+import os
+import atexit
+import errno
+import struct
 
 import time
 import sys
@@ -47,6 +54,33 @@ import kombu
 
 f_datetime = "%Y%m%dT%H%M%S"
 
+
+def _framed(pbf):
+    """
+    the stat preceded by its size, the format of the spill files and of the batch messages
+    """
+    return struct.pack(b'>I', len(pbf)) + pbf
+
+
+def _read_spilled(f):
+    """
+    the stats of a file of framed stats
+    """
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        yield f.read(struct.unpack(b'>I', header)[0])
+
+
+def _is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
 def init_journey(stat_journey):
     stat_journey.requested_date_time = 0
     stat_journey.departure_date_time = 0
@@ -128,6 +162,21 @@ class StatManager(object):
 
         self.lock = Lock()
 
+        # the stats are published by a background thread, so a slow broker does not slow the requests down
+        self.queue = queue.Queue(maxsize=app.config.get('STAT_QUEUE_SIZE', 10000))
+        self.batch_size = app.config.get('STAT_BATCH_SIZE', 1)
+        self.batch_timeout = app.config.get('STAT_BATCH_TIMEOUT', 100)
+        # when the queue is full, the stats are written in this directory if any, else they are dropped
+        self.spill_dir = app.config.get('STAT_SPILL_DIR', None)
+        self.replay_interval = app.config.get('STAT_REPLAY_INTERVAL', 60)
+        self.next_replay = 0
+        self.publisher = None
+        self.publisher_lock = Lock()
+        self.exit_hook_registered = False
+        self.spill_lock = Lock()
+        self.counters_lock = Lock()
+        self.counters = {'queued': 0, 'published': 0, 'dropped': 0, 'spilled': 0, 'failed': 0}
+
     def _init_rabbitmq(self):
         """
         connection to rabbitmq and initialize queues
@@ -143,7 +192,7 @@ class StatManager(object):
         """
         Function to fill stat objects (requests, parameters, journeys et sections) sand send them to Broker
         """
-        if not self.save_stat:
+        if not self.save_stat or is_warm_up_request(request):
             return
 
         try:
@@ -479,23 +528,221 @@ class StatManager(object):
                 previous_section = stat_section
 
     def publish_request(self, stat_request):
+        """
+        queue the stat to be published by the background publisher
+        """
         pbf = stat_request.SerializeToString()
+        self._start_publisher()
+        try:
+            self.queue.put_nowait(pbf)
+            self._count('queued')
+        except queue.Full:
+            if self.spill_dir and self._spill([pbf]):
+                self._count('spilled')
+            else:
+                logging.getLogger(__name__).warn('stat queue is full, the stat is dropped')
+                self._count('dropped')
+
+    def _count(self, counter, nb=1):
+        with self.counters_lock:
+            self.counters[counter] += nb
+
+    def _start_publisher(self):
+        """
+        the publisher is started lazily, by the process that publishes
+        (a thread started before a fork does not exist in the forked process)
+        """
+        if self.publisher is not None and self.publisher.is_alive():
+            return
+        with self.publisher_lock:
+            if self.publisher is not None and self.publisher.is_alive():
+                return
+            self.publisher = Thread(target=self._publisher_loop, name='stat_publisher')
+            self.publisher.daemon = True
+            self.publisher.start()
+            if not self.exit_hook_registered:
+                # the publisher is a daemon thread, it does not keep the process alive for the queued stats
+                atexit.register(self._flush_at_exit)
+                self.exit_hook_registered = True
+
+    def _publisher_loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                if not self._publish_batch(batch):
+                    self._keep_unpublished(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if self.spill_dir and self.queue.empty():
+                self._replay_spilled_if_due()
+
+    def _next_batch(self):
+        """
+        wait for a stat, then take the following ones for at most STAT_BATCH_TIMEOUT ms
+        until there is STAT_BATCH_SIZE stats
+        """
+        batch = [self.queue.get()]
+        end = time.time() + self.batch_timeout / 1000
+        while len(batch) < self.batch_size:
+            remaining = end - time.time()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _publish_batch(self, pbfs):
+        """
+        publish the stats in one message, return False if it failed
+
+        a single stat is the body of the message, several stats are concatenated with their size before each of
+        them (like in the spill files) and the message has a 'stat_batch' header giving their number
+        """
+        if len(pbfs) == 1:
+            body, headers = pbfs[0], None
+        else:
+            body, headers = b''.join(_framed(pbf) for pbf in pbfs), {'stat_batch': len(pbfs)}
         with self.lock:
             try:
-                if self.producer is None:
-                    #if the initialization failed we have to retry the creation of the objects
-                    self._init_rabbitmq()
-                self.producer.publish(pbf)
-            except self.connection.connection_errors + self.connection.channel_errors:
-                logging.getLogger(__name__).exception('Server went away, will be reconnected..')
-                #Relese and close the previous connection
-                if self.connection and self.connection.connected:
-                    self.connection.release()
-                #Initialize a new connection to RabbitMQ
+                self._publish(body, headers)
+                self._count('published', len(pbfs))
+                return True
+            except:
+                logging.getLogger(__name__).exception('Unable to publish the stats')
+                return False
+
+    def _keep_unpublished(self, pbfs):
+        """
+        the stats that could not be published are written on disk to be published later, if possible
+        """
+        nb_spilled = self._spill(pbfs) if self.spill_dir else 0
+        self._count('spilled', nb_spilled)
+        self._count('failed', len(pbfs) - nb_spilled)
+
+    def _publish(self, body, headers=None):
+        try:
+            if self.producer is None:
+                #if the initialization failed we have to retry the creation of the objects
                 self._init_rabbitmq()
-                #If connection is established publish the stat message.
-                if self.save_stat:
-                    self.producer.publish(pbf)
+            self.producer.publish(body, headers=headers)
+        except self.connection.connection_errors + self.connection.channel_errors:
+            logging.getLogger(__name__).exception('Server went away, will be reconnected..')
+            #Relese and close the previous connection
+            if self.connection and self.connection.connected:
+                self.connection.release()
+            #Initialize a new connection to RabbitMQ
+            self._init_rabbitmq()
+            #If connection is established publish the stat message.
+            if self.save_stat:
+                self.producer.publish(body, headers=headers)
+
+    def flush(self):
+        """
+        wait for all the queued stats to be published
+        """
+        self.queue.join()
+
+    def _flush_at_exit(self):
+        """
+        the stats still in the queue when the process exits are written on disk if possible,
+        they will be published by another process, else they are published now
+        """
+        pbfs = []
+        while True:
+            try:
+                pbfs.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            self.queue.task_done()
+        nb_spilled = self._spill(pbfs) if self.spill_dir else 0
+        self._count('spilled', nb_spilled)
+        for i in range(nb_spilled, len(pbfs), self.batch_size):
+            batch = pbfs[i:i + self.batch_size]
+            if not self._publish_batch(batch):
+                self._count('failed', len(batch))
+
+    def _spill_file(self, pid=None):
+        # one file by process, the workers do not share it
+        return os.path.join(self.spill_dir, 'stat_spill_{}.pbf'.format(pid or os.getpid()))
+
+    def _spill(self, pbfs):
+        """
+        append the stats to the spill file of the process, return the number of stats written
+        """
+        nb_written = 0
+        with self.spill_lock:
+            try:
+                with open(self._spill_file(), 'ab') as f:
+                    for pbf in pbfs:
+                        f.write(_framed(pbf))
+                        nb_written += 1
+            except (IOError, OSError):
+                logging.getLogger(__name__).exception('impossible to spill the stats on disk')
+        return nb_written
+
+    def _spill_files_to_replay(self):
+        """
+        the spill file of this process and the ones left by the processes that have exited,
+        with the files that were being replayed by a process that has exited (or by this one before a failure)
+        """
+        files = []
+        for name in os.listdir(self.spill_dir):
+            match = re.match(r'^stat_spill_(\d+)\.pbf(?:\.replay_(\d+))?$', name)
+            if not match:
+                continue
+            pid = int(match.group(2) or match.group(1))
+            if pid == os.getpid() or not _is_process_alive(pid):
+                files.append(os.path.join(self.spill_dir, name))
+        return files
+
+    def _replay_spilled_if_due(self):
+        """
+        the spill directory is only looked at every STAT_REPLAY_INTERVAL seconds
+        """
+        if time.time() < self.next_replay:
+            return
+        self.next_replay = time.time() + self.replay_interval
+        try:
+            self._replay_spilled()
+        except:
+            logging.getLogger(__name__).exception('Unable to publish the spilled stats')
+
+    def _replay_spilled(self):
+        """
+        publish by batches the stats written on disk while the queue was full, the broker unreachable
+        or at the exit of a process
+
+        a file is taken by renaming it, so only one process replays it. The replay stops at the first batch that
+        can't be published: the stats not published yet go back in the spill file of the process.
+        Return False if all the stats could not be published
+        """
+        for spill_file in self._spill_files_to_replay():
+            replay_file = '{}.replay_{}'.format(spill_file.split('.replay_')[0], os.getpid())
+            with self.spill_lock:
+                try:
+                    os.rename(spill_file, replay_file)
+                except OSError:
+                    # it has been taken by another process
+                    continue
+            with open(replay_file, 'rb') as f:
+                pbfs = _read_spilled(f)
+                for batch in iter(lambda: list(itertools.islice(pbfs, self.batch_size)), []):
+                    if self._publish_batch(batch):
+                        continue
+                    if self._spill(itertools.chain(batch, pbfs)) == 0:
+                        # the file is kept, it will be replayed again
+                        return False
+                    os.remove(replay_file)
+                    return False
+            os.remove(replay_file)
+        return True
+
+    def status(self):
+        with self.counters_lock:
+            counters = dict(self.counters)
+        counters['in_queue'] = self.queue.qsize()
+        return counters
 
     def fill_admin_from(self, stat_section, admin):
         if admin[0]:
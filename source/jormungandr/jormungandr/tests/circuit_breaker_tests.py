@@ -0,0 +1,149 @@
+# coding=utf-8
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+# the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Thread, Event
+import pybreaker
+from nose.tools import eq_, raises
+from jormungandr.circuit_breaker import CircuitBreaker
+
+
+def concurrent_calls_test():
+    """
+    the calls are not made one after the other: the second call is done while the first one is running
+    """
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=60)
+    first_call_running = Event()
+    second_call_done = Event()
+    results = []
+
+    def first_call():
+        first_call_running.set()
+        results.append(second_call_done.wait(1))
+
+    thread = Thread(target=breaker.call, args=(first_call,))
+    thread.start()
+    first_call_running.wait(1)
+    breaker.call(second_call_done.set)
+    thread.join()
+
+    eq_(results, [True])
+
+
+@raises(pybreaker.CircuitBreakerError)
+def open_breaker_test():
+    """
+    the breaker still opens after fail_max failures
+    """
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=60)
+
+    def fail():
+        raise ValueError()
+
+    for _ in range(2):
+        try:
+            breaker.call(fail)
+        except ValueError:
+            pass
+    eq_(breaker.current_state, 'open')
+    breaker.call(lambda: None)
+
+
+def concurrent_failures_test():
+    """
+    the failures of concurrent calls are all counted
+    """
+    breaker = CircuitBreaker(fail_max=1000, reset_timeout=60)
+
+    def fail():
+        raise ValueError()
+
+    def fail_many():
+        for _ in range(50):
+            try:
+                breaker.call(fail)
+            except ValueError:
+                pass
+
+    threads = [Thread(target=fail_many) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    eq_(breaker.fail_counter, 500)
+    eq_(breaker.current_state, 'closed')
+
+
+def single_trial_call_test():
+    """
+    in the half-open state, only one call is made, the others fail until its end
+    """
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=0)
+    breaker.open()
+    trial_call_running = Event()
+    end_trial_call = Event()
+
+    def trial_call():
+        trial_call_running.set()
+        end_trial_call.wait(1)
+
+    thread = Thread(target=breaker.call, args=(trial_call,))
+    thread.start()
+    trial_call_running.wait(1)
+    eq_(breaker.current_state, 'half-open')
+    try:
+        breaker.call(lambda: None)
+        assert False, 'only one trial call should be made'
+    except pybreaker.CircuitBreakerError:
+        pass
+    end_trial_call.set()
+    thread.join()
+
+    # the trial call succeeded, the breaker is closed
+    eq_(breaker.current_state, 'closed')
+    breaker.call(lambda: None)
+
+
+@raises(pybreaker.CircuitBreakerError)
+def failed_trial_call_test():
+    """
+    the breaker opens again if the trial call fails
+    """
+    breaker = CircuitBreaker(fail_max=5, reset_timeout=0)
+    breaker.open()
+
+    def fail():
+        raise ValueError()
+
+    try:
+        breaker.call(fail)
+    finally:
+        eq_(breaker.current_state, 'open')
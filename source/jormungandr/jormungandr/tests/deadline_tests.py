@@ -0,0 +1,106 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+import flask
+import mock
+from nose.tools import eq_
+from jormungandr import app, deadline
+
+
+def _init_deadline(headers=None, **config):
+    with mock.patch.dict(app.config, config):
+        deadline.init_request_deadline(flask.request)
+    return deadline.get_request_deadline()
+
+
+def no_deadline_test():
+    with app.test_request_context('/'):
+        assert _init_deadline(REQUEST_TIMEOUT=None) is None
+        eq_(deadline.cap_timeout(10000), 10000)
+        assert not deadline.is_exhausted()
+
+
+def configured_deadline_test():
+    with app.test_request_context('/'):
+        request_deadline = _init_deadline(REQUEST_TIMEOUT=2000)
+        eq_(request_deadline.timeout, 2000)
+        assert 0 < deadline.cap_timeout(10000) <= 2000
+        eq_(deadline.cap_timeout(100), 100)
+
+
+def header_deadline_test():
+    """
+    the header can only reduce the configured timeout
+    """
+    with app.test_request_context('/', headers={'navitia-timeout': '500'}):
+        eq_(_init_deadline(REQUEST_TIMEOUT=2000).timeout, 500)
+        eq_(_init_deadline(REQUEST_TIMEOUT=None).timeout, 500)
+    with app.test_request_context('/', headers={'navitia-timeout': '5000'}):
+        eq_(_init_deadline(REQUEST_TIMEOUT=2000).timeout, 2000)
+    with app.test_request_context('/', headers={'navitia-timeout': 'bob'}):
+        eq_(_init_deadline(REQUEST_TIMEOUT=2000).timeout, 2000)
+
+
+def exhausted_deadline_test():
+    with app.test_request_context('/'):
+        _init_deadline(REQUEST_TIMEOUT=0)
+        assert deadline.is_exhausted()
+        eq_(deadline.cap_timeout(10000), 0)
+        deadline.flag_partial_response()
+        assert flask.g.partial_response
+
+
+def no_request_test():
+    """
+    outside of a request (at the initialisation of the instances for example) there is no deadline
+    """
+    assert deadline.get_request_deadline() is None
+    eq_(deadline.cap_timeout(10000), 10000)
+
+
+def capped_request_deadline_test():
+    """
+    within the block the earliest deadline is the one of the request, the deadline of the request is then restored
+    """
+    with app.test_request_context('/'):
+        request_deadline = _init_deadline(REQUEST_TIMEOUT=2000)
+        with deadline.capped_request_deadline(deadline.Deadline(100)):
+            assert deadline.cap_timeout(10000) <= 100
+        assert deadline.get_request_deadline() is request_deadline
+
+        with deadline.capped_request_deadline(deadline.Deadline(5000)):
+            assert deadline.get_request_deadline() is request_deadline
+
+        _init_deadline(REQUEST_TIMEOUT=None)
+        with deadline.capped_request_deadline(deadline.Deadline(100)):
+            assert deadline.cap_timeout(10000) <= 100
+        assert deadline.get_request_deadline() is None
@@ -0,0 +1,190 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from collections import namedtuple
+from threading import Event
+import mock
+import zmq
+from nose.tools import eq_, raises
+from shapely import geometry
+from jormungandr import app
+from jormungandr.exceptions import RegionNotFound
+from jormungandr.instance import Instance
+from jormungandr.instance_manager import InstanceManager, GeometriesIndex
+
+
+class FakeInstance(object):
+    def __init__(self, name, uris, indexed=True):
+        self.name = name
+        self.uris = uris
+        self.indexed = indexed
+        self.asked_ids = []
+
+    def may_have_id(self, id_):
+        return not self.indexed or id_ in self.uris
+
+    def has_id(self, id_):
+        self.asked_ids.append(id_)
+        return id_ in self.uris
+
+
+def make_manager(*instances):
+    manager = InstanceManager(instances_dir='/nowhere')
+    manager.instances = {i.name: i for i in instances}
+    return manager
+
+
+def all_keys_of_id_test():
+    """
+    only the instances that may have the id are asked
+    """
+    paris = FakeInstance('paris', ['stop_area:A'])
+    lyon = FakeInstance('lyon', ['stop_area:B'])
+    manager = make_manager(paris, lyon)
+
+    eq_(manager._all_keys_of_id('stop_area:A'), ['paris'])
+    eq_(paris.asked_ids, ['stop_area:A'])
+    eq_(lyon.asked_ids, [])
+
+
+def all_keys_of_id_several_candidates_test():
+    """
+    the instances without index are always asked, all the candidates having the id are returned
+    """
+    paris = FakeInstance('paris', ['stop_area:A'])
+    lyon = FakeInstance('lyon', ['stop_area:A'])
+    not_indexed = FakeInstance('nantes', [], indexed=False)
+    manager = make_manager(paris, lyon, not_indexed)
+
+    eq_(sorted(manager._all_keys_of_id('stop_area:A')), ['lyon', 'paris'])
+    eq_(not_indexed.asked_ids, ['stop_area:A'])
+
+
+@raises(RegionNotFound)
+def all_keys_of_unknown_id_test():
+    paris = FakeInstance('paris', ['stop_area:A'])
+    not_indexed = FakeInstance('nantes', [], indexed=False)
+    make_manager(paris, not_indexed)._all_keys_of_id('stop_area:Z')
+
+
+class HungInstance(FakeInstance):
+    def __init__(self, name, uris):
+        super(HungInstance, self).__init__(name, uris)
+        self.release = Event()
+
+    def has_id(self, id_):
+        self.release.wait(5)
+        return super(HungInstance, self).has_id(id_)
+
+
+def all_keys_of_id_hung_instance_test():
+    """
+    an instance not answering in time is considered as not having the id
+    """
+    paris = FakeInstance('paris', ['stop_area:A'])
+    hung = HungInstance('lyon', ['stop_area:A'])
+    manager = make_manager(paris, hung)
+
+    with mock.patch.dict(app.config, {'INSTANCE_TIMEOUT': 50}), \
+            mock.patch('jormungandr.instance_manager.HAS_ID_MARGIN', 0):
+        try:
+            eq_(manager._all_keys_of_id('stop_area:A'), ['paris'])
+        finally:
+            hung.release.set()
+
+
+ShapedInstance = namedtuple('ShapedInstance', ['name', 'geom'])
+
+
+def geometries_index_test():
+    """
+    the small boxes are found by the grid, the large ones are always checked,
+    the candidates are given in the order of the instances
+    """
+    instances = [ShapedInstance('world', geometry.box(-180, -90, 180, 90)),
+                 ShapedInstance('paris', geometry.box(2.2, 48.7, 2.5, 49)),
+                 ShapedInstance('no_shape', None),
+                 ShapedInstance('idf', geometry.box(1.4, 48.1, 3.6, 49.3)),
+                 ShapedInstance('france', geometry.box(-5, 42, 8, 51))]
+    index = GeometriesIndex(instances, cell_size=1.0, max_cells=20)
+    eq_([b[1].name for b in index.large_boxes], ['world', 'france'])
+
+    def candidates(lon, lat):
+        return [i.name for i in index.candidates(geometry.Point(lon, lat))]
+
+    eq_(candidates(2.35, 48.85), ['world', 'paris', 'idf', 'france'])
+    # in the cell of paris but not in its box
+    eq_(candidates(2.1, 48.85), ['world', 'idf', 'france'])
+    # on the border of a cell
+    eq_(candidates(2.0, 49.0), ['world', 'idf', 'france'])
+    eq_(candidates(-73.9, 40.7), ['world'])
+
+
+def geometries_index_without_grid_test():
+    """
+    with all the boxes too large for the grid, the lookup is a filter of all the boxes
+    """
+    instances = [ShapedInstance('paris', geometry.box(2.2, 48.7, 2.5, 49)),
+                 ShapedInstance('idf', geometry.box(1.4, 48.1, 3.6, 49.3))]
+    index = GeometriesIndex(instances, cell_size=1.0, max_cells=0)
+    eq_(len(index.large_boxes), 2)
+    eq_([i.name for i in index.candidates(geometry.Point(2.35, 48.85))], ['paris', 'idf'])
+    eq_([i.name for i in index.candidates(geometry.Point(3.5, 48.2))], ['idf'])
+
+
+def _metadatas_response(publication_date, shape):
+    response = mock.MagicMock()
+    response.publication_date = publication_date
+    response.metadatas.shape = shape
+    response.metadatas.timezone = 'Europe/Paris'
+    return response
+
+
+def set_geom_only_on_change_test():
+    """
+    the geometries index is only reset when the shape of an instance changes
+    """
+    instance = Instance(zmq.Context(), 'test', 'ipc:///tmp/set_geom_test')
+    instance.on_geom_update = mock.MagicMock()
+    shape = 'POLYGON((2.2 48.7, 2.5 48.7, 2.5 49, 2.2 49, 2.2 48.7))'
+
+    instance.update_property(_metadatas_response(1, shape))
+    eq_(instance.on_geom_update.call_count, 1)
+    assert instance.has_coord(2.35, 48.85)
+
+    # same shape (in the metadata of a new publication for example)
+    instance.update_property(_metadatas_response(2, shape))
+    eq_(instance.on_geom_update.call_count, 1)
+
+    instance.update_property(_metadatas_response(3, 'POLYGON((0 0, 1 0, 1 1, 0 1, 0 0))'))
+    eq_(instance.on_geom_update.call_count, 2)
+    assert not instance.has_coord(2.35, 48.85)
@@ -0,0 +1,111 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+import mock
+import zmq
+from nose.tools import eq_, raises
+from navitiacommon import models
+from jormungandr import app
+from jormungandr.instance import Instance, InstanceParams
+from jormungandr.instance_manager import InstanceManager
+
+
+def _db_instance(**params):
+    instance_db = models.Instance('test')
+    for k, v in params.items():
+        setattr(instance_db, k, v)
+    return instance_db
+
+
+def _instance():
+    return Instance(zmq.Context(), 'test', 'ipc:///tmp/instance_params_test')
+
+
+def params_snapshot_test():
+    """
+    the parameters are read from the database once, then from the snapshot
+    """
+    instance = _instance()
+    with mock.patch.object(Instance, '_get_models', return_value=_db_instance(walking_speed=2.)) as get_models:
+        eq_(instance.walking_speed, 2.)
+        eq_(instance.walking_speed, 2.)
+        assert not instance.params.is_free
+        eq_(get_models.call_count, 1)
+
+
+def params_default_values_test():
+    """
+    without database the default values are used
+    """
+    instance = _instance()
+    with mock.patch.object(Instance, '_get_models', return_value=None):
+        eq_(instance.params.scenario, 'default')
+        assert not instance.params.is_free
+        assert instance.walking_speed is not None
+
+
+def params_timeout_test():
+    instance = _instance()
+    config = dict(app.config['CACHE_CONFIGURATION'], TIMEOUT_PARAMS=0)
+    with mock.patch.dict(app.config, {'CACHE_CONFIGURATION': config}), \
+            mock.patch.object(Instance, '_get_models', return_value=_db_instance(walking_speed=2.)) as get_models:
+        instance.walking_speed
+        instance.walking_speed
+        eq_(get_models.call_count, 2)
+
+
+def invalidate_params_test():
+    instance = _instance()
+    with mock.patch.object(Instance, '_get_models', return_value=_db_instance(walking_speed=2.)):
+        eq_(instance.walking_speed, 2.)
+    with mock.patch.object(Instance, '_get_models', return_value=_db_instance(walking_speed=3.)):
+        eq_(instance.walking_speed, 2.)
+        instance.invalidate_params()
+        eq_(instance.walking_speed, 3.)
+
+
+def clear_cache_invalidate_params_test():
+    """
+    the parameters are read again when the cache of the instances is cleared (after a new publication)
+    """
+    manager = InstanceManager(instances_dir='/nowhere')
+    manager.instances = {'test': _instance()}
+    with mock.patch.object(Instance, '_get_models', return_value=_db_instance(walking_speed=2.)) as get_models:
+        manager.instances['test'].walking_speed
+        manager._clear_cache()
+        manager.instances['test'].walking_speed
+        eq_(get_models.call_count, 2)
+
+
+@raises(AttributeError)
+def immutable_params_test():
+    InstanceParams(None, 'test').walking_speed = 12
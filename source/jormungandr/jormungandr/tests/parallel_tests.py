@@ -0,0 +1,129 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Event, Lock
+import time
+import flask
+import mock
+from nose.tools import eq_
+from jormungandr import app, parallel
+
+
+def merge_g_test():
+    """
+    the attributes of g set by a call are only seen by the request once merged
+    """
+    with app.test_request_context('/'):
+        flask.g.kept = 'parent'
+        flask.g.overridden = 'parent'
+
+        def call():
+            flask.g.overridden = 'child'
+            flask.g.partial_response = True
+            return flask.g.kept
+
+        future = parallel.spawn(call)
+        eq_(future.result(1), 'parent')
+        assert not hasattr(flask.g, 'partial_response')
+        eq_(flask.g.overridden, 'parent')
+
+        future.merge_g()
+        assert flask.g.partial_response
+        eq_(flask.g.overridden, 'child')
+        eq_(flask.g.kept, 'parent')
+        assert not hasattr(flask.g, 'parallel_future')
+
+
+def cancel_test():
+    """
+    a cancelled call (and the calls it has spawned) know that they have been cancelled
+    """
+    with app.test_request_context('/'):
+        cancelled = Event()
+
+        def sub_call():
+            cancelled.wait(1)
+            return parallel.is_cancelled()
+
+        def call():
+            return parallel.spawn(sub_call).result(1)
+
+        future = parallel.spawn(call)
+        future.cancel()
+        cancelled.set()
+        assert future.result(1)
+        assert not parallel.is_cancelled()
+
+
+def wait_for(predicate, timeout=1):
+    end = time.time() + timeout
+    while not predicate() and time.time() < end:
+        time.sleep(0.01)
+    return predicate()
+
+
+def executor_test():
+    """
+    an executor does not run more than max_workers calls at the same time
+    """
+    lock = Lock()
+    running = []
+    max_running = []
+
+    def call(i):
+        with lock:
+            running.append(i)
+            max_running.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(i)
+        return i
+
+    executor = parallel.Executor(max_workers=3)
+    futures = [executor.submit(call, i) for i in range(10)]
+    eq_([f.result(1) for f in futures], list(range(10)))
+    eq_(max(max_running), 3)
+    # the threads stop once there is nothing left to do
+    assert wait_for(lambda: executor._nb_workers == 0)
+
+
+def request_executor_test():
+    """
+    all the threads of a request share its executor
+    """
+    with mock.patch.dict(app.config, {'PARALLEL_MAX_WORKERS_BY_REQUEST': 4}):
+        with app.test_request_context('/'):
+            executor = parallel.request_executor()
+            eq_(executor.max_workers, 4)
+            assert parallel.spawn(parallel.request_executor).result(1) is executor
+        with app.test_request_context('/'):
+            assert parallel.request_executor() is not executor
@@ -0,0 +1,336 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from contextlib import contextmanager
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import kombu
+from navitiacommon import stat_pb2
+from jormungandr import app
+from jormungandr.tests import app_config
+from jormungandr import stat_manager
+from jormungandr.stat_manager import StatManager
+
+
+@contextmanager
+def memory_stat_manager(**config):
+    """
+    a StatManager publishing to an in-memory broker, the published messages can be read from the returned queue
+    """
+    exchange_name = 'stat_test_exchange'
+    with app_config(SAVE_STAT=True, BROKER_URL='memory://', EXCHANGE_NAME=exchange_name, **config):
+        connection = kombu.Connection('memory://')
+        stat_queue = kombu.Queue('stat_test', exchange=kombu.Exchange(exchange_name, type='direct'))
+        bound_queue = stat_queue(connection.default_channel)
+        bound_queue.declare()
+        try:
+            yield StatManager(), bound_queue
+        finally:
+            bound_queue.purge()
+            connection.release()
+
+
+def published_messages(bound_queue):
+    messages = []
+    while True:
+        message = bound_queue.get(no_ack=True)
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+def message_stats(message):
+    """
+    the stats of a message, a message of several stats has a stat_batch header
+    """
+    if not (message.headers or {}).get('stat_batch'):
+        return [message.body]
+    stats = list(stat_manager._read_spilled(io.BytesIO(message.body)))
+    assert len(stats) == message.headers['stat_batch']
+    return stats
+
+
+def published_durations(bound_queue):
+    durations = []
+    for message in published_messages(bound_queue):
+        for pbf in message_stats(message):
+            stat = stat_pb2.StatRequest()
+            stat.ParseFromString(pbf)
+            durations.append(stat.request_duration)
+    return durations
+
+
+def dead_pid():
+    dead_process = subprocess.Popen(['true'])
+    dead_process.wait()
+    return dead_process.pid
+
+
+def make_stat(duration):
+    stat = stat_pb2.StatRequest()
+    stat.request_duration = duration
+    return stat
+
+
+def wait_for(predicate, timeout=2):
+    end = time.time() + timeout
+    while not predicate() and time.time() < end:
+        time.sleep(0.01)
+    return predicate()
+
+
+def publish_in_background_test():
+    with memory_stat_manager() as (manager, bound_queue):
+        for duration in range(5):
+            manager.publish_request(make_stat(duration))
+        manager.flush()
+
+        assert published_durations(bound_queue) == list(range(5))
+        status = manager.status()
+        assert status['queued'] == 5
+        assert status['published'] == 5
+        assert status['dropped'] == 0
+        assert status['in_queue'] == 0
+
+
+def publish_one_message_by_stat_test():
+    with memory_stat_manager() as (manager, bound_queue):
+        for duration in range(3):
+            manager.publish_request(make_stat(duration))
+        manager.flush()
+
+        assert len(published_messages(bound_queue)) == 3
+
+
+def publish_by_batch_test():
+    """
+    the stats queued together are published in one message
+    """
+    with memory_stat_manager(STAT_BATCH_SIZE=10) as (manager, bound_queue):
+        start_publisher = manager._start_publisher
+        manager._start_publisher = lambda: None
+        for duration in range(5):
+            manager.publish_request(make_stat(duration))
+        start_publisher()
+        manager.flush()
+
+        messages = published_messages(bound_queue)
+        assert len(messages) == 1
+        assert messages[0].headers['stat_batch'] == 5
+        assert [make_stat(d).SerializeToString() for d in range(5)] == message_stats(messages[0])
+        assert manager.status()['published'] == 5
+
+
+def batch_size_test():
+    with memory_stat_manager(STAT_BATCH_SIZE=2, STAT_BATCH_TIMEOUT=0) as (manager, bound_queue):
+        for duration in range(5):
+            manager.queue.put_nowait(make_stat(duration).SerializeToString())
+        assert [len(manager._next_batch()) for _ in range(3)] == [2, 2, 1]
+
+
+def flush_at_exit_test():
+    with memory_stat_manager() as (manager, bound_queue):
+        manager._start_publisher = lambda: None
+        for duration in range(3):
+            manager.publish_request(make_stat(duration))
+        assert manager.status()['in_queue'] == 3
+
+        # without a spill directory, the queued stats are published before the exit
+        manager._flush_at_exit()
+
+        assert published_durations(bound_queue) == [0, 1, 2]
+        assert manager.status()['in_queue'] == 0
+
+
+def flush_at_exit_spill_test():
+    spill_dir = tempfile.mkdtemp()
+    try:
+        with memory_stat_manager(STAT_SPILL_DIR=spill_dir) as (manager, bound_queue):
+            manager._start_publisher = lambda: None
+            for duration in range(3):
+                manager.publish_request(make_stat(duration))
+
+            manager._flush_at_exit()
+
+            assert manager.status()['spilled'] == 3
+            assert published_durations(bound_queue) == []
+            # the process has exited, its stats are published by another one
+            os.rename(manager._spill_file(), manager._spill_file(dead_pid()))
+
+            other_manager = StatManager()
+            other_manager._replay_spilled()
+
+            assert published_durations(bound_queue) == [0, 1, 2]
+            assert os.listdir(spill_dir) == []
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+def exit_hook_test():
+    with memory_stat_manager() as (manager, bound_queue):
+        assert not manager.exit_hook_registered
+        manager.publish_request(make_stat(1))
+        manager.flush()
+        assert manager.exit_hook_registered
+
+
+def spill_of_alive_process_not_replayed_test():
+    spill_dir = tempfile.mkdtemp()
+    try:
+        with memory_stat_manager(STAT_SPILL_DIR=spill_dir) as (manager, bound_queue):
+            # the parent process is alive, it publishes its stats itself
+            with open(manager._spill_file(os.getppid()), 'wb'):
+                pass
+            assert manager._spill_files_to_replay() == []
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+def full_queue_drop_test():
+    with memory_stat_manager(STAT_QUEUE_SIZE=2) as (manager, bound_queue):
+        start_publisher = manager._start_publisher
+        manager._start_publisher = lambda: None
+        for duration in range(5):
+            manager.publish_request(make_stat(duration))
+
+        status = manager.status()
+        assert status['queued'] == 2
+        assert status['dropped'] == 3
+        assert status['in_queue'] == 2
+
+        start_publisher()
+        manager.flush()
+
+        assert published_durations(bound_queue) == [0, 1]
+        assert manager.status()['published'] == 2
+
+
+def full_queue_spill_test():
+    spill_dir = tempfile.mkdtemp()
+    try:
+        with memory_stat_manager(STAT_QUEUE_SIZE=2, STAT_SPILL_DIR=spill_dir) as (manager, bound_queue):
+            start_publisher = manager._start_publisher
+            manager._start_publisher = lambda: None
+            for duration in range(5):
+                manager.publish_request(make_stat(duration))
+
+            status = manager.status()
+            assert status['queued'] == 2
+            assert status['spilled'] == 3
+            assert status['dropped'] == 0
+
+            # once the queue is empty, the spilled stats are published
+            start_publisher()
+            assert wait_for(lambda: manager.status()['published'] == 5)
+
+            assert published_durations(bound_queue) == list(range(5))
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+def replay_failure_test():
+    """
+    the replay stops at the first failed publication, the stats not published are kept in the spill file
+    """
+    spill_dir = tempfile.mkdtemp()
+    try:
+        with memory_stat_manager(STAT_SPILL_DIR=spill_dir) as (manager, bound_queue):
+            manager._spill([make_stat(d).SerializeToString() for d in range(3)])
+            publish = manager._publish
+            calls = []
+
+            def failing_publish(body, headers=None):
+                calls.append(body)
+                if len(calls) == 2:
+                    raise Exception('broker is down')
+                publish(body, headers)
+            manager._publish = failing_publish
+
+            assert not manager._replay_spilled()
+            assert published_durations(bound_queue) == [0]
+            assert os.listdir(spill_dir) == [os.path.basename(manager._spill_file())]
+
+            manager._publish = publish
+            assert manager._replay_spilled()
+            assert published_durations(bound_queue) == [1, 2]
+            assert os.listdir(spill_dir) == []
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+def failed_publication_spilled_test():
+    """
+    with a spill directory, the stats that can't be published are kept on disk
+    """
+    spill_dir = tempfile.mkdtemp()
+    try:
+        with memory_stat_manager(STAT_SPILL_DIR=spill_dir) as (manager, bound_queue):
+            manager._publish = lambda body, headers=None: 1 / 0
+            manager._keep_unpublished([make_stat(1).SerializeToString()])
+            assert manager.status()['spilled'] == 1
+            assert manager.status()['failed'] == 0
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+def stale_replay_file_test():
+    """
+    a file left by a process that has exited while replaying it is replayed again
+    """
+    spill_dir = tempfile.mkdtemp()
+    try:
+        with memory_stat_manager(STAT_SPILL_DIR=spill_dir) as (manager, bound_queue):
+            manager._spill([make_stat(4).SerializeToString()])
+            pid = dead_pid()
+            os.rename(manager._spill_file(), '{}.replay_{}'.format(manager._spill_file(pid), pid))
+
+            assert manager._replay_spilled()
+            assert published_durations(bound_queue) == [4]
+            assert os.listdir(spill_dir) == []
+    finally:
+        shutil.rmtree(spill_dir)
+
+
+def replay_interval_test():
+    """
+    the spill directory is not listed at each empty queue
+    """
+    with memory_stat_manager(STAT_SPILL_DIR='/tmp', STAT_REPLAY_INTERVAL=60) as (manager, bound_queue):
+        replays = []
+        manager._replay_spilled = lambda: replays.append(1)
+        manager._replay_spilled_if_due()
+        manager._replay_spilled_if_due()
+        assert len(replays) == 1
@@ -0,0 +1,199 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from flask import Flask
+from nose.tools import eq_
+import time
+from jormungandr.two_tier_cache import TwoTierCache, LocalCache
+
+
+def make_cache(**config):
+    conf = {'CACHE_TYPE': 'simple', 'LOCAL_CACHE_SIZE': 10, 'TIMEOUT_LOCAL': 10}
+    conf.update(config)
+    return TwoTierCache(Flask(__name__), config=conf)
+
+
+class Counter(object):
+    def __init__(self):
+        self.nb_calls = 0
+
+    def __call__(self, a, b=0):
+        self.nb_calls += 1
+        return a + b
+
+
+def local_cache_lru_test():
+    """
+    the least recently used value is dropped when the cache is full
+    """
+    local_cache = LocalCache(max_size=2, timeout=10)
+    local_cache.set('a', 1)
+    local_cache.set('b', 2)
+    eq_(local_cache.get('a'), 1)
+    local_cache.set('c', 3)
+
+    eq_(local_cache.get('b'), None)
+    eq_(local_cache.get('a'), 1)
+    eq_(local_cache.get('c'), 3)
+    eq_(len(local_cache), 2)
+
+
+def local_cache_timeout_test():
+    local_cache = LocalCache(max_size=2, timeout=0.01)
+    local_cache.set('a', 1)
+    eq_(local_cache.get('a'), 1)
+    time.sleep(0.02)
+    eq_(local_cache.get('a'), None)
+
+
+def local_cache_copy_test():
+    """
+    each get returns its own copy of the value, modifying it does not change the cached value
+    """
+    local_cache = LocalCache(max_size=2, timeout=10)
+    local_cache.set('a', {'login': 'bob'})
+    value = local_cache.get('a')
+    value['login'] = 'alice'
+    eq_(local_cache.get('a'), {'login': 'bob'})
+    assert local_cache.get('a') is not local_cache.get('a')
+
+
+def local_cache_unpicklable_test():
+    """
+    a value that can't be pickled is not kept
+    """
+    local_cache = LocalCache(max_size=2, timeout=10)
+    local_cache.set('a', lambda: 1)
+    eq_(local_cache.get('a'), None)
+    eq_(len(local_cache), 0)
+
+
+def memoize_local_tier_test():
+    """
+    the second call is answered by the local tier, the backend is used when the local tier is cleared
+    """
+    cache = make_cache()
+    counter = Counter()
+
+    @cache.memoize(60)
+    def add(a, b=0):
+        return counter(a, b)
+
+    eq_(add(1, b=2), 3)
+    eq_(add(1, b=2), 3)
+    cache.clear_local()
+    eq_(add(1, b=2), 3)
+
+    eq_(counter.nb_calls, 1)
+    eq_(add.stats, {'local_hits': 1, 'backend_hits': 1, 'misses': 1})
+    status = cache.status()
+    eq_(status[__name__ + '.add']['local_size'], 1)
+
+
+def memoize_delete_test():
+    """
+    delete_memoized deletes the values from the two tiers
+    """
+    cache = make_cache()
+    counter = Counter()
+
+    @cache.memoize(60)
+    def add(a, b=0):
+        return counter(a, b)
+
+    add(1)
+    add(2)
+    cache.delete_memoized(add, 1)
+    add(1)
+    add(2)
+    eq_(counter.nb_calls, 3)
+
+    cache.delete_memoized(add)
+    add(1)
+    add(2)
+    eq_(counter.nb_calls, 5)
+
+
+def memoize_method_delete_test():
+    """
+    like in InstanceManager._clear_cache, the values of a method are deleted from the local tier
+    """
+    cache = make_cache()
+    counter = Counter()
+
+    class Adder(object):
+        @cache.memoize(60)
+        def add(self, a):
+            return counter(a)
+
+    adder = Adder()
+    adder.add(1)
+    adder.add(1)
+    eq_(counter.nb_calls, 1)
+    cache.delete_memoized(adder.add)
+    adder.add(1)
+    eq_(counter.nb_calls, 2)
+
+
+def memoize_unhashable_args_test():
+    """
+    the values with arguments that can't be a key of the local tier are only in the backend
+    """
+    cache = make_cache()
+    counter = Counter()
+
+    @cache.memoize(60)
+    def first(l):
+        return counter(l[0])
+
+    eq_(first([1]), 1)
+    eq_(first([1]), 1)
+    eq_(counter.nb_calls, 1)
+    eq_(first.stats, {'local_hits': 0, 'backend_hits': 1, 'misses': 1})
+
+
+def memoize_null_backend_test():
+    """
+    there is no local tier in front of the null backend: nothing is cached
+    """
+    cache = make_cache(CACHE_TYPE='null')
+    counter = Counter()
+
+    @cache.memoize(60)
+    def add(a, b=0):
+        return counter(a, b)
+
+    add(1)
+    add(1)
+    eq_(counter.nb_calls, 2)
+    eq_(add.local_cache, None)
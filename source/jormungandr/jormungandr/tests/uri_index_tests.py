@@ -0,0 +1,143 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Event
+import mock
+import zmq
+from nose.tools import eq_
+from jormungandr import app, uri_index
+from jormungandr.instance import Instance
+from jormungandr.uri_index import UriIndex, BloomFilter, build_uri_index
+
+
+def uri_index_by_type_test():
+    """
+    the prefix of the uri gives the filter to use, the uris of the types not indexed may be anywhere
+    """
+    index = UriIndex(42, {'stop_area': ['stop_area:A', 'stop_area:B'], 'line': ['line:1'], 'network': []})
+    assert index.may_contain('stop_area:A')
+    assert index.may_contain('stop_area:B')
+    assert index.may_contain('line:1')
+    assert not index.may_contain('stop_area:C')
+    assert not index.may_contain('line:A')
+    # the prefix is the type, a line uri is not looked for in the stop areas
+    assert not index.may_contain('line:stop_area:A')
+    # no network at all
+    assert not index.may_contain('network:N')
+    # not indexed types, coordinates, addresses
+    assert index.may_contain('stop_point:A')
+    assert index.may_contain('2.37;48.84')
+    assert index.may_contain('admin:fr:75056')
+    eq_(index.publication_date, 42)
+
+
+def bloom_filter_false_positive_test():
+    """
+    no false negative, and not much more false positives than asked
+    """
+    uris = ['stop_area:{}'.format(i) for i in range(10000)]
+    f = BloomFilter(uris, false_positive_rate=0.01)
+    assert all(uri in f for uri in uris)
+    false_positives = sum(1 for i in range(10000) if 'stop_area:other{}'.format(i) in f)
+    assert false_positives < 200
+
+
+class FakePtrefInstance(object):
+    """
+    answer the ptref requests of build_uri_index, page by page
+    """
+    def __init__(self, uris_by_field):
+        self.name = 'test'
+        self.uris_by_field = uris_by_field
+        self.requests = []
+
+    def send_and_receive(self, req, quiet=False):
+        field = uri_index.INDEXABLE_TYPES[{v[0]: k for k, v in uri_index.INDEXABLE_TYPES.items()}
+                                          [req.ptref.requested_type]][1]
+        self.requests.append((field, req.ptref.start_page))
+        uris = self.uris_by_field.get(field, [])
+        page = uris[req.ptref.start_page * req.ptref.count:(req.ptref.start_page + 1) * req.ptref.count]
+        resp = mock.MagicMock()
+        setattr(resp, field, [mock.MagicMock(uri=uri) for uri in page])
+        resp.pagination.total_result = len(uris)
+        return resp
+
+
+def build_uri_index_test():
+    instance = FakePtrefInstance({'stop_areas': ['stop_area:A', 'stop_area:B', 'stop_area:C'],
+                                  'lines': []})
+    with mock.patch.object(uri_index, 'PTREF_PAGE_SIZE', 2):
+        index = build_uri_index(instance, ['stop_area', 'line', 'bob'], 12)
+
+    eq_(index.publication_date, 12)
+    assert index.may_contain('stop_area:C')
+    assert not index.may_contain('stop_area:D')
+    assert not index.may_contain('line:1')
+    # the stop areas are fetched in 2 pages, there is only one page of lines and bob is not indexable
+    eq_(sorted(instance.requests), [('lines', 0), ('stop_areas', 0), ('stop_areas', 1)])
+
+
+def update_uri_index_in_background_test():
+    """
+    the index is built in another thread, and only once for a given publication date
+    """
+    instance = Instance(zmq.Context(), 'test', 'ipc:///tmp/uri_index_test')
+    instance.publication_date = 3
+    built_index = UriIndex(3, {'stop_area': ['stop_area:A']})
+    build_started = Event()
+    end_build = Event()
+
+    def build(instance, types, publication_date):
+        build_started.set()
+        end_build.wait(1)
+        return built_index
+
+    with mock.patch.dict(app.config, {'URI_INDEX_TYPES': ['stop_area']}), \
+            mock.patch.object(uri_index, 'build_uri_index', side_effect=build) as build_mock:
+        future = instance.update_uri_index()
+        build_started.wait(1)
+        # the index is being built, no other build is started and we cannot tell anything yet
+        assert instance.update_uri_index() is None
+        assert instance.may_have_id('stop_area:B')
+
+        end_build.set()
+        future.result(1)
+        eq_(build_mock.call_count, 1)
+        assert instance.uri_index is built_index
+        assert not instance.may_have_id('stop_area:B')
+
+        # the data did not change, nothing to build
+        assert instance.update_uri_index() is None
+
+        # new data, the old index is ignored until the new one is built
+        instance.publication_date = 4
+        assert instance.may_have_id('stop_area:B')
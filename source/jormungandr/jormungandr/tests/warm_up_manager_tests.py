@@ -0,0 +1,139 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+import tempfile
+import mock
+from nose.tools import eq_
+from jormungandr import app
+from jormungandr.tests import app_config
+from jormungandr.warm_up_manager import WarmUpManager, WARM_UP_ENVIRON_KEY
+
+
+class FakeInstance(object):
+    def __init__(self, name, failing=False):
+        self.name = name
+        self.failing = failing
+        self.nb_sockets = 0
+        self.scenario_loaded = False
+
+    def open_sockets(self, nb_sockets):
+        self.nb_sockets = nb_sockets
+
+    def load_scenario(self):
+        if self.failing:
+            raise Exception('no scenario')
+        self.scenario_loaded = True
+
+
+class FakeInstanceManager(object):
+    def __init__(self, instances):
+        self.instances = {i.name: i for i in instances}
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, headers, environ_base):
+        self.calls.append((url, headers, environ_base))
+        return mock.Mock(status_code=200)
+
+
+def disabled_warm_up_test():
+    """
+    without warm up the process is ready at once
+    """
+    with app_config(WARM_UP=False):
+        manager = WarmUpManager(FakeInstanceManager([FakeInstance('paris')]))
+        manager.start()
+        assert manager.is_ready()
+        eq_(manager.thread, None)
+
+
+def warm_up_test():
+    instances = [FakeInstance('paris'), FakeInstance('lima')]
+    client = FakeClient()
+    with tempfile.NamedTemporaryFile(suffix='.txt') as requests_file:
+        requests_file.write(b'/v1/coverage/paris/journeys?from=1;2&to=3;4\n\n/v1/coverage/lima/lines\n')
+        requests_file.flush()
+        with app_config(WARM_UP=True, WARM_UP_NB_SOCKETS=3, WARM_UP_REQUESTS_FILE=requests_file.name,
+                            WARM_UP_NB_REQUESTS=10, WARM_UP_TOKEN='my_token'), \
+                mock.patch.object(app, 'test_client', return_value=client):
+            manager = WarmUpManager(FakeInstanceManager(instances))
+            assert not manager.is_ready()
+            manager.start()
+            manager.thread.join(5)
+
+    assert manager.is_ready()
+    eq_([i.nb_sockets for i in instances], [3, 3])
+    assert all(i.scenario_loaded for i in instances)
+    eq_(sorted(url for url, _, _ in client.calls),
+        ['/v1/coverage/lima/lines', '/v1/coverage/paris/journeys?from=1;2&to=3;4'])
+    for _, headers, environ_base in client.calls:
+        eq_(headers, {'Authorization': 'my_token'})
+        eq_(environ_base, {WARM_UP_ENVIRON_KEY: True})
+    status = manager.status()
+    eq_(status['nb_replayed_requests'], 2)
+    eq_(status['nb_errors'], 0)
+
+
+def warm_up_error_test():
+    """
+    an instance failing to load does not prevent the process from being ready
+    """
+    instances = [FakeInstance('paris', failing=True), FakeInstance('lima')]
+    with app_config(WARM_UP=True, WARM_UP_REQUESTS_FILE=None):
+        manager = WarmUpManager(FakeInstanceManager(instances))
+        manager.run()
+
+    assert manager.is_ready()
+    assert instances[1].scenario_loaded
+    eq_(manager.status()['nb_errors'], 1)
+
+
+def warm_up_started_once_by_process_test():
+    """
+    the warm up is started once in each process: the thread of the parent process is not in the forked ones
+    """
+    with app_config(WARM_UP=True), mock.patch.object(WarmUpManager, 'run'), \
+            mock.patch('os.getpid', return_value=1):
+        manager = WarmUpManager(FakeInstanceManager([]))
+        manager.start()
+        first_thread = manager.thread
+        manager.start()
+        assert manager.thread is first_thread
+
+        with mock.patch('os.getpid', return_value=2):
+            manager.start()
+        assert manager.thread is not first_thread
+        eq_(manager.pid, 2)
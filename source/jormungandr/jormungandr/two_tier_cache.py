@@ -0,0 +1,251 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from collections import OrderedDict
+from threading import Lock
+import functools
+import logging
+import time
+from six.moves import cPickle as pickle
+from flask import current_app
+from flask.ext.cache import Cache
+
+# The memoized values are kept a few seconds in the memory of the process in front of the flask cache backend.
+# In production the backend is redis: without this tier each call of a hot memoized function (like the user of
+# a token) costs a network round trip.
+#
+# Like in the backend, the values are pickled: each call gets its own copy of the value and can modify it (the
+# user of a token is a SQLAlchemy object) without changing the value returned to the other threads.
+#
+# The local tier is not shared between the processes, so its timeout is short: a value deleted from the backend
+# can still be served by the other processes for TIMEOUT_LOCAL seconds.
+
+
+class LocalCache(object):
+    """
+    LRU cache of at most max_size values, each value expires timeout seconds after it has been set
+
+    the values are stored pickled, get returns a new copy of the value at each call
+    """
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.lock = Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        """
+        return the value of the key, None if it's not in the cache or has expired
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            pickled_value, expiration = entry
+            if expiration < time.time():
+                return None
+            # the most recently used values are at the end
+            self.entries[key] = entry
+        return pickle.loads(pickled_value)
+
+    def set(self, key, value):
+        """
+        store a copy of the value, the value is not stored if it can't be pickled
+        """
+        try:
+            pickled_value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError):
+            logging.getLogger(__name__).debug("value of %s not kept in the local cache", key, exc_info=True)
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (pickled_value, time.time() + self.timeout)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def _local_key(args, kwargs):
+    """
+    the arguments themselves are the key of the local tier, None if they can't be used as a key
+    """
+    key = (args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class TwoTierCache(Cache):
+    """
+    flask cache with a local tier for the memoized functions
+
+    the local tier is configured with LOCAL_CACHE_SIZE (number of values by function, 0 to deactivate it)
+    and TIMEOUT_LOCAL, it is never used in front of the null backend
+    """
+    def __init__(self, app=None, with_jinja2_ext=True, config=None):
+        self.local_size = 0
+        self.local_timeout = 10
+        self.stats_lock = Lock()
+        self.memoized = {}
+        super(TwoTierCache, self).__init__(app, with_jinja2_ext, config)
+
+    def init_app(self, app, config=None):
+        super(TwoTierCache, self).init_app(app, config)
+        local_config = dict(self.config or {})
+        local_config.update(config or {})
+        if local_config.get('CACHE_TYPE', 'null') != 'null':
+            self.local_size = local_config.get('LOCAL_CACHE_SIZE', 1000)
+        self.local_timeout = local_config.get('TIMEOUT_LOCAL', 10)
+
+    def _count(self, stats, stat):
+        with self.stats_lock:
+            stats[stat] += 1
+
+    def memoize(self, timeout=None, make_name=None, unless=None):
+        """
+        same as flask cache's memoize, the values are first searched in the local tier
+
+        like in the backend, a None value is not cached
+        """
+        def memoize(f):
+            local_cache = None
+            if self.local_size:
+                local_timeout = min(self.local_timeout, timeout) if timeout else self.local_timeout
+                local_cache = LocalCache(self.local_size, local_timeout)
+            stats = {'local_hits': 0, 'backend_hits': 0, 'misses': 0}
+
+            @functools.wraps(f)
+            def decorated_function(*args, **kwargs):
+                if callable(unless) and unless() is True:
+                    return f(*args, **kwargs)
+
+                local_key = _local_key(args, kwargs) if local_cache is not None else None
+                if local_key is not None:
+                    rv = local_cache.get(local_key)
+                    if rv is not None:
+                        self._count(stats, 'local_hits')
+                        return rv
+
+                try:
+                    cache_key = decorated_function.make_cache_key(f, *args, **kwargs)
+                    rv = self.cache.get(cache_key)
+                except Exception:
+                    if current_app.debug:
+                        raise
+                    logging.getLogger(__name__).exception("Exception possibly due to cache backend.")
+                    self._count(stats, 'misses')
+                    return f(*args, **kwargs)
+
+                if rv is None:
+                    self._count(stats, 'misses')
+                    rv = f(*args, **kwargs)
+                    try:
+                        self.cache.set(cache_key, rv, timeout=decorated_function.cache_timeout)
+                    except Exception:
+                        if current_app.debug:
+                            raise
+                        logging.getLogger(__name__).exception("Exception possibly due to cache backend.")
+                else:
+                    self._count(stats, 'backend_hits')
+
+                if local_key is not None and rv is not None:
+                    local_cache.set(local_key, rv)
+                return rv
+
+            decorated_function.uncached = f
+            decorated_function.cache_timeout = timeout
+            decorated_function.make_cache_key = self._memoize_make_cache_key(make_name, decorated_function)
+            decorated_function.delete_memoized = lambda: self.delete_memoized(f)
+            decorated_function.local_cache = local_cache
+            decorated_function.stats = stats
+            self.memoized['{}.{}'.format(f.__module__, f.__name__)] = decorated_function
+            return decorated_function
+        return memoize
+
+    def delete_memoized(self, f, *args, **kwargs):
+        """
+        delete the values of the function from the backend and from the local tier of the process
+        """
+        self.delete_local_memoized(f, *args, **kwargs)
+        super(TwoTierCache, self).delete_memoized(f, *args, **kwargs)
+
+    def delete_local_memoized(self, f, *args, **kwargs):
+        """
+        delete the values of the function from the local tier of the process only
+
+        for a method all the instances' values are deleted, the other instances will only have to get
+        their values from the backend
+        """
+        local_cache = getattr(f, 'local_cache', None)
+        if local_cache is None:
+            return
+        if not args and not kwargs:
+            local_cache.clear()
+            return
+        if getattr(f, 'im_self', None) is not None:
+            args = (f.im_self,) + args
+        local_key = _local_key(args, kwargs)
+        if local_key is not None:
+            local_cache.delete(local_key)
+
+    def clear_local(self):
+        """
+        delete all the values of the local tier of the process
+        """
+        for f in self.memoized.values():
+            if f.local_cache is not None:
+                f.local_cache.clear()
+
+    def status(self):
+        """
+        hits and misses of the memoized functions in this process
+        """
+        status = {}
+        with self.stats_lock:
+            for name, f in self.memoized.items():
+                status[name] = dict(f.stats)
+        for name, f in self.memoized.items():
+            status[name]['local_size'] = len(f.local_cache) if f.local_cache is not None else None
+        return status
@@ -0,0 +1,156 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from datetime import datetime
+import hashlib
+import logging
+import math
+import struct
+from navitiacommon import request_pb2, type_pb2
+from jormungandr.utils import date_to_timestamp
+
+# for each indexable type: the prefix of its uris, the ptref type to request it and the field of the response
+INDEXABLE_TYPES = {
+    'stop_area': (type_pb2.STOP_AREA, 'stop_areas'),
+    'stop_point': (type_pb2.STOP_POINT, 'stop_points'),
+    'line': (type_pb2.LINE, 'lines'),
+    'route': (type_pb2.ROUTE, 'routes'),
+    'network': (type_pb2.NETWORK, 'networks'),
+    'company': (type_pb2.COMPANY, 'companies'),
+    'commercial_mode': (type_pb2.COMMERCIAL_MODE, 'commercial_modes'),
+    'physical_mode': (type_pb2.PHYSICAL_MODE, 'physical_modes'),
+}
+
+PTREF_PAGE_SIZE = 10000
+
+
+class BloomFilter(object):
+    """
+    Probabilistic set: an element that has been added is always found,
+    an element that has not been added is found with a probability of false_positive_rate
+
+    >>> f = BloomFilter(["stop_area:A", "stop_area:B"])
+    >>> "stop_area:A" in f
+    True
+    >>> "stop_area:C" in f
+    False
+    >>> "stop_area:C" in BloomFilter([])
+    False
+    """
+    def __init__(self, elements, false_positive_rate=0.01):
+        elements = list(elements)
+        n = max(len(elements), 1)
+        # classic optimal sizes for n elements
+        self.nb_bits = int(math.ceil(-n * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.nb_hashes = max(int(round(self.nb_bits / n * math.log(2))), 1)
+        self.bits = bytearray((self.nb_bits + 7) // 8)
+        for e in elements:
+            for pos in self._positions(e):
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def _positions(self, element):
+        # double hashing, the k positions are h1 + i * h2
+        h1, h2 = struct.unpack(b'<QQ', hashlib.md5(element.encode('utf-8')).digest())
+        return ((h1 + i * h2) % self.nb_bits for i in range(self.nb_hashes))
+
+    def __contains__(self, element):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(element))
+
+
+class UriIndex(object):
+    """
+    Index of the uris of the objects of an instance, by type
+
+    the prefix of an uri gives its type, an uri of an indexed type that is not
+    in the index surely does not belong to the instance.
+    For the other uris we cannot say anything locally
+
+    >>> index = UriIndex(42, {'stop_area': ['stop_area:A'], 'line': ['line:1']})
+    >>> index.may_contain('stop_area:A')
+    True
+    >>> index.may_contain('stop_area:B')
+    False
+    >>> index.may_contain('line:2')
+    False
+    >>> index.may_contain('stop_point:A')  # not indexed, we cannot know
+    True
+    >>> index.may_contain('8.98312e-05;8.98312e-05')
+    True
+    """
+    def __init__(self, publication_date, uris_by_type):
+        self.publication_date = publication_date
+        self.filters = {t: BloomFilter(uris) for t, uris in uris_by_type.items()}
+
+    def may_contain(self, uri):
+        prefix = uri.split(':', 1)[0]
+        f = self.filters.get(prefix)
+        if f is None:
+            return True
+        return uri in f
+
+
+def _get_all_uris(instance, pb_type, field):
+    uris = []
+    start_page = 0
+    while True:
+        req = request_pb2.Request()
+        req.requested_api = type_pb2.PTREFERENTIAL
+        req._current_datetime = date_to_timestamp(datetime.utcnow())
+        req.ptref.requested_type = pb_type
+        req.ptref.depth = 0
+        req.ptref.start_page = start_page
+        req.ptref.count = PTREF_PAGE_SIZE
+        resp = instance.send_and_receive(req, quiet=True)
+        objects = getattr(resp, field)
+        uris.extend(o.uri for o in objects)
+        if not objects or len(uris) >= resp.pagination.total_result:
+            return uris
+        start_page += 1
+
+
+def build_uri_index(instance, types, publication_date):
+    """
+    fetch the uris of all the objects of the given types of an instance
+
+    the publication date is the one of the data at the beginning of the fetch
+    """
+    logger = logging.getLogger(__name__)
+    uris_by_type = {}
+    for t in types:
+        if t not in INDEXABLE_TYPES:
+            logger.warn('impossible to index the uris of type {}'.format(t))
+            continue
+        pb_type, field = INDEXABLE_TYPES[t]
+        uris_by_type[t] = _get_all_uris(instance, pb_type, field)
+    logger.info('uris of {} indexed: {}'.format(instance.name,
+                                                {t: len(u) for t, u in uris_by_type.items()}))
+    return UriIndex(publication_date, uris_by_type)
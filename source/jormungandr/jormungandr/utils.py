@@ -223,11 +223,39 @@ def reverse_enumerate(l):
     return zip(range(len(l)-1, -1, -1), reversed(l))
 
 
-def pb_del_if(l, pred):
+def pb_del_if(l, pred, bulk=False):
     '''
     Delete the elements such as pred(e) is true in a protobuf list.
     Return the number of elements deleted.
+
+    Each deletion shifts all the following elements of the list, so deleting lots of elements
+    from a long list is quadratic.
+    With bulk=True, the elements to keep are collected in one pass and the list is rebuilt once.
+    The kept elements are then copied back in the list: the references to elements of the list taken
+    before the call are not in the list anymore, so only use it when no one holds such references.
+
+    >>> response = response_pb2.Response()
+    >>> for d in range(6):
+    ...     _ = response.journeys.add(duration=d)
+    >>> pb_del_if(response.journeys, lambda j: j.duration % 2 == 0)
+    3
+    >>> [j.duration for j in response.journeys]
+    [1, 3, 5]
+    >>> pb_del_if(response.journeys, lambda j: j.duration == 3, bulk=True)
+    1
+    >>> [j.duration for j in response.journeys]
+    [1, 5]
+    >>> pb_del_if(response.journeys, lambda j: j.duration == 3, bulk=True)
+    0
     '''
+    if bulk:
+        kept = [e for e in l if not pred(e)]
+        nb = len(l) - len(kept)
+        if nb:
+            del l[:]
+            l.extend(kept)
+        return nb
+
     nb = 0
     for i, e in reverse_enumerate(l):
         if pred(e):
@@ -0,0 +1,168 @@
+# coding=utf-8
+
+# Copyright (c) 2001-2016, Canal TP and/or its affiliates. All rights reserved.
+#
+# This file is part of Navitia,
+#     the software to build cool stuff with public transport.
+#
+# Hope you'll enjoy and contribute to this project,
+#     powered by Canal TP (www.canaltp.fr).
+# Help us simplify mobility and open public transport:
+#     a non ending quest to the responsive locomotion way of traveling!
+#
+# LICENCE: This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+# Stay tuned using
+# twitter @navitia
+# IRC #navitia on freenode
+# https://groups.google.com/d/forum/navitia
+# www.navitia.io
+
+
+from __future__ import absolute_import, print_function, unicode_literals, division
+from threading import Thread, Event, Lock
+import io
+import logging
+import os
+import random
+import time
+from jormungandr import app
+
+# environ key of the requests replayed by the warm up, they are answered before the process is ready
+# and they are not real requests: no stat is saved for them
+WARM_UP_ENVIRON_KEY = 'navitia.warm_up'
+
+
+def is_warm_up_request(request):
+    return bool(request.environ.get(WARM_UP_ENVIRON_KEY))
+
+
+class WarmUpManager(object):
+    """
+    prepare the process before its first requests, in a background thread:
+     - open WARM_UP_NB_SOCKETS sockets by instance
+     - load the models of the instances and their scenarios
+     - replay WARM_UP_NB_REQUESTS requests of WARM_UP_REQUESTS_FILE (one url by line) to fill the caches
+
+    the process is only ready once the warm up is done
+    """
+    def __init__(self, instance_manager):
+        self.instance_manager = instance_manager
+        self.enabled = app.config.get('WARM_UP', False)
+        self.done = Event()
+        self.duration = None
+        self.nb_errors = 0
+        self.nb_replayed_requests = 0
+        self.thread = None
+        # pid of the process where the warm up has been started
+        self.pid = None
+        self.lock = Lock()
+        if not self.enabled:
+            self.done.set()
+
+    def start(self):
+        """
+        start the warm up once by process
+
+        the thread and the sockets are not inherited by the processes forked by uwsgi, so this must not be
+        called at import: it's called after the fork by uwsgi, or else by the first request of the process
+        """
+        if not self.enabled or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.thread = Thread(target=self.run, name='warm_up')
+            # daemon thread does'nt block the exit of a process
+            self.thread.daemon = True
+            self.thread.start()
+
+    def is_ready(self):
+        return self.done.is_set()
+
+    def run(self):
+        """
+        a failing step does not stop the warm up, we don't want an instance to prevent the process from starting
+        """
+        logger = logging.getLogger(__name__)
+        logger.info('beginning of the warm up')
+        start = time.time()
+        try:
+            with app.app_context():
+                for step in (self.open_sockets, self.load_instances, self.replay_requests):
+                    try:
+                        step()
+                    except Exception:
+                        self.nb_errors += 1
+                        logger.exception('error during the warm up')
+        finally:
+            self.duration = time.time() - start
+            self.done.set()
+        logger.info('end of the warm up in %.2fs', self.duration)
+
+    def open_sockets(self):
+        nb_sockets = app.config.get('WARM_UP_NB_SOCKETS', 1)
+        for instance in self.instance_manager.instances.values():
+            instance.open_sockets(nb_sockets)
+
+    def load_instances(self):
+        """
+        load the models of the instances (their parameters) and import their scenarios
+        """
+        for instance in self.instance_manager.instances.values():
+            try:
+                instance.load_scenario()
+            except Exception:
+                self.nb_errors += 1
+                logging.getLogger(__name__).exception('impossible to load the scenario of %s', instance.name)
+
+    def _get_sample_urls(self):
+        requests_file = app.config.get('WARM_UP_REQUESTS_FILE')
+        if not requests_file:
+            return []
+        with io.open(requests_file, encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip()]
+        nb_requests = min(app.config.get('WARM_UP_NB_REQUESTS', 50), len(urls))
+        return random.sample(urls, nb_requests)
+
+    def replay_requests(self):
+        """
+        the requests are answered by the application, the same way as the real ones
+        """
+        urls = self._get_sample_urls()
+        if not urls:
+            return
+        headers = {}
+        if app.config.get('WARM_UP_TOKEN'):
+            headers['Authorization'] = app.config['WARM_UP_TOKEN']
+        client = app.test_client()
+        logger = logging.getLogger(__name__)
+        for url in urls:
+            try:
+                resp = client.get(url, headers=headers, environ_base={WARM_UP_ENVIRON_KEY: True})
+                logger.debug('warm up request %s: %s', url, resp.status_code)
+                self.nb_replayed_requests += 1
+            except Exception:
+                self.nb_errors += 1
+                logger.exception('error on the warm up request %s', url)
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'ready': self.is_ready(),
+            'duration': self.duration,
+            'nb_errors': self.nb_errors,
+            'nb_replayed_requests': self.nb_replayed_requests,
+        }
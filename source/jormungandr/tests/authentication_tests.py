@@ -105,6 +105,13 @@ class FakeUser:
         """
         return authorizations[self.login][instance_name][api_name]
 
+    def authorized_apis(self):
+        """
+        the authorized apis of the user, indexed by instance name
+        """
+        return {instance_name: {api_name for api_name, authorized in apis.items() if authorized}
+                for instance_name, apis in authorizations[self.login].items()}
+
     def is_blocked(self, datetime_utc):
         """
         Return True if user is blocked else False
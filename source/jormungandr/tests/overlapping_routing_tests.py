@@ -164,3 +164,32 @@ class TestOverlappingCoverage(AbstractTestFixture):
         response, error_code = self.query_no_assert("/v1/coord/-0.9;-0.9", display=True)
         assert error_code == 404
         assert set(response['regions']) == {"empty_routing_test", "main_routing_test"}
+
+
+@dataset({"main_routing_test": {}, "empty_routing_test": {}})
+class TestOverlappingCoverageSpeculative(TestOverlappingCoverage):
+    """
+    Same tests, but with the regions computed at the same time,
+    the chosen response must be the same as when the regions are computed one after the other
+    """
+    def setup(self):
+        TestOverlappingCoverage.setup(self)
+        from jormungandr import app
+        self.old_nb_speculative_regions = app.config.get('JOURNEYS_SPECULATIVE_REGIONS_NB', 1)
+        app.config['JOURNEYS_SPECULATIVE_REGIONS_NB'] = 2
+
+    def teardown(self):
+        TestOverlappingCoverage.teardown(self)
+        from jormungandr import app
+        app.config['JOURNEYS_SPECULATIVE_REGIONS_NB'] = self.old_nb_speculative_regions
+
+    def test_journeys_speculation_debug(self):
+        """
+        the empty region is chosen first but cannot answer, the speculative computation of
+        the main region has been useful
+        """
+        debug_query = "/v1/{q}&debug=true".format(q=journey_basic_query)
+        response = self.query(debug_query)
+        self.is_valid_journey_response(response, debug_query)
+        assert response['debug']['regions_called'] == ['empty_routing_test', 'main_routing_test']
+        assert response['debug']['speculative_regions'] == {'paid_off': True, 'wasted_calls': 0}
@@ -34,6 +34,7 @@ from .tests_mechanism import AbstractTestFixture, dataset
 from jormungandr.realtime_schedule import realtime_proxy, realtime_proxy_manager
 from jormungandr.schedule import RealTimePassage
 import datetime
+import time
 from nose.tools import eq_
 import pytz
 from .check_utils import is_valid_stop_date_time, get_not_null
@@ -227,3 +228,58 @@ class TestDeparturesWithAnotherSource(AbstractTestFixture):
 
         for dt in stop_schedules:
             assert dt['data_freshness'] == 'realtime'
+
+
+MOCKED_SLOW_PROXY_CONF = (' [{"id": "KisioDigital",\n'
+                          ' "class": "tests.proxy_realtime_tests.MockedSlowTestProxy",\n'
+                          ' "args": { } }]')
+
+
+class MockedSlowTestProxy(MockedTestProxy):
+    """
+    proxy taking too long to answer for the route K
+    """
+    def next_passage_for_route_point(self, route_point):
+        if route_point.pb_stop_point.uri == "S42" and route_point.pb_route.name == "K":
+            time.sleep(1)
+        return super(MockedSlowTestProxy, self).next_passage_for_route_point(route_point)
+
+
+@dataset({"basic_schedule_test": {"proxy_conf": MOCKED_SLOW_PROXY_CONF}})
+class TestDeparturesWithSlowProxy(AbstractTestFixture):
+
+    def setup(self):
+        from jormungandr import app
+        self.old_timeout = app.config.get('REALTIME_PROXIES_TIMEOUT', 5)
+        app.config['REALTIME_PROXIES_TIMEOUT'] = 0.2
+
+    def teardown(self):
+        from jormungandr import app
+        app.config['REALTIME_PROXIES_TIMEOUT'] = self.old_timeout
+
+    def test_departures_proxy_timeout(self):
+        """
+        the proxy does not answer in time for the route K, its departures are in base schedule
+        and the timeout is in the debug
+        """
+        query = 'stop_areas/S42/departures?from_datetime=20160102T1000&show_codes=true&count=7'
+        response = self.query_region(query)
+
+        freshness_by_route = {}
+        for d in response['departures']:
+            freshness_by_route.setdefault(d['route']['name'], set()).add(d['stop_date_time']['data_freshness'])
+        eq_(freshness_by_route['J'], {'realtime'})
+        eq_(freshness_by_route['K'], {'base_schedule'})
+        eq_(freshness_by_route['L'], {'base_schedule'})
+
+        eq_(response['debug']['realtime_proxies_timeouts'], 1)
+
+    def test_stop_schedule_no_timeout(self):
+        """
+        the proxy answers in time for C:S0, nothing in the debug
+        """
+        query = 'stop_points/C:S0/stop_schedules?from_datetime=20160102T1100&show_codes=true'
+        response = self.query_region(query)
+        stop_schedules = response['stop_schedules'][0]['date_times']
+        assert ["20160102T113242", "20160102T114242"] == [dt["date_time"] for dt in stop_schedules]
+        assert 'debug' not in response
@@ -34,8 +34,6 @@ import subprocess
 import os
 import select
 import re
-import fcntl
-import errno
 
 
 class LogLine(object):
@@ -55,35 +53,82 @@ class LogLine(object):
         else:
             self.msg = line
 
-def parse_log(buff):
-    logs = []
-    line, sep, buff = buff.partition('\n')
-    while sep and buff:
-        logs.append(LogLine(line))
-        line, sep, buff = buff.partition('\n')
-    if not sep:
-        buff = line#we put back the last unterminated line in the buffer
-    return (logs, buff)
 
+# the binaries log the duration of their steps at the end, each one on a line beginning by a tabulation,
+# like "\t File reading: 1234ms". The other lines are not durations of steps, even if they end by a duration
+STEP_DURATION_REGEXP = re.compile(r'^\t\s*(?P<step>\D.*?)\s*:?\s*(?P<duration>\d+)\s*ms$')
 
-#from: http://stackoverflow.com/questions/7729336/how-can-i-print-and-display-subprocess-stdout-and-stderr-output-without-distorti/7730201#7730201
-def make_async(fd):
-    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
 
+def parse_step_duration(msg):
+    """
+    return the name and the duration (in ms) of the step logged by the message, None if it's not a step duration
 
-# Helper function to read some data from a file descriptor, ignoring EAGAIN errors
-# (those errors mean that there are no data available for the moment)
-def read_async(fd):
-    try:
-        return fd.read()
-    except IOError, e:
-        if e.errno != errno.EAGAIN:
-            raise e
-        else:
-            return ''
+    >>> parse_step_duration('\\t File reading: 1234ms')
+    ('File reading', 1234)
+    >>> parse_step_duration('\\t lecture des fichiers 56ms')
+    ('lecture des fichiers', 56)
+    >>> parse_step_duration('stoppoint: 1234')
+    >>> parse_step_duration('connection timeout after 500ms')
+    """
+    match = STEP_DURATION_REGEXP.match(msg.rstrip())
+    if not match:
+        return None
+    return match.group('step'), int(match.group('duration'))
+
+
+class LineReader(object):
+    """
+    read the lines of a pipe as they are written
+
+    the data of the unterminated last line is kept between the reads, only the new data is searched for
+    the end of the line
+    """
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.partial_line = []
+        self.eof = False
+
+    def fileno(self):
+        return self.pipe.fileno()
+
+    def read_lines(self):
+        """
+        read the available data (the pipe must be readable) and return the complete lines read
+
+        at the end of the pipe the last line is returned even if it's not terminated
+        """
+        data = os.read(self.pipe.fileno(), 64 * 1024)
+        if not data:
+            self.eof = True
+            last_line = ''.join(self.partial_line)
+            self.partial_line = []
+            return [last_line] if last_line else []
+
+        end = data.rfind('\n')
+        if end < 0:
+            self.partial_line.append(data)
+            return []
+        self.partial_line.append(data[:end])
+        lines = ''.join(self.partial_line).split('\n')
+        self.partial_line = [data[end + 1:]]
+        return lines
+
+
+def forward_logs(lines, logger, steps=None):
+    for line in lines:
+        log = LogLine(line)
+        logger.log(log.level, log.msg)
+        if steps is not None:
+            step = parse_step_duration(log.msg)
+            if step:
+                steps.append(step)
+
+
+def launch_exec(exec_name, args, logger, steps=None):
+    """ Launch an exec with args, log the outputs
 
-def launch_exec(exec_name, args, logger):
-    """ Launch an exec with args, log the outputs """
+    if steps is a list, the name and duration (in ms) of the steps logged by the exec are appended to it
+    """
     log = 'Launching ' + exec_name + ' ' + ' '.join(args)
     #we hide the password in logs
     logger.info(re.sub('password=\w+', 'password=xxxxxxxxx', log))
@@ -95,21 +140,15 @@ def launch_exec(exec_name, args, logger):
                             stdout=subprocess.PIPE,
                             close_fds=True)
     try:
-        make_async(proc.stderr)
-        make_async(proc.stdout)
-        while True:
-            select.select([proc.stdout, proc.stderr], [], [])
-
-            for pipe in proc.stdout, proc.stderr:
-                log_pipe = read_async(pipe)
-                logs, line = parse_log(log_pipe)
-                for l in logs:
-                    logger.log(l.level, l.msg)
-
-            if proc.poll() is not None:
-                break
+        # we read the pipes until their end, the last logs written before the exit are not lost
+        readers = [LineReader(proc.stdout), LineReader(proc.stderr)]
+        while readers:
+            readable, _, _ = select.select(readers, [], [])
+            for reader in readable:
+                forward_logs(reader.read_lines(), logger, steps)
+            readers = [r for r in readers if not r.eof]
     finally:
         proc.stdout.close()
         proc.stderr.close()
 
-    return proc.returncode
+    return proc.wait()
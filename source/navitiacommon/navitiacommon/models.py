@@ -176,6 +176,18 @@ class User(db.Model):
 
         return query.count() > 0
 
+    def authorized_apis(self):
+        """
+        return the authorizations of the user in one query:
+        for each instance name, the set of the names of the apis the user can use
+        """
+        query = db.session.query(Instance.name, Api.name).select_from(Authorization).join(Instance, Api)\
+            .filter(Authorization.user_id == self.id)
+        res = {}
+        for instance_name, api_name in query:
+            res.setdefault(instance_name, set()).add(api_name)
+        return res
+
     def is_blocked(self, datetime_utc):
         if self.block_until and datetime_utc <= self.block_until:
             return True
@@ -325,6 +337,19 @@ class Instance(db.Model):
             result += data_sets
         return result
 
+    def last_datasets_of_family(self, family_type):
+        """
+        return the datasets of the family type of the last job (whatever its state) that loaded this family type
+        """
+        last_job = db.session.query(Job) \
+            .join(DataSet) \
+            .filter(Job.instance_id == self.id, DataSet.family_type == family_type) \
+            .order_by(Job.created_at.desc()) \
+            .first()
+        if not last_job:
+            return []
+        return last_job.data_sets.filter(DataSet.family_type == family_type).all()
+
     @classmethod
     def get_by_name(cls, name):
         res = cls.query.filter_by(name=name).first()
@@ -445,9 +470,11 @@ class Metric(db.Model):
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False)
 
     type = db.Column(db.Enum('ed2nav', 'fusio2ed', 'gtfs2ed', 'osm2ed', 'geopal2ed', 'synonym2ed', 'poi2ed',
-                             name='metric_type'), nullable=False)
+                             'fare2ed', 'shape2ed', name='metric_type'), nullable=False)
     dataset_id = db.Column(db.Integer, db.ForeignKey('data_set.id'), nullable=True)
     duration = db.Column(INTERVAL)
+    # name of the step of the task, None for the whole task
+    step = db.Column(db.Text, nullable=True)
 
     dataset = db.relationship('DataSet', lazy='joined')
 
@@ -464,6 +491,9 @@ class DataSet(db.Model):
 
     uid = db.Column(UUID, unique=True)
 
+    # sha1 of the content of the data, to detect the data already loaded
+    content_hash = db.Column(db.Text, nullable=True)
+
     job_id = db.Column(db.Integer, db.ForeignKey('job.id'))
 
     def __init__(self):
@@ -30,6 +30,7 @@
 import zipfile
 import os
 import glob
+import hashlib
 
 street_source_types = ['OSM']
 address_source_types = ['BANO', 'OSM']
@@ -104,6 +105,25 @@ def type_of_data(filename):
     return None, None
 
 
+def content_hash(path):
+    """
+    return the sha1 of the content of a file,
+    or of the content and the relative path of all the files of a directory
+    """
+    sha1 = hashlib.sha1()
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+    for filename in files:
+        if filename != path:
+            sha1.update(os.path.relpath(filename, path).encode('utf-8'))
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(chunk)
+    return sha1.hexdigest()
+
+
 def family_of_data(type):
     """
     return the family type of a data type
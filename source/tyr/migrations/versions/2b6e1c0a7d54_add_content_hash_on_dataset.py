@@ -0,0 +1,22 @@
+"""add the hash of the content of a dataset
+
+Revision ID: 2b6e1c0a7d54
+Revises: 4c8d2f1a9b3e
+Create Date: 2016-05-20 10:12:45.103287
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2b6e1c0a7d54'
+down_revision = '4c8d2f1a9b3e'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('data_set', sa.Column('content_hash', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('data_set', 'content_hash')
@@ -0,0 +1,34 @@
+"""add the fare2ed and shape2ed metrics
+
+Revision ID: 4c8d2f1a9b3e
+Revises: 596a1d3d5157
+Create Date: 2016-05-18 14:32:11.421563
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4c8d2f1a9b3e'
+down_revision = '596a1d3d5157'
+
+from alembic import op
+import sqlalchemy as sa
+
+previous_types = ('ed2nav', 'fusio2ed', 'gtfs2ed', 'osm2ed', 'geopal2ed', 'synonym2ed', 'poi2ed')
+new_types = previous_types + ('fare2ed', 'shape2ed')
+
+
+def change_metric_type(types):
+    # a value cannot be added to an enum in a transaction, we replace the enum
+    op.execute('ALTER TYPE metric_type RENAME TO metric_type_old')
+    sa.Enum(*types, name='metric_type').create(op.get_bind())
+    op.execute('ALTER TABLE metric ALTER COLUMN type TYPE metric_type USING type::text::metric_type')
+    op.execute('DROP TYPE metric_type_old')
+
+
+def upgrade():
+    change_metric_type(new_types)
+
+
+def downgrade():
+    op.execute("DELETE FROM metric WHERE type IN ('fare2ed', 'shape2ed')")
+    change_metric_type(previous_types)
@@ -0,0 +1,22 @@
+"""add the step of a task on the metrics
+
+Revision ID: 5a3f9c7e2d81
+Revises: 2b6e1c0a7d54
+Create Date: 2016-05-24 16:05:38.907215
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5a3f9c7e2d81'
+down_revision = '2b6e1c0a7d54'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('metric', sa.Column('step', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('metric', 'step')
@@ -0,0 +1,38 @@
+from celery import chord
+from tyr.binarisation import lock_names, ED_TABLES_GROUP_BY_LOADER
+from tyr.tasks import make_import_dag, finish_job
+
+
+def test_lock_names():
+    """
+    the loaders of different groups of ed tables don't share a lock, ed2nav locks all the groups
+    """
+    assert lock_names('fr', 'fusio2ed') == ['tyr.lock|fr|pt']
+    assert lock_names('fr', 'osm2ed') == ['tyr.lock|fr|georef']
+    assert lock_names('fr', 'ed2nav') == ['tyr.lock|fr|{}'.format(g)
+                                          for g in sorted(set(ED_TABLES_GROUP_BY_LOADER.values()))]
+
+
+def test_import_dag_one_group():
+    """
+    with only one group of ed tables everything is done in sequence
+    """
+    fusio, fare, binarisation = finish_job.si(1), finish_job.si(2), finish_job.si(3)
+    actions = make_import_dag([[fusio, fare]], binarisation)
+
+    assert len(actions) == 2
+    assert list(actions[0].tasks) == [fusio, fare]
+    assert actions[1] == binarisation
+
+
+def test_import_dag_several_groups():
+    """
+    the groups of ed tables are loaded at the same time before the binarisation
+    """
+    fusio, fare, osm, binarisation = finish_job.si(1), finish_job.si(2), finish_job.si(3), finish_job.si(4)
+    actions = make_import_dag([[fusio, fare], [osm]], binarisation)
+
+    assert len(actions) == 1
+    assert isinstance(actions[0], chord)
+    assert [list(c.tasks) for c in actions[0].tasks] == [[fusio, fare], [osm]]
+    assert actions[0].body == binarisation
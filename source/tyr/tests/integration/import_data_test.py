@@ -0,0 +1,90 @@
+import os
+from navitiacommon import models, utils
+from tyr import app
+from tyr.tasks import unchanged_family_types
+
+
+def create_job(instance, state, datasets):
+    job = models.Job()
+    job.instance = instance
+    job.state = state
+    for type, content_hash in datasets:
+        dataset = models.DataSet()
+        dataset.type = type
+        dataset.family_type = utils.family_of_data(type)
+        dataset.name = '/tmp/{}'.format(type)
+        dataset.content_hash = content_hash
+        job.data_sets.append(dataset)
+    models.db.session.add(job)
+    models.db.session.commit()
+
+
+def new_dataset(type, content_hash):
+    dataset = models.DataSet()
+    dataset.type = type
+    dataset.family_type = utils.family_of_data(type)
+    dataset.content_hash = content_hash
+    return dataset
+
+
+def test_unchanged_family_types():
+    """
+    a family of data is unchanged if its datasets are the same as the ones of the last job that loaded it
+    """
+    with app.app_context():
+        instance = models.Instance('fr')
+        models.db.session.add(instance)
+        models.db.session.commit()
+        create_job(instance, 'done', [('fusio', 'pt_1'), ('osm', 'osm_1'), ('fare', 'fare_1')])
+        create_job(instance, 'done', [('fusio', 'pt_2')])
+
+        datasets = [new_dataset('fusio', 'pt_2'), new_dataset('osm', 'osm_1'), new_dataset('fare', 'fare_1')]
+        assert unchanged_family_types(instance, datasets) == {'pt', 'streetnetwork', 'fare'}
+
+        datasets = [new_dataset('fusio', 'pt_2'), new_dataset('osm', 'osm_1'), new_dataset('fare', 'fare_2')]
+        assert unchanged_family_types(instance, datasets) == {'pt', 'streetnetwork'}
+
+        datasets = [new_dataset('fusio', 'pt_1'), new_dataset('osm', 'osm_2')]
+        assert unchanged_family_types(instance, datasets) == set()
+
+
+def test_unchanged_family_types_fare_with_pt():
+    """
+    the fares are emptied by the loading of the pt, they are loaded again with a new pt even if they have not changed
+    """
+    with app.app_context():
+        instance = models.Instance('fr')
+        models.db.session.add(instance)
+        models.db.session.commit()
+        create_job(instance, 'done', [('fusio', 'pt_1'), ('fare', 'fare_1')])
+
+        datasets = [new_dataset('fusio', 'pt_2'), new_dataset('fare', 'fare_1')]
+        assert unchanged_family_types(instance, datasets) == set()
+
+        # without a new pt, the fares are still in ed
+        assert unchanged_family_types(instance, [new_dataset('fare', 'fare_1')]) == {'fare'}
+
+
+def test_unchanged_family_types_failed_job():
+    """
+    the data of a failed job may not be in ed, it must be loaded again
+    """
+    with app.app_context():
+        instance = models.Instance('fr')
+        models.db.session.add(instance)
+        models.db.session.commit()
+        create_job(instance, 'failed', [('fusio', 'pt_1')])
+
+        assert unchanged_family_types(instance, [new_dataset('fusio', 'pt_1')]) == set()
+
+
+def test_content_hash(tmpdir):
+    data_dir = tmpdir.mkdir('data')
+    data_dir.join('stops.txt').write('stop_id')
+    data_dir.join('routes.txt').write('route_id')
+    first_hash = utils.content_hash(str(data_dir))
+
+    assert utils.content_hash(str(data_dir)) == first_hash
+    data_dir.join('routes.txt').write('route_id,route_name')
+    assert utils.content_hash(str(data_dir)) != first_hash
+    assert utils.content_hash(os.path.join(str(data_dir), 'stops.txt')) != first_hash
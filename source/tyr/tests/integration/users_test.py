@@ -321,3 +321,20 @@ def test_deletion_keys_and_auth(create_instance):
     resp_auth = api_delete('/v0/users/{}/authorizations/'.format(resp['id']), data=json.dumps(auth),
                            content_type='application/json')
     assert len(resp_auth['authorizations']) == 0
+
+
+def test_authorized_apis(create_instance):
+    """
+    the authorizations of a user are indexed by instance name
+    """
+    user = {'login': 'user1', 'email': 'user1@example.com'}
+    resp_user = api_post('/v0/users/', data=json.dumps(user), content_type='application/json')
+    auth = {'instance_id': create_instance, 'api_id': 1}
+    api_post('/v0/users/{}/authorizations'.format(resp_user['id']), data=json.dumps(auth),
+             content_type='application/json')
+
+    with app.app_context():
+        user = models.User.query.get(resp_user['id'])
+        api_name = models.Api.query.get(1).name
+        assert user.authorized_apis() == {'instance': {api_name}}
+        assert user.has_access(create_instance, api_name)
@@ -0,0 +1,99 @@
+import logging
+import os
+import sys
+from navitiacommon.launch_exec import LineReader, launch_exec, parse_step_duration
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage()))
+
+
+def make_logger():
+    logger = logging.getLogger('launch_exec_test')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [ListHandler()]
+    return logger, logger.handlers[0]
+
+
+def test_parse_step_duration():
+    assert parse_step_duration('\t File reading: 1234ms') == ('File reading', 1234)
+    assert parse_step_duration('\t lecture des fichiers 56ms') == ('lecture des fichiers', 56)
+    assert parse_step_duration('stoppoint: 1234') is None
+    # only the lines beginning by a tabulation are durations of steps
+    assert parse_step_duration('connection timeout after 500ms') is None
+
+
+def test_line_reader_partial_line():
+    """
+    a line written in several times is returned once complete, the unterminated last line at the end of the pipe
+    """
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(read_fd, 'rb') as pipe:
+        reader = LineReader(pipe)
+        os.write(write_fd, b'INFO - beg')
+        assert reader.read_lines() == []
+        os.write(write_fd, b'in\nINFO - second\nINFO - thi')
+        assert reader.read_lines() == ['INFO - begin', 'INFO - second']
+        os.write(write_fd, b'rd')
+        assert reader.read_lines() == []
+        os.close(write_fd)
+        assert reader.read_lines() == ['INFO - third']
+        assert reader.eof
+
+
+def test_line_reader_empty_end():
+    read_fd, write_fd = os.pipe()
+    with os.fdopen(read_fd, 'rb') as pipe:
+        reader = LineReader(pipe)
+        os.write(write_fd, b'INFO - line\n')
+        assert reader.read_lines() == ['INFO - line']
+        os.close(write_fd)
+        assert reader.read_lines() == []
+        assert reader.eof
+
+
+# writes on stdout and stderr, with lines split between several writes and an unterminated last line
+SCRIPT = """
+import sys, time
+def write(stream, data):
+    stream.write(data)
+    stream.flush()
+    time.sleep(0.05)
+write(sys.stdout, 'INFO - begin\\n')
+write(sys.stderr, 'WARN - connection timeout after 500ms\\n')
+write(sys.stdout, 'INFO - \\t File rea')
+write(sys.stderr, 'ERROR - some')
+write(sys.stdout, 'ding: 12ms\\n')
+write(sys.stderr, 'thing failed\\n')
+write(sys.stdout, 'INFO - \\t Data writing: 34ms')
+sys.exit(3)
+"""
+
+
+def test_launch_exec_steps():
+    logger, handler = make_logger()
+    steps = []
+
+    res = launch_exec(sys.executable, ['-c', SCRIPT], logger, steps=steps)
+
+    assert res == 3
+    assert steps == [('File reading', 12), ('Data writing', 34)]
+    messages = handler.records[1:]  # the first one is the launching of the exec
+    stdout = [m for m in messages if m[0] == logging.INFO]
+    assert stdout == [(logging.INFO, 'begin'), (logging.INFO, '\t File reading: 12ms'),
+                      (logging.INFO, '\t Data writing: 34ms')]
+    assert (logging.WARN, 'connection timeout after 500ms') in messages
+    assert (logging.ERROR, 'something failed') in messages
+    assert len(messages) == 5
+
+
+def test_launch_exec_without_steps():
+    logger, handler = make_logger()
+    assert launch_exec(sys.executable, ['-c', 'print("INFO - \\t File reading: 12ms")'], logger) == 0
+    assert handler.records[-1] == (logging.INFO, '\t File reading: 12ms')
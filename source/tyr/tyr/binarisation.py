@@ -90,6 +90,30 @@ def make_connection_string(instance_config):
     connection_string += ' password=' + instance_config.pg_password
     return connection_string
 
+# The ed tables are split in groups, each group is written by its own loaders:
+# the loaders of different groups can run at the same time, the loaders of a group run one after the other.
+# ed2nav reads all the groups.
+ED_TABLES_GROUP_BY_LOADER = {
+    'fusio2ed': 'pt',
+    'gtfs2ed': 'pt',
+    'fare2ed': 'pt',
+    'shape2ed': 'georef',
+    'osm2ed': 'georef',
+    'geopal2ed': 'georef',
+    'poi2ed': 'georef',
+    'synonym2ed': 'synonym',
+}
+
+
+def lock_names(instance_name, task_name):
+    """
+    a loader locks the group of ed tables it writes, the other tasks lock all the groups
+    """
+    group = ED_TABLES_GROUP_BY_LOADER.get(task_name)
+    groups = [group] if group else sorted(set(ED_TABLES_GROUP_BY_LOADER.values()))
+    return ['tyr.lock|{}|{}'.format(instance_name, g) for g in groups]
+
+
 class Lock(object):
     def __init__(self, timeout):
         self.timeout = timeout
@@ -100,9 +124,17 @@ class Lock(object):
             logging.debug('args: %s -- kwargs: %s', args, kwargs)
             job = models.Job.query.get(job_id)
             logger = get_instance_logger(job.instance)
-            lock = redis.lock('tyr.lock|' + job.instance.name, timeout=self.timeout)
-            if not lock.acquire(blocking=False):
-                logger.info('lock on %s retry %s in 300sec', job.instance.name, func.__name__)
+            locks = [redis.lock(name, timeout=self.timeout)
+                     for name in lock_names(job.instance.name, func.__name__)]
+            acquired_locks = []
+            for lock in locks:
+                if not lock.acquire(blocking=False):
+                    break
+                acquired_locks.append(lock)
+            if len(acquired_locks) != len(locks):
+                for lock in acquired_locks:
+                    lock.release()
+                logger.info('lock on %s retry %s in 60sec', job.instance.name, func.__name__)
                 task = args[func.func_code.co_varnames.index('self')]
                 task.retry(countdown=60, max_retries=10)
             else:
@@ -111,13 +143,19 @@ class Lock(object):
                     return func(*args, **kwargs)
                 finally:
                     logger.debug('release lock on %s for %s', job.instance.name, func.__name__)
-                    lock.release()
+                    for lock in locks:
+                        lock.release()
         return wrapper
 
 @contextmanager
 def collect_metric(task_type, job, dataset_uid):
+    """
+    record the duration of the task, and the duration of the steps (name, duration in ms) added to
+    the yielded list
+    """
     begin = datetime.datetime.utcnow()
-    yield
+    steps = []
+    yield steps
     end = datetime.datetime.utcnow()
     try:
         logger = logging.getLogger(__name__)
@@ -128,6 +166,14 @@ def collect_metric(task_type, job, dataset_uid):
         metric.type = task_type
         metric.duration = end-begin
         models.db.session.add(metric)
+        for step, duration in steps:
+            step_metric = models.Metric()
+            step_metric.job = job
+            step_metric.dataset = dataset
+            step_metric.type = task_type
+            step_metric.step = step
+            step_metric.duration = datetime.timedelta(milliseconds=duration)
+            models.db.session.add(step_metric)
         models.db.session.commit()
     except:
         logger = logging.getLogger(__name__)
@@ -158,8 +204,8 @@ def fusio2ed(self, instance_config, filename, job_id, dataset_uid):
         params.append("--connection-string")
         params.append(connection_string)
         res = None
-        with collect_metric('fusio2ed', job, dataset_uid):
-            res = launch_exec("fusio2ed", params, logger)
+        with collect_metric('fusio2ed', job, dataset_uid) as steps:
+            res = launch_exec("fusio2ed", params, logger, steps=steps)
         if res != 0:
             raise ValueError('fusio2ed failed')
     except:
@@ -194,8 +240,8 @@ def gtfs2ed(self, instance_config, gtfs_filename, job_id, dataset_uid):
         params.append("--connection-string")
         params.append(connection_string)
         res = None
-        with collect_metric('gtfs2ed', job, dataset_uid):
-            res = launch_exec("gtfs2ed", params, logger)
+        with collect_metric('gtfs2ed', job, dataset_uid) as steps:
+            res = launch_exec("gtfs2ed", params, logger, steps=steps)
         if res != 0:
             raise ValueError('gtfs2ed failed')
     except:
@@ -228,10 +274,10 @@ def osm2ed(self, instance_config, osm_filename, job_id, dataset_uid):
             else:
                 args.append(poi_type.uri)
 
-        with collect_metric('osm2ed', job, dataset_uid):
+        with collect_metric('osm2ed', job, dataset_uid) as steps:
             res = launch_exec('osm2ed',
                     args,
-                    logger)
+                    logger, steps=steps)
         if res != 0:
             #@TODO: exception
             raise ValueError('osm2ed failed')
@@ -254,10 +300,10 @@ def geopal2ed(self, instance_config, filename, job_id, dataset_uid):
 
         connection_string = make_connection_string(instance_config)
         res = None
-        with collect_metric('geopal2ed', job, dataset_uid):
+        with collect_metric('geopal2ed', job, dataset_uid) as steps:
             res = launch_exec('geopal2ed',
                     ["-i", working_directory, "--connection-string", connection_string],
-                    logger)
+                    logger, steps=steps)
         if res != 0:
             #@TODO: exception
             raise ValueError('geopal2ed failed')
@@ -280,10 +326,10 @@ def poi2ed(self, instance_config, filename, job_id, dataset_uid):
 
         connection_string = make_connection_string(instance_config)
         res = None
-        with collect_metric('poi2ed', job, dataset_uid):
+        with collect_metric('poi2ed', job, dataset_uid) as steps:
             res = launch_exec('poi2ed',
                     ["-i", working_directory, "--connection-string", connection_string],
-                    logger)
+                    logger, steps=steps)
         if res != 0:
             #@TODO: exception
             raise ValueError('poi2ed failed')
@@ -305,10 +351,10 @@ def synonym2ed(self, instance_config, filename, job_id, dataset_uid):
     try:
         connection_string = make_connection_string(instance_config)
         res = None
-        with collect_metric('synonym2ed', job, dataset_uid):
+        with collect_metric('synonym2ed', job, dataset_uid) as steps:
             res = launch_exec('synonym2ed',
                     ["-i", filename, "--connection-string", connection_string],
-                    logger)
+                    logger, steps=steps)
         if res != 0:
             #@TODO: exception
             raise ValueError('synonym2ed failed')
@@ -404,7 +450,8 @@ def shape2ed(self, instance_config, filename, job_id, dataset_uid):
     job = models.Job.query.get(job_id)
     instance = job.instance
     logging.info("loading bounding shape for {} from = {}".format(instance.name, filename))
-    load_bounding_shape(instance.name, instance_config, filename)
+    with collect_metric('shape2ed', job, dataset_uid):
+        load_bounding_shape(instance.name, instance_config, filename)
 
 
 @celery.task(bind=True)
@@ -459,8 +506,8 @@ def ed2nav(self, instance_config, job_id, custom_output_dir):
             argv.extend(["--cities-connection-string", current_app.config['CITIES_DATABASE_URI']])
 
         res = None
-        with collect_metric('ed2nav', job, None):
-            res = launch_exec('ed2nav', argv, logger)
+        with collect_metric('ed2nav', job, None) as steps:
+            res = launch_exec('ed2nav', argv, logger, steps=steps)
         if res != 0:
             raise ValueError('ed2nav failed')
     except:
@@ -483,10 +530,12 @@ def fare2ed(self, instance_config, filename, job_id, dataset_uid):
 
         working_directory = unzip_if_needed(filename)
 
-        res = launch_exec("fare2ed", ['-f', working_directory,
-                                      '--connection-string',
-                                      make_connection_string(instance_config)],
-                          logger)
+        res = None
+        with collect_metric('fare2ed', job, dataset_uid) as steps:
+            res = launch_exec("fare2ed", ['-f', working_directory,
+                                          '--connection-string',
+                                          make_connection_string(instance_config)],
+                              logger, steps=steps)
         if res != 0:
             #@TODO: exception
             raise ValueError('fare2ed failed')
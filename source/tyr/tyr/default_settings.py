@@ -87,6 +87,10 @@ REDIS_DB = 0
 
 REDIS_PASSWORD = None
 
+#The data dropped in the source directory of an instance are not loaded again if they are the same as the last ones
+#loaded, if nothing has changed there is no binarisation
+SKIP_UNCHANGED_DATASETS = True
+
 #Validate the presence of a mx record on the domain
 EMAIL_CHECK_MX = True
 
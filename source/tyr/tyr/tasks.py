@@ -34,7 +34,9 @@ import shutil
 import re
 import zipfile
 
-from celery import chain
+from collections import OrderedDict
+
+from celery import chain, group, chord
 from celery.signals import task_postrun
 from flask import current_app
 import kombu
@@ -42,7 +44,7 @@ import kombu
 from tyr.binarisation import gtfs2ed, osm2ed, ed2nav, fusio2ed, geopal2ed, fare2ed, poi2ed, synonym2ed, \
     shape2ed, \
     load_bounding_shape, bano2mimir, osm2mimir
-from tyr.binarisation import reload_data, move_to_backupdirectory
+from tyr.binarisation import reload_data, move_to_backupdirectory, ED_TABLES_GROUP_BY_LOADER
 from tyr import celery
 from navitiacommon import models, task_pb2, utils
 from tyr.helper import load_instance_config, get_instance_logger
@@ -59,7 +61,37 @@ def finish_job(job_id):
     models.db.session.commit()
 
 
-def import_data(files, instance, backup_file, async=True, reload=True, custom_output_dir=None):
+def unchanged_family_types(instance, datasets):
+    """
+    return the family types of the datasets that are the same as the ones of the last job that loaded this family
+    type, if this job is done they are already in ed
+
+    fusio2ed and gtfs2ed empty the fare tables, so the fares are loaded again when the pt has changed
+    """
+    datasets_by_family = {}
+    for dataset in datasets:
+        datasets_by_family.setdefault(dataset.family_type, []).append(dataset)
+
+    unchanged = set()
+    # the datasets of the new job must not be flushed, they would be the last ones
+    with models.db.session.no_autoflush:
+        for family_type, family_datasets in datasets_by_family.items():
+            last_datasets = instance.last_datasets_of_family(family_type)
+            if not last_datasets or last_datasets[0].job.state != 'done':
+                continue
+            contents = sorted((d.type, d.content_hash) for d in family_datasets)
+            if any(content_hash is None for _, content_hash in contents):
+                continue
+            if contents == sorted((d.type, d.content_hash) for d in last_datasets):
+                unchanged.add(family_type)
+
+    if 'pt' in datasets_by_family and 'pt' not in unchanged:
+        unchanged.discard('fare')
+    return unchanged
+
+
+def import_data(files, instance, backup_file, async=True, reload=True, custom_output_dir=None,
+                skip_unchanged=False):
     """
     import the data contains in the list of 'files' in the 'instance'
 
@@ -68,6 +100,8 @@ def import_data(files, instance, backup_file, async=True, reload=True, custom_ou
     :param backup_file: If True the files are moved to a backup directory, else they are not moved
     :param async: If True all jobs are run in background, else the jobs are run in sequence the function will only return when all of them are finish
     :param reload: If True kraken would be reload at the end of the treatment
+    :param skip_unchanged: If True the families of data whose content has not changed since their last import
+    are not loaded again, if no data has changed there is no binarisation nor reload
 
     run the whole data import process:
 
@@ -76,7 +110,7 @@ def import_data(files, instance, backup_file, async=True, reload=True, custom_ou
     - update the jormungandr db with the new data for the instance
     - reload the krakens
     """
-    actions = []
+    datasets_actions = []
     job = models.Job()
     instance_config = load_instance_config(instance.name)
     job.instance = instance
@@ -106,7 +140,9 @@ def import_data(files, instance, backup_file, async=True, reload=True, custom_ou
                                                    instance_config.backup_directory)
             else:
                 filename = _file
-            actions.append(task[dataset.type].si(instance_config, filename, dataset_uid=dataset.uid))
+            dataset.content_hash = utils.content_hash(filename)
+            datasets_actions.append((dataset, task[dataset.type].si(instance_config, filename,
+                                                                    dataset_uid=dataset.uid)))
         else:
             #unknown type, we skip it
             current_app.logger.debug("unknwn file type: {} for file {}"
@@ -118,17 +154,37 @@ def import_data(files, instance, backup_file, async=True, reload=True, custom_ou
         models.db.session.add(dataset)
         job.data_sets.append(dataset)
 
-    if actions:
+    unchanged_families = set()
+    if skip_unchanged:
+        unchanged_families = unchanged_family_types(instance, [d for d, _ in datasets_actions])
+
+    # the loading actions by group of ed tables, in the order of the files
+    loading_actions = OrderedDict()
+    for dataset, action in datasets_actions:
+        if dataset.family_type in unchanged_families:
+            current_app.logger.info("{} has not changed since its last import in {}, it is not loaded"
+                                    .format(dataset.name, instance.name))
+            continue
+        ed_tables_group = ED_TABLES_GROUP_BY_LOADER[action.task.rsplit('.', 1)[-1]]
+        loading_actions.setdefault(ed_tables_group, []).append(action)
+
+    if datasets_actions and not loading_actions:
+        # nothing has changed, the data is already in kraken, we only keep track of the job
+        job.state = 'done'
+        models.db.session.add(job)
+        models.db.session.commit()
+        current_app.logger.info("no data has changed for {}, no binarisation".format(instance.name))
+
+    if loading_actions:
         models.db.session.add(job)
         models.db.session.commit()
-        for action in actions:
-            action.kwargs['job_id'] = job.id
-        #We pass the job id to each tasks, but job need to be commited for
-        #having an id
-        binarisation = [ed2nav.si(instance_config, job.id, custom_output_dir)]
         #We pass the job id to each tasks, but job need to be commited for
         #having an id
-        actions.append(chain(*binarisation))
+        for group_actions in loading_actions.values():
+            for action in group_actions:
+                action.kwargs['job_id'] = job.id
+        binarisation = ed2nav.si(instance_config, job.id, custom_output_dir)
+        actions = make_import_dag(loading_actions.values(), binarisation)
         if reload:
             actions.append(reload_data.si(instance_config, job.id))
         actions.append(finish_job.si(job.id))
@@ -139,13 +195,27 @@ def import_data(files, instance, backup_file, async=True, reload=True, custom_ou
             chain(*actions).apply()
 
 
+def make_import_dag(loading_actions, binarisation):
+    """
+    return the actions to run in sequence to load the data in ed and binarize it
+
+    loading_actions is the list of the actions of each group of ed tables, the actions of a group are run
+    one after the other and the groups are run at the same time, the binarisation is done once they are all done
+    """
+    loading_chains = [chain(*group_actions) for group_actions in loading_actions]
+    if len(loading_chains) == 1:
+        return [loading_chains[0], binarisation]
+    return [chord(group(*loading_chains), binarisation)]
+
+
 @celery.task()
 def update_data():
     for instance in models.Instance.query.all():
         current_app.logger.debug("Update data of : {}".format(instance.name))
         instance_config = load_instance_config(instance.name)
         files = glob.glob(instance_config.source_directory + "/*")
-        import_data(files, instance, backup_file=True)
+        import_data(files, instance, backup_file=True,
+                    skip_unchanged=current_app.config.get('SKIP_UNCHANGED_DATASETS', True))
 
 
 BANO_REGEXP = re.compile('.*bano.*')